@@ -0,0 +1,65 @@
+"""Curated default events per city.
+
+The catalog file holds a ``default`` list shown in every city plus
+city-specific lists keyed by display name. Lists are built once per city and
+shared between requests, so callers must treat them as read-only. The file is
+re-read when its mtime changes and the index is swapped in whole.
+"""
+import logging
+import re
+import unicodedata
+from functools import lru_cache
+from types import MappingProxyType
+
+from reloadable_file import ReloadableFile
+
+logger = logging.getLogger("cc_calendar.cities")
+
+def normalize_city(city) -> str:
+    """"São Paulo " -> "sao paulo"; "New York, United States" -> "new york"."""
+    if not city:
+        return ""
+    text = unicodedata.normalize("NFKD", city.split(",")[0])
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return re.sub(r"[^a-z0-9]+", " ", text.casefold()).strip()
+
+class CityCatalog(ReloadableFile):
+    description = "city catalog"
+
+    def apply(self, raw):
+        common = tuple(self._freeze(event) for event in raw.get("default", []))
+        cities = {}
+        for name, events in raw.get("cities", {}).items():
+            cities[normalize_city(name)] = (name, tuple(self._freeze(event) for event in events))
+
+        # Build the replacement completely before swapping it in
+        self._common = common
+        self._cities = MappingProxyType(cities)
+        self._events_for = lru_cache(maxsize=2048)(self._build)
+        logger.info("Loaded city catalog with %d cities from %s", len(cities), self.path)
+
+    @staticmethod
+    def _freeze(event: dict):
+        missing = [key for key in ("id", "title", "event_type", "location") if key not in event]
+        if missing:
+            raise ValueError(f"City catalog event {event!r} is missing {missing}")
+        return MappingProxyType(dict(event))
+
+    def _build(self, city: str):
+        name, specific = self._cities.get(normalize_city(city), (city, ()))
+        display = city or name
+        return [
+            {**event, "city": display, "is_default": True}
+            for event in specific + self._common
+        ]
+
+    def cities(self):
+        return sorted(name for name, _ in self._cities.values())
+
+    def cache_info(self):
+        return self._events_for.cache_info()
+
+    def events_for(self, city: str):
+        """Default events for ``city``; the returned list is shared and must not be modified."""
+        self.maybe_reload()
+        return self._events_for(city or "")
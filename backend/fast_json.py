@@ -0,0 +1,51 @@
+"""orjson-backed JSON responses.
+
+Routes return plain dicts built from Mongo documents. FastAPI would walk them
+with ``jsonable_encoder`` and then encode them with the stdlib ``json`` module;
+``FastJSONRoute`` hands the result straight to ``FastJSONResponse`` instead.
+orjson writes datetimes natively in the same ISO 8601 form ``isoformat()``
+produces, so naive UTC values from Mongo stay offset-free and aware values
+keep their ``+00:00``.
+"""
+import functools
+import inspect
+
+import orjson
+from fastapi.datastructures import DefaultPlaceholder
+from fastapi.responses import JSONResponse, Response
+from fastapi.routing import APIRoute
+from pydantic import BaseModel
+
+def default(value):
+    if isinstance(value, BaseModel):
+        return value.dict()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(content) -> bytes:
+    return orjson.dumps(content, default=default, option=orjson.OPT_NON_STR_KEYS)
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+def fast_json_endpoint(endpoint):
+    """Wrap a route handler so its result skips ``jsonable_encoder``."""
+    @functools.wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        result = await endpoint(*args, **kwargs)
+        if isinstance(result, Response):
+            return result
+        return FastJSONResponse(result)
+    return wrapper
+
+class FastJSONRoute(APIRoute):
+    def __init__(self, path: str, endpoint, **kwargs):
+        # Routes with a response_model still need FastAPI's validation and filtering
+        response_model = kwargs.get("response_model")
+        if isinstance(response_model, DefaultPlaceholder):
+            response_model = getattr(endpoint, "__annotations__", {}).get("return")
+        if inspect.iscoroutinefunction(endpoint) and response_model is None:
+            endpoint = fast_json_endpoint(endpoint)
+        super().__init__(path, endpoint, **kwargs)
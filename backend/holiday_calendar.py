@@ -0,0 +1,150 @@
+"""Offline holiday calendar.
+
+Holiday rules per country are read from a JSON file keyed by ISO country code.
+Each rule is one of:
+
+- ``"date": "MM-DD"``                        fixed date
+- ``"nth": [month, "MO", n]``                n-th weekday of the month (n = -1 for the last)
+- ``"on_or_before": [month, day, "MO"]``     last given weekday on or before a date
+- ``"easter": offset``                       days from Western Easter Sunday
+- ``"equinox": "vernal" | "autumnal"``       equinox day (Japan)
+
+Per-(country, year) tables are built on first use and the most recently used
+ones are cached, so lookups by date are dictionary hits. Years outside
+MIN_YEAR-MAX_YEAR are not served; equinox holidays are only listed for the
+years their approximation covers.
+"""
+import calendar
+import json
+from datetime import date, timedelta
+from functools import lru_cache
+
+MIN_YEAR = 1900
+MAX_YEAR = 2199
+# The equinox approximation is only valid for these years
+EQUINOX_YEARS = range(1980, 2100)
+TABLE_CACHE_SIZE = 1024
+
+WEEKDAYS = {"MO": 0, "TU": 1, "WE": 2, "TH": 3, "FR": 4, "SA": 5, "SU": 6}
+
+class HolidayRuleError(ValueError):
+    pass
+
+def easter_sunday(year: int) -> date:
+    """Western (Gregorian) Easter, anonymous Gregorian algorithm."""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+def nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year, month, calendar.monthrange(year, month)[1])
+    return last - timedelta(days=(last.weekday() - weekday) % 7 + 7 * (-n - 1))
+
+def weekday_on_or_before(year: int, month: int, day: int, weekday: int) -> date:
+    anchor = date(year, month, day)
+    return anchor - timedelta(days=(anchor.weekday() - weekday) % 7)
+
+def equinox_day(year: int, season: str):
+    """Equinox day by the approximation used for Japanese public holidays; None outside EQUINOX_YEARS."""
+    if year not in EQUINOX_YEARS:
+        return None
+    base = {"vernal": (3, 20.8431), "autumnal": (9, 23.2488)}[season]
+    day = int(base[1] + 0.242194 * (year - 1980) - (year - 1980) // 4)
+    return date(year, base[0], day)
+
+def compile_rule(rule: dict):
+    """Return a function ``year -> date`` for one holiday rule."""
+    try:
+        if "date" in rule:
+            month, day = (int(part) for part in rule["date"].split("-"))
+            date(2000, month, day)
+            return lambda year: date(year, month, day)
+        if "nth" in rule:
+            month, weekday, n = rule["nth"]
+            weekday = WEEKDAYS[weekday]
+            if n == 0 or not -5 <= n <= 5:
+                raise ValueError(n)
+            return lambda year: nth_weekday(year, month, weekday, n)
+        if "on_or_before" in rule:
+            month, day, weekday = rule["on_or_before"]
+            weekday = WEEKDAYS[weekday]
+            return lambda year: weekday_on_or_before(year, month, day, weekday)
+        if "easter" in rule:
+            offset = timedelta(days=int(rule["easter"]))
+            return lambda year: easter_sunday(year) + offset
+        if "equinox" in rule:
+            season = rule["equinox"]
+            if season not in ("vernal", "autumnal"):
+                raise ValueError(season)
+            return lambda year: equinox_day(year, season)
+    except (KeyError, TypeError, ValueError) as exc:
+        raise HolidayRuleError(f"Invalid holiday rule {rule!r}") from exc
+    raise HolidayRuleError(f"Holiday rule {rule!r} has no date, nth, on_or_before, easter or equinox")
+
+class HolidayCalendar:
+    def __init__(self, path: str, default_country: str = "US"):
+        with open(path, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+
+        self.default_country = default_country
+        self.years = range(MIN_YEAR, MAX_YEAR + 1)
+        self._rules = {}
+        self._aliases = {}
+        self._table = lru_cache(maxsize=TABLE_CACHE_SIZE)(self._build_table)
+        for code, country in raw.items():
+            self._rules[code] = [
+                (holiday["name"], holiday.get("type", "holiday"), compile_rule(holiday))
+                for holiday in country["holidays"]
+            ]
+            for alias in [code, country["name"], *country.get("aliases", [])]:
+                self._aliases[alias.casefold()] = code
+
+        if default_country not in self._rules:
+            raise HolidayRuleError(f"Default holiday country {default_country} is not defined")
+
+    def countries(self):
+        return sorted(self._rules)
+
+    def resolve_country(self, country) -> str:
+        """Map a free-form country name or code to a known code, falling back to the default."""
+        if country:
+            code = self._aliases.get(country.strip().casefold())
+            if code:
+                return code
+        return self.default_country
+
+    def table(self, country_code: str, year: int) -> dict:
+        """``{date: [holiday, ...]}`` for one country and year, built once and cached."""
+        return self._table(country_code, year)
+
+    def _build_table(self, country_code: str, year: int) -> dict:
+        table = {}
+        for name, kind, rule in self._rules[country_code]:
+            day = rule(year)
+            if day is None:
+                continue
+            table.setdefault(day, []).append({"name": name, "date": day.isoformat(), "type": kind})
+        return dict(sorted(table.items()))
+
+    def on(self, country_code: str, day: date):
+        return self.table(country_code, day.year).get(day, [])
+
+    def between(self, country_code: str, start: date, end: date):
+        """Holidays dated in [start, end], in date order."""
+        holidays = []
+        for year in range(start.year, end.year + 1):
+            for day, entries in self.table(country_code, year).items():
+                if start <= day <= end:
+                    holidays.extend(entries)
+        return holidays
@@ -0,0 +1,445 @@
+"""In-process storage backend for tests and profiling.
+
+Documents live in dicts, with each user's tasks additionally kept in a list
+sorted by (date, id), so date windows and cursors are bisected as an index
+would be. Semantics follow the Mongo backend: datetimes are stored as naive
+UTC with millisecond precision, every read returns a copy, and writes that
+match nothing are not errors. Nothing is persisted, and state is per process.
+"""
+import bisect
+from datetime import datetime, timedelta
+
+from recurrence import NO_REPEAT
+from repositories import (
+    DayPlanRepository,
+    DuplicateError,
+    EventRepository,
+    IdempotencyRepository,
+    NotificationRepository,
+    Storage,
+    TaskRepository,
+    TombstoneRepository,
+    UserRepository,
+    distance_km,
+    stored_datetime,
+    stored_document,
+)
+from time_zones import UTC, local_date
+
+def changed_after(since: datetime, after_id: str = None):
+    """Predicate on (changed at, id) matching the repositories' ``changed_since`` contract."""
+    since = stored_datetime(since)
+    if after_id is None:
+        return lambda moment, doc_id: moment > since
+    return lambda moment, doc_id: (moment, doc_id) > (since, after_id)
+
+def clone(value):
+    """Copy the dicts and lists of a stored document; everything else is immutable."""
+    if isinstance(value, dict):
+        return {key: clone(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [clone(item) for item in value]
+    return value
+
+class MemoryUsers(UserRepository):
+    def __init__(self):
+        self._users = {}
+        self._names = {}
+
+    async def get(self, user_id: str):
+        user = self._users.get(user_id)
+        return clone(user) if user is not None else None
+
+    async def find_by_name(self, name: str):
+        return await self.get(self._names.get(name))
+
+    async def insert(self, user: dict) -> dict:
+        if user["id"] in self._users or user["name"] in self._names:
+            raise DuplicateError(f"User {user['id']} or name {user['name']!r} already exists")
+        stored = self._users[user["id"]] = stored_document(user)
+        self._names[user["name"]] = user["id"]
+        return clone(stored)
+
+    async def update(self, user_id: str, fields: dict) -> bool:
+        user = self._users.get(user_id)
+        if user is None:
+            return False
+        name = fields.get("name", user["name"])
+        if name != user["name"]:
+            if name in self._names:
+                raise DuplicateError(f"Name {name!r} already exists")
+            del self._names[user["name"]]
+            self._names[name] = user_id
+        user.update(stored_document(fields))
+        return True
+
+class MemoryTasks(TaskRepository):
+    def __init__(self):
+        self._tasks = {}
+        # user_id -> [(date, id)] in sort order
+        self._by_user = {}
+
+    @staticmethod
+    def _key(task: dict):
+        return task["date"], task["id"]
+
+    def _index(self, task: dict):
+        bisect.insort(self._by_user.setdefault(task["user_id"], []), self._key(task))
+
+    def _unindex(self, task: dict):
+        keys = self._by_user[task["user_id"]]
+        del keys[bisect.bisect_left(keys, self._key(task))]
+
+    def _owned(self, user_id: str, task_id: str):
+        task = self._tasks.get(task_id)
+        return task if task is not None and task["user_id"] == user_id else None
+
+    def _insert(self, task: dict):
+        if task["id"] in self._tasks:
+            raise DuplicateError(f"Task {task['id']} already exists")
+        stored = self._tasks[task["id"]] = stored_document(task)
+        self._index(stored)
+        return clone(stored)
+
+    def _replace(self, previous: dict, task: dict):
+        if previous["date"] != task["date"]:
+            self._unindex(previous)
+            self._index(task)
+        self._tasks[task["id"]] = task
+
+    def _set_override(self, task: dict, key: str, fields: dict, updated_at: datetime, merge: bool):
+        overrides = task.setdefault("overrides", {})
+        if merge:
+            overrides.setdefault(key, {}).update(stored_document(fields))
+        else:
+            overrides[key] = stored_document(fields)
+        task["updated_at"] = stored_datetime(updated_at)
+
+    def _add_exception(self, task: dict, key: str, updated_at: datetime):
+        exceptions = task.setdefault("exceptions", [])
+        if key not in exceptions:
+            exceptions.append(key)
+        (task.get("overrides") or {}).pop(key, None)
+        task["updated_at"] = stored_datetime(updated_at)
+
+    def _delete(self, task: dict):
+        self._unindex(task)
+        del self._tasks[task["id"]]
+
+    async def insert(self, task: dict) -> dict:
+        return self._insert(task)
+
+    async def insert_many(self, tasks: list) -> list:
+        return [self._insert(task) for task in tasks]
+
+    async def get_many(self, user_id: str, task_ids) -> dict:
+        owned = (self._owned(user_id, task_id) for task_id in task_ids)
+        return {task["id"]: clone(task) for task in owned if task is not None}
+
+    async def list(self, user_id: str, start: datetime = None, end: datetime = None, *,
+                   one_off: bool = False, pending: bool = False, after=None, limit: int = None):
+        keys = self._by_user.get(user_id, [])
+        low = bisect.bisect_left(keys, (stored_datetime(start),)) if start is not None else 0
+        if after:
+            low = max(low, bisect.bisect_right(keys, (stored_datetime(after[0]), after[1])))
+        high = bisect.bisect_left(keys, (stored_datetime(end),)) if end is not None else len(keys)
+
+        tasks = []
+        for _, task_id in keys[low:high]:
+            task = self._tasks[task_id]
+            if one_off and task.get("repeat") not in NO_REPEAT:
+                continue
+            if pending and task.get("completed"):
+                continue
+            tasks.append(clone(task))
+            if limit and len(tasks) == limit:
+                break
+        return tasks
+
+    async def series(self, user_id: str, before: datetime):
+        keys = self._by_user.get(user_id, [])
+        high = bisect.bisect_left(keys, (stored_datetime(before),))
+        return [
+            clone(self._tasks[task_id]) for _, task_id in keys[:high]
+            if self._tasks[task_id].get("repeat") not in NO_REPEAT
+        ]
+
+    async def update(self, user_id: str, task_id: str, fields: dict):
+        previous = self._owned(user_id, task_id)
+        if previous is None:
+            return None
+        self._replace(previous, {**clone(previous), **stored_document(fields)})
+        return previous
+
+    async def set_override(self, user_id: str, series_id: str, key: str, fields: dict,
+                           updated_at: datetime, merge: bool = False):
+        task = self._owned(user_id, series_id)
+        if task is None:
+            return None
+        previous = clone(task)
+        self._set_override(task, key, fields, updated_at, merge)
+        return previous
+
+    async def add_exception(self, user_id: str, series_id: str, key: str, updated_at: datetime) -> bool:
+        task = self._owned(user_id, series_id)
+        if task is None:
+            return False
+        self._add_exception(task, key, updated_at)
+        return True
+
+    async def delete(self, user_id: str, task_id: str):
+        task = self._owned(user_id, task_id)
+        if task is not None:
+            self._delete(task)
+        return task
+
+    async def apply(self, user_id: str, writes) -> dict:
+        failed = {}
+        for position, write in enumerate(writes):
+            if write.kind == "insert":
+                try:
+                    self._insert(write.document)
+                except DuplicateError as exc:
+                    failed[position] = str(exc)
+                continue
+            task = self._owned(user_id, write.task_id)
+            if task is None:
+                continue
+            if write.kind == "update":
+                self._replace(task, {**task, **stored_document(write.fields)})
+            elif write.kind == "override":
+                self._set_override(task, write.key, write.fields, write.updated_at, write.merge)
+            elif write.kind == "exception":
+                self._add_exception(task, write.key, write.updated_at)
+            elif write.kind == "delete":
+                self._delete(task)
+            else:
+                raise ValueError(f"Unknown task write: {write.kind}")
+        return failed
+
+    async def day_counts(self, user_id: str, start: datetime, end: datetime, zone=UTC):
+        groups = {}
+        for task in await self.list(user_id, start, end, one_off=True):
+            key = (local_date(task["date"], zone).isoformat(), task.get("priority"), task.get("task_type"), task.get("completed"))
+            row = groups.setdefault(key, {
+                "day": key[0], "priority": key[1], "task_type": key[2], "completed": key[3],
+                "count": 0, "earliest_time": None
+            })
+            row["count"] += 1
+            time = task.get("time")
+            if time is not None and (row["earliest_time"] is None or time < row["earliest_time"]):
+                row["earliest_time"] = time
+        return list(groups.values())
+
+    async def changed_since(self, user_id: str, since: datetime, limit: int, after_id: str = None):
+        is_newer = changed_after(since, after_id)
+        changed = [
+            self._tasks[task_id] for _, task_id in self._by_user.get(user_id, [])
+            if is_newer(self._tasks[task_id]["updated_at"], task_id)
+        ]
+        changed.sort(key=lambda task: (task["updated_at"], task["id"]))
+        return [clone(task) for task in changed[:limit]]
+
+    async def all(self, user_id: str):
+        return [clone(self._tasks[task_id]) for _, task_id in self._by_user.get(user_id, [])]
+
+    async def due_reminders(self, since: datetime, until: datetime):
+        since, until = stored_datetime(since), stored_datetime(until)
+        return [
+            {"id": task["id"], "reminder": task["reminder"]}
+            for task in self._tasks.values()
+            if isinstance(task.get("reminder"), datetime) and since <= task["reminder"] < until
+            and not task.get("reminder_sent") and task.get("completed") is False
+        ]
+
+    async def claim_reminder(self, task_id: str, fire_at: datetime):
+        task = self._tasks.get(task_id)
+        if task is None or task.get("reminder") != fire_at or task.get("reminder_sent"):
+            return None
+        previous = clone(task)
+        task["reminder_sent"] = True
+        return previous
+
+    async def release_reminder(self, task_id: str, fire_at: datetime):
+        task = self._tasks.get(task_id)
+        if task is not None and task.get("reminder") == fire_at:
+            task["reminder_sent"] = False
+
+class MemoryEvents(EventRepository):
+    def __init__(self):
+        self._events = {}
+        # user_id -> {event_id: None}, in insertion order
+        self._by_user = {}
+
+    def _user_events(self, user_id: str):
+        return (self._events[event_id] for event_id in self._by_user.get(user_id, {}))
+
+    def _insert(self, event: dict):
+        if event["id"] in self._events:
+            raise DuplicateError(f"Event {event['id']} already exists")
+        stored = self._events[event["id"]] = stored_document(event)
+        self._by_user.setdefault(event["user_id"], {})[event["id"]] = None
+        return clone(stored)
+
+    async def insert(self, event: dict) -> dict:
+        return self._insert(event)
+
+    async def insert_many(self, events: list) -> list:
+        return [self._insert(event) for event in events]
+
+    async def list(self, user_id: str, city: str = None, limit: int = None):
+        events = []
+        for event in self._user_events(user_id):
+            if city and event.get("city") != city:
+                continue
+            events.append(clone(event))
+            if limit and len(events) == limit:
+                break
+        return events
+
+    async def update(self, user_id: str, event_id: str, fields: dict) -> bool:
+        event = self._events.get(event_id)
+        if event is None or event["user_id"] != user_id:
+            return False
+        event.update(stored_document(fields))
+        return True
+
+    async def delete(self, user_id: str, event_id: str) -> bool:
+        event = self._events.get(event_id)
+        if event is None or event["user_id"] != user_id:
+            return False
+        del self._events[event_id]
+        del self._by_user[user_id][event_id]
+        return True
+
+    async def nearby(self, user_id: str, lat: float, lng: float, radius_km: float, limit: int):
+        matches = []
+        for event in self._user_events(user_id):
+            coordinates = (event.get("geo") or {}).get("coordinates")
+            if not coordinates:
+                continue
+            distance = distance_km(lat, lng, coordinates[1], coordinates[0])
+            if distance <= radius_km:
+                matches.append((distance, event))
+        matches.sort(key=lambda match: match[0])
+        return [dict(clone(event), distance_km=round(distance, 3)) for distance, event in matches[:limit]]
+
+    async def changed_since(self, user_id: str, since: datetime, limit: int, after_id: str = None):
+        is_newer = changed_after(since, after_id)
+        changed = sorted(
+            (event for event in self._user_events(user_id) if is_newer(event["updated_at"], event["id"])),
+            key=lambda event: (event["updated_at"], event["id"])
+        )
+        return [clone(event) for event in changed[:limit]]
+
+    async def all(self, user_id: str):
+        return [clone(event) for event in self._user_events(user_id)]
+
+class MemoryDayPlans(DayPlanRepository):
+    def __init__(self):
+        self._plans = {}
+        # user_id -> {plan_id: None}
+        self._by_user = {}
+
+    async def get(self, plan_id: str):
+        plan = self._plans.get(plan_id)
+        return clone(plan) if plan is not None else None
+
+    async def save(self, plan: dict):
+        self._plans[plan["id"]] = stored_document(plan)
+        self._by_user.setdefault(plan["user_id"], {})[plan["id"]] = None
+
+    def _delete(self, plan_id: str):
+        plan = self._plans.pop(plan_id, None)
+        if plan is not None:
+            del self._by_user[plan["user_id"]][plan_id]
+
+    async def delete_ids(self, plan_ids):
+        for plan_id in plan_ids:
+            self._delete(plan_id)
+
+    async def delete_from(self, user_id: str, day: datetime):
+        day = stored_datetime(day)
+        for plan_id in [p for p in self._by_user.get(user_id, {}) if self._plans[p]["date"] >= day]:
+            self._delete(plan_id)
+
+class MemoryTombstones(TombstoneRepository):
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self._by_user = {}
+
+    async def add(self, tombstone: dict):
+        await self.add_many([tombstone])
+
+    async def add_many(self, tombstones: list):
+        expired = datetime.utcnow() - timedelta(seconds=self.ttl)
+        for tombstone in tombstones:
+            entries = self._by_user.setdefault(tombstone["user_id"], [])
+            entries.append(stored_document(tombstone))
+            if entries[0]["deleted_at"] < expired:
+                self._by_user[tombstone["user_id"]] = [t for t in entries if t["deleted_at"] >= expired]
+
+    async def since(self, user_id: str, since: datetime, limit: int, after_id: str = None):
+        is_newer = changed_after(since, after_id)
+        entries = sorted(
+            (t for t in self._by_user.get(user_id, []) if is_newer(t["deleted_at"], t["id"])),
+            key=lambda t: (t["deleted_at"], t["id"])
+        )
+        return [{"kind": t["kind"], "id": t["id"], "deleted_at": t["deleted_at"]} for t in entries[:limit]]
+
+class MemoryIdempotency(IdempotencyRepository):
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self._records = {}
+
+    def _live(self, key: str):
+        record = self._records.get(key)
+        if record is not None and record["created_at"] < datetime.utcnow() - timedelta(seconds=self.ttl):
+            del self._records[key]
+            return None
+        return record
+
+    async def claim(self, record: dict):
+        if self._live(record["key"]) is not None:
+            raise DuplicateError(f"Idempotency key {record['key']} is held")
+        self._records[record["key"]] = stored_document(record)
+
+    async def get(self, key: str):
+        record = self._live(key)
+        return clone(record) if record is not None else None
+
+    async def take_over(self, key: str, stale_before: datetime, now: datetime) -> bool:
+        record = self._live(key)
+        if record is None or record["state"] != "pending" or record["created_at"] >= stored_datetime(stale_before):
+            return False
+        record["created_at"] = stored_datetime(now)
+        return True
+
+    async def complete(self, key: str, response):
+        record = self._records.get(key)
+        if record is not None:
+            record.update(state="done", response=stored_document(response))
+
+    async def release(self, key: str):
+        self._records.pop(key, None)
+
+class MemoryNotifications(NotificationRepository):
+    def __init__(self):
+        self.items = []
+
+    async def insert(self, notification: dict):
+        self.items.append(stored_document(notification))
+
+class MemoryStorage(Storage):
+    def __init__(self, idempotency_ttl: int = 86400, tombstone_ttl: int = 30 * 86400):
+        self.users = MemoryUsers()
+        self.tasks = MemoryTasks()
+        self.events = MemoryEvents()
+        self.day_plans = MemoryDayPlans()
+        self.tombstones = MemoryTombstones(tombstone_ttl)
+        self.idempotency = MemoryIdempotency(idempotency_ttl)
+        self.notifications = MemoryNotifications()
+
+    async def ensure_indexes(self, status: dict):
+        # The sorted task lists are maintained on every write; there is nothing to build
+        status.update(ready=True, built=0, total=0, current=None, error=None, retries=0)
@@ -0,0 +1,438 @@
+"""MongoDB storage backend (Motor)."""
+import asyncio
+import logging
+import time
+from datetime import datetime
+
+from pymongo import ASCENDING, GEOSPHERE, DeleteOne, InsertOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, PyMongoError
+
+from persistence import insert_document, insert_documents
+from recurrence import NO_REPEAT, is_recurring
+from repositories import (
+    DayPlanRepository,
+    DuplicateError,
+    EventRepository,
+    IdempotencyRepository,
+    NotificationRepository,
+    Storage,
+    TaskRepository,
+    TombstoneRepository,
+    UserRepository,
+)
+from time_zones import UTC
+
+logger = logging.getLogger("cc_calendar.storage")
+
+TASKS_SORT = [("date", ASCENDING), ("id", ASCENDING)]
+# Backoff between attempts at an index build that failed, e.g. while the server is unreachable
+INDEX_RETRY_INITIAL = 1.0
+INDEX_RETRY_MAX = 60.0
+NO_ID = {"_id": 0}
+# Tasks carry a derived one_off flag so series and one-off queries can use an
+# index, as the SQLite column does; it is not part of the API document
+TASK_FIELDS = {"_id": 0, "one_off": 0}
+
+def with_one_off(fields: dict) -> dict:
+    """``fields`` plus the one_off flag derived from ``repeat``, when they set it."""
+    if "repeat" not in fields:
+        return fields
+    return {**fields, "one_off": not is_recurring(fields["repeat"])}
+
+def changed_filter(user_id: str, field: str, since: datetime, after_id: str = None):
+    """Documents changed after ``since``, or at ``since`` with an id after ``after_id``."""
+    if after_id is None:
+        return {"user_id": user_id, field: {"$gt": since}}
+    return {"user_id": user_id, "$or": [{field: {"$gt": since}}, {field: since, "id": {"$gt": after_id}}]}
+
+def indexes(idempotency_ttl: int, tombstone_ttl: int):
+    """Indexes required by the queries below: (collection, keys, options)."""
+    return [
+        ("users", [("id", ASCENDING)], {"name": "users_id", "unique": True}),
+        ("users", [("name", ASCENDING)], {"name": "users_name", "unique": True}),
+        ("tasks", [("id", ASCENDING)], {"name": "tasks_id", "unique": True}),
+        ("tasks", [("user_id", ASCENDING), ("date", ASCENDING), ("completed", ASCENDING)], {"name": "tasks_user_date_completed"}),
+        ("tasks", [("user_id", ASCENDING), ("date", ASCENDING), ("id", ASCENDING)], {"name": "tasks_user_date_id"}),
+        ("tasks", [("user_id", ASCENDING), ("one_off", ASCENDING), ("date", ASCENDING), ("id", ASCENDING)], {"name": "tasks_user_one_off_date_id"}),
+        ("tasks", [("reminder", ASCENDING)], {"name": "tasks_reminder", "partialFilterExpression": {"reminder": {"$type": "date"}}}),
+        ("events", [("id", ASCENDING)], {"name": "events_id", "unique": True}),
+        ("events", [("user_id", ASCENDING), ("city", ASCENDING)], {"name": "events_user_city"}),
+        ("events", [("geo", GEOSPHERE), ("user_id", ASCENDING)], {"name": "events_geo_user"}),
+        ("tasks", [("user_id", ASCENDING), ("updated_at", ASCENDING)], {"name": "tasks_user_updated"}),
+        ("events", [("user_id", ASCENDING), ("updated_at", ASCENDING)], {"name": "events_user_updated"}),
+        ("tombstones", [("user_id", ASCENDING), ("deleted_at", ASCENDING)], {"name": "tombstones_user_deleted"}),
+        ("idempotency_keys", [("key", ASCENDING)], {"name": "idempotency_key", "unique": True}),
+        ("idempotency_keys", [("created_at", ASCENDING)], {"name": "idempotency_ttl", "expireAfterSeconds": idempotency_ttl}),
+        ("tombstones", [("deleted_at", ASCENDING)], {"name": "tombstones_ttl", "expireAfterSeconds": tombstone_ttl}),
+        ("day_plans", [("id", ASCENDING)], {"name": "day_plans_id", "unique": True}),
+        ("day_plans", [("user_id", ASCENDING), ("date", ASCENDING)], {"name": "day_plans_user_date"}),
+    ]
+
+class MongoUsers(UserRepository):
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def get(self, user_id: str):
+        return await self.collection.find_one({"id": user_id}, NO_ID)
+
+    async def find_by_name(self, name: str):
+        return await self.collection.find_one({"name": name}, NO_ID)
+
+    async def insert(self, user: dict) -> dict:
+        try:
+            return await insert_document(self.collection, user)
+        except DuplicateKeyError as exc:
+            raise DuplicateError(str(exc)) from exc
+
+    async def update(self, user_id: str, fields: dict) -> bool:
+        result = await self.collection.update_one({"id": user_id}, {"$set": fields})
+        return result.matched_count > 0
+
+class MongoTasks(TaskRepository):
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def insert(self, task: dict) -> dict:
+        stored = await insert_document(self.collection, with_one_off(task))
+        del stored["one_off"]
+        return stored
+
+    async def insert_many(self, tasks: list) -> list:
+        stored = await insert_documents(self.collection, [with_one_off(task) for task in tasks])
+        for task in stored:
+            del task["one_off"]
+        return stored
+
+    async def backfill_one_off(self):
+        """Set one_off on tasks written before it was stored."""
+        missing = {"one_off": {"$exists": False}}
+        await self.collection.update_many({**missing, "repeat": {"$in": list(NO_REPEAT)}}, {"$set": {"one_off": True}})
+        await self.collection.update_many({**missing, "repeat": {"$nin": list(NO_REPEAT)}}, {"$set": {"one_off": False}})
+
+    async def get_many(self, user_id: str, task_ids) -> dict:
+        cursor = self.collection.find({"user_id": user_id, "id": {"$in": list(task_ids)}}, TASK_FIELDS)
+        return {task["id"]: task async for task in cursor}
+
+    @staticmethod
+    def list_query(user_id: str, start, end, one_off: bool, pending: bool, after):
+        query = {"user_id": user_id}
+        if start is not None or end is not None:
+            query["date"] = {}
+            if start is not None:
+                query["date"]["$gte"] = start
+            if end is not None:
+                query["date"]["$lt"] = end
+        if one_off:
+            query["one_off"] = True
+        if pending:
+            query["completed"] = False
+        if after:
+            # Strictly after the (date, id) position
+            after_date, after_id = after
+            query = {"$and": [query, {"$or": [
+                {"date": {"$gt": after_date}},
+                {"date": after_date, "id": {"$gt": after_id}}
+            ]}]}
+        return query
+
+    async def list(self, user_id: str, start: datetime = None, end: datetime = None, *,
+                   one_off: bool = False, pending: bool = False, after=None, limit: int = None):
+        cursor = self.collection.find(self.list_query(user_id, start, end, one_off, pending, after), TASK_FIELDS).sort(TASKS_SORT)
+        if limit:
+            cursor = cursor.limit(limit)
+        return await cursor.to_list(limit)
+
+    async def iterate(self, user_id: str, start: datetime = None, end: datetime = None, *,
+                      one_off: bool = False, after=None, batch_size: int = 200):
+        # One server-side cursor, read batch by batch
+        query = self.list_query(user_id, start, end, one_off, False, after)
+        async for task in self.collection.find(query, TASK_FIELDS).sort(TASKS_SORT).batch_size(batch_size):
+            yield task
+
+    async def series(self, user_id: str, before: datetime):
+        return await self.collection.find({
+            "user_id": user_id,
+            "one_off": False,
+            "date": {"$lt": before}
+        }, TASK_FIELDS).to_list(None)
+
+    async def update(self, user_id: str, task_id: str, fields: dict):
+        return await self.collection.find_one_and_update(
+            {"id": task_id, "user_id": user_id},
+            {"$set": with_one_off(fields)},
+            projection=TASK_FIELDS,
+            return_document=ReturnDocument.BEFORE
+        )
+
+    @staticmethod
+    def override_update(key: str, fields: dict, updated_at: datetime, merge: bool):
+        if merge:
+            changes = {f"overrides.{key}.{field}": value for field, value in fields.items()}
+        else:
+            changes = {f"overrides.{key}": fields}
+        return {"$set": {**changes, "updated_at": updated_at}}
+
+    @staticmethod
+    def exception_update(key: str, updated_at: datetime):
+        return {
+            "$addToSet": {"exceptions": key},
+            "$unset": {f"overrides.{key}": ""},
+            "$set": {"updated_at": updated_at}
+        }
+
+    async def set_override(self, user_id: str, series_id: str, key: str, fields: dict,
+                           updated_at: datetime, merge: bool = False):
+        return await self.collection.find_one_and_update(
+            {"id": series_id, "user_id": user_id},
+            self.override_update(key, fields, updated_at, merge),
+            projection=TASK_FIELDS
+        )
+
+    async def add_exception(self, user_id: str, series_id: str, key: str, updated_at: datetime) -> bool:
+        result = await self.collection.update_one(
+            {"id": series_id, "user_id": user_id},
+            self.exception_update(key, updated_at)
+        )
+        return result.matched_count > 0
+
+    async def delete(self, user_id: str, task_id: str):
+        return await self.collection.find_one_and_delete({"id": task_id, "user_id": user_id}, projection=TASK_FIELDS)
+
+    async def apply(self, user_id: str, writes) -> dict:
+        operations = []
+        for write in writes:
+            selector = {"id": write.task_id, "user_id": user_id}
+            if write.kind == "insert":
+                operations.append(InsertOne(with_one_off(write.document)))
+            elif write.kind == "update":
+                operations.append(UpdateOne(selector, {"$set": with_one_off(write.fields)}))
+            elif write.kind == "override":
+                operations.append(UpdateOne(selector, self.override_update(write.key, write.fields, write.updated_at, write.merge)))
+            elif write.kind == "exception":
+                operations.append(UpdateOne(selector, self.exception_update(write.key, write.updated_at)))
+            elif write.kind == "delete":
+                operations.append(DeleteOne(selector))
+            else:
+                raise ValueError(f"Unknown task write: {write.kind}")
+        if not operations:
+            return {}
+
+        failed = {}
+        try:
+            await self.collection.bulk_write(operations, ordered=False)
+        except BulkWriteError as exc:
+            failed = {error["index"]: error["errmsg"] for error in exc.details.get("writeErrors", [])}
+        return failed
+
+    async def day_counts(self, user_id: str, start: datetime, end: datetime, zone=UTC):
+        # Only the grouped rows come back, not the tasks; the server buckets them by local day
+        pipeline = [
+            {"$match": {
+                "user_id": user_id,
+                "one_off": True,
+                "date": {"$gte": start, "$lt": end}
+            }},
+            {"$group": {
+                "_id": {
+                    "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$date", "timezone": zone.key}},
+                    "priority": "$priority",
+                    "task_type": "$task_type",
+                    "completed": "$completed"
+                },
+                "count": {"$sum": 1},
+                "earliest_time": {"$min": "$time"}
+            }}
+        ]
+        return [
+            {**row["_id"], "count": row["count"], "earliest_time": row["earliest_time"]}
+            async for row in self.collection.aggregate(pipeline)
+        ]
+
+    async def changed_since(self, user_id: str, since: datetime, limit: int, after_id: str = None):
+        return await self.collection.find(
+            changed_filter(user_id, "updated_at", since, after_id), TASK_FIELDS
+        ).sort([("updated_at", ASCENDING), ("id", ASCENDING)]).limit(limit).to_list(limit)
+
+    async def all(self, user_id: str):
+        return await self.collection.find({"user_id": user_id}, TASK_FIELDS).to_list(None)
+
+    async def due_reminders(self, since: datetime, until: datetime):
+        return await self.collection.find(
+            {"reminder": {"$gte": since, "$lt": until}, "reminder_sent": {"$ne": True}, "completed": False},
+            {"_id": 0, "id": 1, "reminder": 1}
+        ).to_list(None)
+
+    async def claim_reminder(self, task_id: str, fire_at: datetime):
+        return await self.collection.find_one_and_update(
+            {"id": task_id, "reminder": fire_at, "reminder_sent": {"$ne": True}},
+            {"$set": {"reminder_sent": True}},
+            projection=TASK_FIELDS
+        )
+
+    async def release_reminder(self, task_id: str, fire_at: datetime):
+        await self.collection.update_one({"id": task_id, "reminder": fire_at}, {"$set": {"reminder_sent": False}})
+
+class MongoEvents(EventRepository):
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def insert(self, event: dict) -> dict:
+        return await insert_document(self.collection, event)
+
+    async def insert_many(self, events: list) -> list:
+        return await insert_documents(self.collection, events)
+
+    async def list(self, user_id: str, city: str = None, limit: int = None):
+        query = {"user_id": user_id}
+        if city:
+            query["city"] = city
+        cursor = self.collection.find(query, NO_ID)
+        if limit:
+            cursor = cursor.limit(limit)
+        return await cursor.to_list(limit)
+
+    async def update(self, user_id: str, event_id: str, fields: dict) -> bool:
+        result = await self.collection.update_one({"id": event_id, "user_id": user_id}, {"$set": fields})
+        return result.matched_count > 0
+
+    async def delete(self, user_id: str, event_id: str) -> bool:
+        result = await self.collection.delete_one({"id": event_id, "user_id": user_id})
+        return result.deleted_count > 0
+
+    async def nearby(self, user_id: str, lat: float, lng: float, radius_km: float, limit: int):
+        # Served by the 2dsphere index
+        events = await self.collection.aggregate([
+            {"$geoNear": {
+                "near": {"type": "Point", "coordinates": [lng, lat]},
+                "key": "geo",
+                "distanceField": "distance_m",
+                "maxDistance": radius_km * 1000,
+                "query": {"user_id": user_id},
+                "spherical": True
+            }},
+            {"$limit": limit},
+            {"$project": NO_ID}
+        ]).to_list(limit)
+        for event in events:
+            event["distance_km"] = round(event.pop("distance_m") / 1000, 3)
+        return events
+
+    async def changed_since(self, user_id: str, since: datetime, limit: int, after_id: str = None):
+        return await self.collection.find(
+            changed_filter(user_id, "updated_at", since, after_id), NO_ID
+        ).sort([("updated_at", ASCENDING), ("id", ASCENDING)]).limit(limit).to_list(limit)
+
+    async def all(self, user_id: str):
+        return await self.collection.find({"user_id": user_id}, NO_ID).to_list(None)
+
+class MongoDayPlans(DayPlanRepository):
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def get(self, plan_id: str):
+        return await self.collection.find_one({"id": plan_id}, NO_ID)
+
+    async def save(self, plan: dict):
+        await self.collection.replace_one({"id": plan["id"]}, plan, upsert=True)
+
+    async def delete_ids(self, plan_ids):
+        await self.collection.delete_many({"id": {"$in": list(plan_ids)}})
+
+    async def delete_from(self, user_id: str, day: datetime):
+        await self.collection.delete_many({"user_id": user_id, "date": {"$gte": day}})
+
+class MongoTombstones(TombstoneRepository):
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def add(self, tombstone: dict):
+        await self.collection.insert_one(dict(tombstone))
+
+    async def add_many(self, tombstones: list):
+        if tombstones:
+            await self.collection.insert_many([dict(t) for t in tombstones])
+
+    async def since(self, user_id: str, since: datetime, limit: int, after_id: str = None):
+        return await self.collection.find(
+            changed_filter(user_id, "deleted_at", since, after_id),
+            {"_id": 0, "kind": 1, "id": 1, "deleted_at": 1}
+        ).sort([("deleted_at", ASCENDING), ("id", ASCENDING)]).limit(limit).to_list(limit)
+
+class MongoIdempotency(IdempotencyRepository):
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def claim(self, record: dict):
+        try:
+            await self.collection.insert_one(dict(record))
+        except DuplicateKeyError as exc:
+            raise DuplicateError(str(exc)) from exc
+
+    async def get(self, key: str):
+        return await self.collection.find_one({"key": key}, NO_ID)
+
+    async def take_over(self, key: str, stale_before: datetime, now: datetime) -> bool:
+        result = await self.collection.update_one(
+            {"key": key, "state": "pending", "created_at": {"$lt": stale_before}},
+            {"$set": {"created_at": now}}
+        )
+        return result.modified_count == 1
+
+    async def complete(self, key: str, response):
+        await self.collection.update_one({"key": key}, {"$set": {"state": "done", "response": response}})
+
+    async def release(self, key: str):
+        await self.collection.delete_one({"key": key})
+
+class MongoNotifications(NotificationRepository):
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def insert(self, notification: dict):
+        await self.collection.insert_one(dict(notification))
+
+class MongoStorage(Storage):
+    def __init__(self, db, idempotency_ttl: int = 86400, tombstone_ttl: int = 30 * 86400):
+        self.db = db
+        self.indexes = indexes(idempotency_ttl, tombstone_ttl)
+        self.users = MongoUsers(db.users)
+        self.tasks = MongoTasks(db.tasks)
+        self.events = MongoEvents(db.events)
+        self.day_plans = MongoDayPlans(db.day_plans)
+        self.tombstones = MongoTombstones(db.tombstones)
+        self.idempotency = MongoIdempotency(db.idempotency_keys)
+        self.notifications = MongoNotifications(db.notifications)
+
+    async def ensure_indexes(self, status: dict):
+        status.update(ready=False, built=0, total=len(self.indexes), current=None, error=None, retries=0)
+        # Queries on one_off rely on every task having it
+        status["current"] = "tasks.one_off backfill"
+        await self._retry(status, self.tasks.backfill_one_off)
+        for position, (collection, keys, options) in enumerate(self.indexes, start=1):
+            status["current"] = f"{collection}.{options['name']}"
+            logger.info("Ensuring index %s (%d/%d)", status["current"], position, len(self.indexes))
+            started = time.monotonic()
+            await self._retry(status, lambda: self.db[collection].create_index(keys, **options))
+            status.update(built=position)
+            logger.info("Index %s ready in %.2fs", status["current"], time.monotonic() - started)
+
+        status.update(ready=True, current=None)
+        logger.info("All %d indexes ready", len(self.indexes))
+
+    @staticmethod
+    async def _retry(status: dict, operation):
+        """Run ``operation`` until it succeeds, backing off between attempts."""
+        delay = INDEX_RETRY_INITIAL
+        while True:
+            try:
+                await operation()
+                break
+            except PyMongoError as exc:
+                # Keep retrying so a database that was down at boot does not
+                # leave /api/ready at 503 until a restart; the error stays visible there
+                status["error"] = f"{status['current']}: {exc}"
+                status["retries"] += 1
+                logger.error("%s failed, retrying in %.0fs: %s", status["current"], delay, exc)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, INDEX_RETRY_MAX)
+        status["error"] = None
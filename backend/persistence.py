@@ -0,0 +1,19 @@
+"""Write helpers shared by the create routes.
+
+The driver adds ``_id`` to documents it inserts; these helpers strip it again
+and return the documents as the database stored them (naive UTC datetimes at
+millisecond precision), without reading them back.
+"""
+from repositories import stored_document
+
+async def insert_document(collection, document: dict) -> dict:
+    await collection.insert_one(document)
+    document.pop("_id", None)
+    return stored_document(document)
+
+async def insert_documents(collection, documents: list) -> list:
+    if documents:
+        await collection.insert_many(documents)
+        for document in documents:
+            document.pop("_id", None)
+    return [stored_document(document) for document in documents]
@@ -0,0 +1,103 @@
+"""Persona message templates, compiled once into render functions.
+
+Templates live in a JSON file mapping message_type -> persona -> text. Text may
+reference the variables in ``VARIABLES`` as ``{name}``; anything else is
+rejected when the file is loaded. The file is re-read when its mtime changes,
+and a file that fails validation leaves the previous templates in place.
+"""
+import logging
+from string import Formatter
+
+from reloadable_file import ReloadableFile
+from scheduler import parse_clock
+
+logger = logging.getLogger("cc_calendar.personas")
+
+PERSONAS = ("casualBuddy", "caringSibling", "goodParent", "strictProfessional", "wildCard")
+
+# Supported variables and the text used when a caller does not supply one
+VARIABLES = {
+    "title": "this task",
+    "time": "the scheduled time",
+    "city": "your city",
+    "name": "friend",
+}
+
+FALLBACK_MESSAGE = "Hello! Time for your scheduled activity."
+
+class TemplateError(ValueError):
+    pass
+
+def format_clock_label(value):
+    """"15:30" -> "3:30 PM", "09:00" -> "9 AM"; anything that is not a valid clock time gets the default text."""
+    clock = parse_clock(value)
+    if clock is None:
+        return VARIABLES["time"]
+    hours, minutes = divmod(clock, 60)
+    suffix = "AM" if hours < 12 else "PM"
+    hours = hours % 12 or 12
+    return f"{hours} {suffix}" if minutes == 0 else f"{hours}:{minutes:02d} {suffix}"
+
+def compile_template(text: str):
+    parts = []
+    try:
+        parsed = list(Formatter().parse(text))
+    except ValueError as exc:
+        raise TemplateError(f"Malformed template {text!r}: {exc}") from exc
+
+    for literal, field, spec, conversion in parsed:
+        if literal:
+            parts.append(literal)
+        if field is None:
+            continue
+        if field not in VARIABLES or spec or conversion:
+            raise TemplateError(f"Unsupported placeholder {{{field}}} in {text!r}")
+        parts.append((field,))
+
+    if all(isinstance(part, str) for part in parts):
+        constant = "".join(parts)
+        return lambda variables: constant
+
+    def render(variables):
+        return "".join(
+            part if isinstance(part, str) else str(variables.get(part[0]) or VARIABLES[part[0]])
+            for part in parts
+        )
+    return render
+
+def compile_templates(raw) -> dict:
+    """Validate every message_type/persona pair and compile it."""
+    if not isinstance(raw, dict) or not raw:
+        raise TemplateError("Templates must be a non-empty object of message types")
+
+    compiled = {}
+    for message_type, by_persona in raw.items():
+        if not isinstance(by_persona, dict):
+            raise TemplateError(f"{message_type}: expected an object keyed by persona")
+        missing = [p for p in PERSONAS if p not in by_persona]
+        unknown = [p for p in by_persona if p not in PERSONAS]
+        if missing or unknown:
+            raise TemplateError(f"{message_type}: missing personas {missing}, unknown personas {unknown}")
+        compiled[message_type] = {}
+        for persona, text in by_persona.items():
+            if not isinstance(text, str):
+                raise TemplateError(f"{message_type}.{persona}: template must be a string")
+            compiled[message_type][persona] = compile_template(text)
+    return compiled
+
+class PersonaTemplates(ReloadableFile):
+    description = "persona templates"
+
+    def apply(self, raw):
+        self._compiled = compile_templates(raw)
+        logger.info("Loaded %d persona message types from %s", len(self._compiled), self.path)
+
+    def message_types(self):
+        return list(self._compiled)
+
+    def render(self, message_type: str, persona: str, **variables) -> str:
+        self.maybe_reload()
+        render = self._compiled.get(message_type, {}).get(persona)
+        if render is None:
+            return FALLBACK_MESSAGE
+        return render(variables)
@@ -0,0 +1,237 @@
+"""MongoDB command profiling and slow-query log.
+
+``QueryProfiler`` is a pymongo command listener. For every command it records
+the collection, the *shape* of its filter (field names and operators with the
+values replaced by ``"?"``), the duration and the number of documents
+returned, and aggregates them per shape. A command slower than the threshold
+is logged together with the winning plan from ``explain``; plans are cached
+per shape so a hot slow query is explained at most once per ``explain_ttl``.
+
+pymongo calls listeners from Motor's worker threads, so shared state is
+guarded by a lock and ``explain`` is handed to the event loop.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+
+from pymongo import monitoring
+
+from metrics import CommandMetrics
+
+logger = logging.getLogger("cc_calendar.queries")
+
+# Commands that carry a filter worth profiling, and where it lives
+FILTER_FIELDS = {
+    "find": "filter",
+    "count": "query",
+    "distinct": "query",
+    "findAndModify": "query",
+}
+EXPLAINABLE = ("find", "aggregate", "count", "distinct", "findAndModify", "delete", "update")
+# Session and transport fields that explain does not accept
+COMMAND_METADATA = ("lsid", "$db", "$clusterTime", "$readPreference", "txnNumber", "autocommit", "startTransaction")
+
+def shape_of(value):
+    """``{"user_id": "u1", "date": {"$gte": d}}`` -> ``{"user_id": "?", "date": {"$gte": "?"}}``."""
+    if isinstance(value, dict):
+        return {key: shape_of(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)) and value and all(isinstance(item, dict) for item in value):
+        return [shape_of(item) for item in value]
+    return "?"
+
+def command_shape(command_name: str, command) -> dict:
+    if command_name in FILTER_FIELDS:
+        shape = {"filter": shape_of(command.get(FILTER_FIELDS[command_name]) or {})}
+        if command.get("sort"):
+            shape["sort"] = dict(command["sort"])
+        return shape
+    if command_name == "aggregate":
+        # Stage names, plus the full shape of $match stages
+        return {"pipeline": [
+            {"$match": shape_of(stage["$match"])} if "$match" in stage else next(iter(stage), "?")
+            for stage in command.get("pipeline", [])
+        ]}
+    if command_name in ("delete", "update"):
+        statements = command.get("deletes" if command_name == "delete" else "updates") or [{}]
+        return {"filter": shape_of(statements[0].get("q") or {}), "statements": len(statements)}
+    return {}
+
+def documents_returned(reply) -> int:
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        return len(cursor.get("firstBatch", cursor.get("nextBatch", ())))
+    if "values" in reply:
+        return len(reply["values"])
+    return int(reply.get("n", 0) or 0)
+
+def summarize_plan(plan) -> str:
+    """``FETCH <- IXSCAN(tasks_user_date_id)`` from an explain winning plan."""
+    stages = []
+    while isinstance(plan, dict):
+        stage = plan.get("stage", "?")
+        if plan.get("indexName"):
+            stage += f"({plan['indexName']})"
+        stages.append(stage)
+        plan = plan.get("inputStage") or (plan.get("inputStages") or [None])[0] or plan.get("queryPlan")
+    return " <- ".join(stages) or "unknown"
+
+def winning_plan(explain: dict):
+    planner = explain.get("queryPlanner")
+    if planner is None:
+        # Aggregations nest the planner output in their first stage
+        for stage in explain.get("stages", []):
+            planner = stage.get("$cursor", {}).get("queryPlanner")
+            if planner:
+                break
+    return (planner or {}).get("winningPlan")
+
+class QueryProfiler(monitoring.CommandListener):
+    def __init__(self, slow_ms: float = 100, max_shapes: int = 500, explain_ttl: float = 600):
+        self.slow_ms = slow_ms
+        self.max_shapes = max_shapes
+        self.explain_ttl = explain_ttl
+        self.client = None
+        self.loop = None
+        self._started = {}
+        self._cursors = {}
+        self._shapes = {}
+        self._plans = {}
+        self._lock = threading.Lock()
+
+    def bind(self, client, loop):
+        """Enable ``explain`` for slow queries; called once the event loop is running."""
+        self.client = client
+        self.loop = loop
+
+    def started(self, event):
+        name = event.command_name
+        if name == "explain":
+            return
+        command = event.command
+        cursor_id = None
+        if name == "getMore":
+            # Batches fetched later are counted against the query that opened the cursor
+            cursor_id = command.get("getMore")
+            with self._lock:
+                key = self._cursors.get(cursor_id)
+            if key is None:
+                return
+        else:
+            shape = json.dumps(command_shape(name, command), sort_keys=True, default=str)
+            key = (CommandMetrics.collection_of(name, command), name, shape)
+        explain = dict(command) if name in EXPLAINABLE else None
+        with self._lock:
+            self._started[(event.connection_id, event.request_id)] = (key, explain, event.database_name, cursor_id)
+
+    def succeeded(self, event):
+        with self._lock:
+            started = self._started.pop((event.connection_id, event.request_id), None)
+        if started is None:
+            return
+        key, command, database, cursor_id = started
+        reply = event.reply
+        cursor = reply.get("cursor")
+        if isinstance(cursor, dict):
+            with self._lock:
+                if cursor_id is not None and not cursor.get("id"):
+                    self._cursors.pop(cursor_id, None)
+                elif cursor.get("id") and cursor_id is None:
+                    self._cursors[cursor["id"]] = key
+                    # Cursors abandoned without being exhausted must not accumulate
+                    while len(self._cursors) > self.max_shapes:
+                        self._cursors.pop(next(iter(self._cursors)))
+        self._record(key, event.duration_micros / 1000, documents_returned(reply), command, database, more=cursor_id is not None)
+
+    def failed(self, event):
+        with self._lock:
+            started = self._started.pop((event.connection_id, event.request_id), None)
+        if started is not None:
+            self._record(started[0], event.duration_micros / 1000, 0, None, None, failed=True, more=started[3] is not None)
+
+    def _record(self, key, duration_ms: float, documents: int, command, database, failed: bool = False, more: bool = False):
+        # ``more`` marks a getMore: its time and documents belong to the query that opened the cursor
+        with self._lock:
+            stats = self._shapes.get(key)
+            if stats is None:
+                if more:
+                    # The shape was evicted or reset while its cursor stayed open
+                    return
+                if len(self._shapes) >= self.max_shapes:
+                    # Make room by dropping the shape with the least total time
+                    evicted = min(self._shapes, key=lambda k: self._shapes[k]["total_ms"])
+                    del self._shapes[evicted]
+                    self._plans.pop(evicted, None)
+                stats = self._shapes[key] = {
+                    "collection": key[0],
+                    "command": key[1],
+                    "shape": key[2],
+                    "count": 0,
+                    "failures": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "documents": 0,
+                    "plan": None,
+                }
+            if not more:
+                stats["count"] += 1
+                stats["max_ms"] = max(stats["max_ms"], duration_ms)
+            stats["failures"] += failed
+            stats["total_ms"] += duration_ms
+            stats["documents"] += documents
+
+            if duration_ms < self.slow_ms:
+                return
+            now = time.monotonic()
+            plan, explained_at = self._plans.get(key, (None, None))
+            explain = command is not None and self.loop is not None and (
+                explained_at is None or now - explained_at >= self.explain_ttl
+            )
+            if explain:
+                # Claim the shape so concurrent slow runs do not explain it again
+                self._plans[key] = (plan, now)
+
+        if explain:
+            asyncio.run_coroutine_threadsafe(self._explain(key, command, database, duration_ms, documents), self.loop)
+        else:
+            self._log_slow(key, duration_ms, documents, plan)
+
+    def _log_slow(self, key, duration_ms: float, documents: int, plan):
+        logger.warning(
+            "Slow %s on %s: %.1f ms, %d docs, shape %s, plan %s",
+            key[1], key[0], duration_ms, documents, key[2], plan or "not explained"
+        )
+
+    async def _explain(self, key, command, database, duration_ms: float, documents: int):
+        for field in COMMAND_METADATA:
+            command.pop(field, None)
+        try:
+            explain = await self.client[database].command({"explain": command, "verbosity": "queryPlanner"})
+            plan = summarize_plan(winning_plan(explain))
+        except Exception as exc:
+            plan = f"explain failed: {exc}"
+        with self._lock:
+            self._plans[key] = (plan, time.monotonic())
+            if key in self._shapes:
+                self._shapes[key]["plan"] = plan
+        self._log_slow(key, duration_ms, documents, plan)
+
+    def top(self, limit: int = 20, sort: str = "max_ms"):
+        """The ``limit`` slowest shapes by ``max_ms``, ``total_ms`` or ``mean_ms``."""
+        with self._lock:
+            shapes = [
+                dict(stats, mean_ms=stats["total_ms"] / stats["count"] if stats["count"] else 0.0)
+                for stats in self._shapes.values()
+            ]
+        shapes.sort(key=lambda stats: stats[sort], reverse=True)
+        for stats in shapes:
+            for field in ("total_ms", "max_ms", "mean_ms"):
+                stats[field] = round(stats[field], 3)
+        return shapes[:limit]
+
+    def reset(self):
+        with self._lock:
+            self._shapes.clear()
+            self._plans.clear()
+            self._cursors.clear()
@@ -0,0 +1,131 @@
+"""Lazy expansion of Task.repeat rules into occurrences within a date window.
+
+A recurring task is stored once (the series) and expanded on read; edits and
+deletions of single occurrences are kept on the series document as
+``overrides`` (keyed by occurrence date) and ``exceptions``.
+
+Rules are expanded in the owner's wall-clock time, so a 09:00 series stays at
+09:00 across DST changes; occurrence dates are then converted back to UTC and
+keyed by their local date.
+"""
+import re
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+
+from dateutil.rrule import rrulestr
+
+NO_REPEAT = (None, "", "none")
+
+# Named repeat options offered by the task editor, as RRULE bodies
+PRESETS = {
+    "daily": "FREQ=DAILY",
+    "weekdays": "FREQ=WEEKLY;BYDAY=MO,TU,WE,TH,FR",
+    "weekly": "FREQ=WEEKLY",
+    "biweekly": "FREQ=WEEKLY;INTERVAL=2",
+    "monthly": "FREQ=MONTHLY",
+    "yearly": "FREQ=YEARLY",
+}
+
+OCCURRENCE_SEPARATOR = "@"
+OCCURRENCE_KEY_FORMAT = "%Y-%m-%d"
+
+# Stored dates are naive UTC, so a trailing Z on UNTIL is dropped before parsing
+_UTC_UNTIL = re.compile(r"(UNTIL=\d{8}(?:T\d{6})?)Z", re.IGNORECASE)
+
+def is_recurring(repeat) -> bool:
+    return repeat not in NO_REPEAT
+
+def to_utc_naive(value: datetime) -> datetime:
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def to_local_naive(value: datetime, zone) -> datetime:
+    """Wall-clock time of ``value`` in ``zone``; naive values are UTC."""
+    return to_utc_naive(value).replace(tzinfo=timezone.utc).astimezone(zone).replace(tzinfo=None)
+
+@lru_cache(maxsize=4096)
+def compile_rule(repeat: str, dtstart: datetime):
+    rule = PRESETS.get(repeat.lower(), repeat).strip()
+    if rule.upper().startswith("RRULE:"):
+        rule = rule[len("RRULE:"):]
+    rule = _UTC_UNTIL.sub(r"\1", rule)
+    try:
+        return rrulestr(rule, dtstart=dtstart)
+    except (ValueError, TypeError) as exc:
+        raise ValueError(f"Invalid repeat rule: {repeat}") from exc
+
+def validate_rule(repeat, dtstart: datetime):
+    """Raise ValueError if ``repeat`` cannot be expanded from ``dtstart``."""
+    if is_recurring(repeat):
+        compile_rule(repeat, to_utc_naive(dtstart))
+
+def occurrence_key(value: datetime) -> str:
+    return value.strftime(OCCURRENCE_KEY_FORMAT)
+
+def occurrence_id(series_id: str, key: str) -> str:
+    return f"{series_id}{OCCURRENCE_SEPARATOR}{key}"
+
+def split_occurrence_id(task_id: str):
+    """Return ``(series_id, occurrence_key)``; the key is None for plain task ids."""
+    series_id, separator, key = task_id.rpartition(OCCURRENCE_SEPARATOR)
+    if not separator:
+        return task_id, None
+    try:
+        datetime.strptime(key, OCCURRENCE_KEY_FORMAT)
+    except ValueError:
+        return task_id, None
+    return series_id, key
+
+def _occurrence(task: dict, series: dict, local_date: datetime, key: str, overrides: dict, zone):
+    occurrence = dict(series)
+    occurrence["date"] = to_utc_naive(local_date.replace(tzinfo=zone))
+    occurrence.update(overrides.get(key, {}))
+    occurrence["id"] = occurrence_id(task["id"], key)
+    occurrence["series_id"] = task["id"]
+    occurrence["occurrence_date"] = key
+    return occurrence
+
+def expand_task(task: dict, window_start: datetime, window_end: datetime, zone=timezone.utc):
+    """Yield the occurrences of a recurring ``task`` dated in [window_start, window_end), expanded in ``zone``."""
+    start = to_utc_naive(window_start)
+    end = to_utc_naive(window_end)
+    rule = compile_rule(task["repeat"], to_local_naive(task["date"], zone))
+    exceptions = set(task.get("exceptions") or ())
+    overrides = task.get("overrides") or {}
+    series = {k: v for k, v in task.items() if k not in ("overrides", "exceptions")}
+
+    # between() stops iterating at the window's end, so open-ended rules stay
+    # cheap; the local bounds are a day wider to cover any UTC offset
+    local_start = to_local_naive(start, zone) - timedelta(days=1)
+    local_end = to_local_naive(end, zone) + timedelta(days=1)
+    expanded = set()
+    for local_date in rule.between(local_start, local_end, inc=True):
+        key = occurrence_key(local_date)
+        expanded.add(key)
+        if key in exceptions:
+            continue
+        occurrence = _occurrence(task, series, local_date, key, overrides, zone)
+        if start <= to_utc_naive(occurrence["date"]) < end:
+            yield occurrence
+
+    # Occurrences moved into the window from days outside it
+    for key, fields in overrides.items():
+        moved_to = fields.get("date")
+        if key in expanded or key in exceptions or not isinstance(moved_to, datetime):
+            continue
+        if not start <= to_utc_naive(moved_to) < end:
+            continue
+        day = datetime.strptime(key, OCCURRENCE_KEY_FORMAT)
+        for local_date in rule.between(day, day + timedelta(days=1), inc=True):
+            if occurrence_key(local_date) == key:
+                yield _occurrence(task, series, local_date, key, overrides, zone)
+                break
+
+def expand_tasks(tasks, window_start: datetime, window_end: datetime, zone=timezone.utc):
+    """Expand every series in ``tasks`` and return the occurrences sorted by (date, id)."""
+    occurrences = []
+    for task in tasks:
+        occurrences.extend(expand_task(task, window_start, window_end, zone))
+    occurrences.sort(key=lambda o: (to_utc_naive(o["date"]), o["id"]))
+    return occurrences
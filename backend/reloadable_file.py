@@ -0,0 +1,46 @@
+"""JSON data files that are re-read when they change on disk.
+
+Subclasses turn the parsed file into their lookup tables in ``apply``, building
+them completely before swapping them in, so readers never see a partial
+reload. The mtime is checked at most every ``check_interval`` seconds, and a
+file that fails to load or validate leaves the previous tables in place.
+"""
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger("cc_calendar.reload")
+
+class ReloadableFile:
+    # Names the data in log messages
+    description = "data file"
+
+    def __init__(self, path: str, check_interval: float = 2.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._mtime = None
+        self._checked_at = 0.0
+        self.load()
+
+    def load(self):
+        mtime = os.stat(self.path).st_mtime
+        with open(self.path, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+        self.apply(raw)
+        self._mtime = mtime
+
+    def apply(self, raw):
+        """Validate ``raw`` and swap in the tables built from it; raise ValueError to reject it."""
+        raise NotImplementedError
+
+    def maybe_reload(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        try:
+            if os.stat(self.path).st_mtime != self._mtime:
+                self.load()
+        except (OSError, ValueError) as exc:
+            logger.error("Keeping previous %s; reload of %s failed: %s", self.description, self.path, exc)
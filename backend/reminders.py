@@ -0,0 +1,167 @@
+"""Background dispatch of Task.reminder notifications.
+
+Only reminders due within the next ``horizon`` are held in memory, in a min-heap
+loaded from an indexed range query on the task reminders; the window slides
+forward as time passes, so the number of pending reminders in storage
+does not affect memory or polling cost. Task writes call ``schedule``/``cancel``
+to keep the heap current between loads. A reminder whose notification fails is
+handed back to storage and retried until it is ``grace`` overdue.
+
+Reminders belong to task documents: a recurring series reminds once, at its
+own ``reminder``, and occurrences (``series@date``), including overrides that
+set a reminder, are never scheduled. A reminder that was sent is not sent
+again when a completed task is reopened; one that was not sent yet is.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+from datetime import datetime, timedelta
+
+from recurrence import to_utc_naive
+
+logger = logging.getLogger("cc_calendar.reminders")
+
+class LogSink:
+    """Writes notifications to the service log."""
+
+    async def emit(self, notification: dict):
+        logger.info("Reminder for user %s: %s", notification["user_id"], notification["message"])
+
+class StoreSink:
+    """Stores notifications for the client to pick up."""
+
+    def __init__(self, notifications):
+        self.notifications = notifications
+
+    async def emit(self, notification: dict):
+        await self.notifications.insert(notification)
+
+class ReminderScheduler:
+    def __init__(self, tasks, render, sink, horizon: timedelta = timedelta(minutes=15), grace: timedelta = timedelta(minutes=5),
+                 retry_delay: timedelta = timedelta(seconds=30)):
+        self.tasks = tasks
+        self.render = render
+        self.sink = sink
+        self.horizon = horizon
+        self.grace = grace
+        self.retry_delay = retry_delay
+        self.loaded_until = None
+        self.sent = 0
+        self._heap = []
+        self._due = {}
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._runner = None
+
+    def __len__(self):
+        return len(self._due)
+
+    def schedule(self, task: dict):
+        """Track ``task``'s reminder if it falls inside the loaded window; drop any earlier one."""
+        self.cancel(task["id"])
+        reminder = task.get("reminder")
+        if not isinstance(reminder, datetime) or task.get("completed") or self.loaded_until is None:
+            return
+
+        # Storage keeps millisecond precision; match what _fire will read back
+        fire_at = to_utc_naive(reminder)
+        fire_at = fire_at.replace(microsecond=fire_at.microsecond // 1000 * 1000)
+        if fire_at >= self.loaded_until:
+            return
+        self._push(task["id"], fire_at, fire_at)
+        self._wakeup.set()
+
+    def _push(self, task_id: str, fire_at: datetime, wake_at: datetime):
+        self._due[task_id] = fire_at
+        heapq.heappush(self._heap, (wake_at, next(self._counter), task_id, fire_at))
+
+    def cancel(self, task_id: str):
+        # Heap entries are discarded lazily when they no longer match _due
+        self._due.pop(task_id, None)
+
+    async def start(self):
+        # The first load runs in the background task, so an unreachable
+        # database at boot is retried there instead of failing startup
+        if self._runner is None:
+            self._runner = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._runner is not None:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
+            self._runner = None
+
+    async def _load(self, since: datetime, until: datetime):
+        due = await self.tasks.due_reminders(since, until)
+        self.loaded_until = until
+        for task in due:
+            self._push(task["id"], task["reminder"], task["reminder"])
+
+    async def _run(self):
+        while True:
+            try:
+                now = datetime.utcnow()
+                if self.loaded_until is None:
+                    await self._load(now - self.grace, now + self.horizon)
+                elif now + self.horizon / 2 >= self.loaded_until:
+                    await self._load(self.loaded_until, now + self.horizon)
+
+                while self._heap and self._heap[0][0] <= now:
+                    _, _, task_id, fire_at = heapq.heappop(self._heap)
+                    if self._due.get(task_id) == fire_at:
+                        del self._due[task_id]
+                        await self._attempt(task_id, fire_at, now)
+
+                wake_at = self.loaded_until - self.horizon / 2
+                if self._heap:
+                    wake_at = min(wake_at, self._heap[0][0])
+                timeout = max((wake_at - datetime.utcnow()).total_seconds(), 0)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Reminder dispatch failed")
+                timeout = 5
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _attempt(self, task_id: str, fire_at: datetime, now: datetime):
+        try:
+            await self._fire(task_id, fire_at)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            if now + self.retry_delay - fire_at > self.grace:
+                logger.exception("Reminder for task %s failed; giving up", task_id)
+                return
+            logger.exception("Reminder for task %s failed; retrying", task_id)
+            self._push(task_id, fire_at, now + self.retry_delay)
+
+    async def _fire(self, task_id: str, fire_at: datetime):
+        # Claiming the reminder atomically keeps several workers from sending it twice
+        task = await self.tasks.claim_reminder(task_id, fire_at)
+        if task is None:
+            return
+
+        try:
+            notification = {
+                "task_id": task["id"],
+                "user_id": task["user_id"],
+                "title": task["title"],
+                "reminder": fire_at,
+                "message": await self.render(task),
+                "created_at": datetime.utcnow()
+            }
+            await self.sink.emit(notification)
+        except BaseException:
+            # Hand the claim back so the reminder can be sent again
+            await self.tasks.release_reminder(task_id, fire_at)
+            raise
+        self.sent += 1
@@ -0,0 +1,250 @@
+"""Storage interfaces used by the API.
+
+Each repository covers one kind of document and speaks in the operations the
+routes need (a day's one-off tasks, a series override, a sync page) rather
+than in query documents, so a backend only has to implement those. Documents
+are plain dicts shaped like the Pydantic models in server.py; datetimes come
+back as naive UTC with millisecond precision, as Mongo returns them.
+
+Backends: ``mongo_storage.MongoStorage`` and ``sqlite_storage.SQLiteStorage``.
+"""
+import math
+from collections import namedtuple
+from datetime import datetime
+
+from recurrence import to_utc_naive
+from time_zones import UTC
+
+class DuplicateError(Exception):
+    """A document with the same unique key already exists."""
+
+# One write in TaskRepository.apply():
+#   insert    document
+#   update    task_id, fields
+#   override  task_id, key, fields (merge=True updates single fields of an existing override)
+#   exception task_id, key
+#   delete    task_id
+TaskWrite = namedtuple("TaskWrite", "kind task_id key fields document merge updated_at")
+TaskWrite.__new__.__defaults__ = (None, None, None, None, False, None)
+
+def stored_datetime(value: datetime) -> datetime:
+    """Naive UTC truncated to milliseconds, the form Mongo hands back."""
+    value = to_utc_naive(value)
+    return value.replace(microsecond=value.microsecond // 1000 * 1000)
+
+def stored_document(value):
+    """Copy ``value`` with every datetime in the form ``stored_datetime`` returns."""
+    if isinstance(value, datetime):
+        return stored_datetime(value)
+    if isinstance(value, dict):
+        return {key: stored_document(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [stored_document(item) for item in value]
+    return value
+
+def distance_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance on a spherical Earth, as 2dsphere queries measure it."""
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * 6378.1 * math.asin(min(1.0, math.sqrt(a)))
+
+class UserRepository:
+    async def get(self, user_id: str):
+        raise NotImplementedError
+
+    async def find_by_name(self, name: str):
+        raise NotImplementedError
+
+    async def insert(self, user: dict) -> dict:
+        """Store ``user`` and return its stored form; raises DuplicateError for a taken id or name."""
+        raise NotImplementedError
+
+    async def update(self, user_id: str, fields: dict) -> bool:
+        """Set ``fields`` on the user; False when there is no such user."""
+        raise NotImplementedError
+
+class TaskRepository:
+    async def insert(self, task: dict) -> dict:
+        """Store ``task``; returns it as reads will, in ``stored_document`` form."""
+        raise NotImplementedError
+
+    async def insert_many(self, tasks: list) -> list:
+        raise NotImplementedError
+
+    async def get_many(self, user_id: str, task_ids) -> dict:
+        """``{id: task}`` for the user's tasks among ``task_ids``."""
+        raise NotImplementedError
+
+    async def list(self, user_id: str, start: datetime = None, end: datetime = None, *,
+                   one_off: bool = False, pending: bool = False, after=None, limit: int = None):
+        """The user's tasks in (date, id) order.
+
+        ``start``/``end`` bound ``date`` to [start, end); ``one_off`` leaves out
+        recurring series, ``pending`` completed tasks, and ``after`` is a
+        ``(date, id)`` position to continue after.
+        """
+        raise NotImplementedError
+
+    async def iterate(self, user_id: str, start: datetime = None, end: datetime = None, *,
+                      one_off: bool = False, after=None, batch_size: int = 200):
+        """Like ``list`` without a limit, fetched ``batch_size`` tasks at a time."""
+        while True:
+            batch = await self.list(user_id, start, end, one_off=one_off, after=after, limit=batch_size)
+            for task in batch:
+                yield task
+            if len(batch) < batch_size:
+                return
+            after = (to_utc_naive(batch[-1]["date"]), batch[-1]["id"])
+
+    async def series(self, user_id: str, before: datetime):
+        """The user's recurring tasks whose series starts before ``before``."""
+        raise NotImplementedError
+
+    async def update(self, user_id: str, task_id: str, fields: dict):
+        """Set ``fields`` on a task; returns the task as it was before, or None."""
+        raise NotImplementedError
+
+    async def set_override(self, user_id: str, series_id: str, key: str, fields: dict,
+                           updated_at: datetime, merge: bool = False):
+        """Store ``fields`` as the override for one occurrence; returns the series or None."""
+        raise NotImplementedError
+
+    async def add_exception(self, user_id: str, series_id: str, key: str, updated_at: datetime) -> bool:
+        """Skip one occurrence of a series and drop its override."""
+        raise NotImplementedError
+
+    async def delete(self, user_id: str, task_id: str):
+        """Delete a task; returns the deleted task, or None."""
+        raise NotImplementedError
+
+    async def apply(self, user_id: str, writes) -> dict:
+        """Run ``TaskWrite``s in one batch; returns ``{position: error}`` for those that failed."""
+        raise NotImplementedError
+
+    async def day_counts(self, user_id: str, start: datetime, end: datetime, zone=UTC):
+        """One-off tasks in [start, end) grouped by (day, priority, task_type, completed).
+
+        ``day`` is the "YYYY-MM-DD" local date in ``zone``. Rows are dicts with
+        those keys plus ``count`` and ``earliest_time``.
+        """
+        raise NotImplementedError
+
+    async def changed_since(self, user_id: str, since: datetime, limit: int, after_id: str = None):
+        """Tasks updated after ``since``, ordered by (updated_at, id).
+
+        With ``after_id``, tasks updated exactly at ``since`` with a greater id
+        are included too, so a page cut inside one millisecond can resume.
+        """
+        raise NotImplementedError
+
+    async def all(self, user_id: str):
+        raise NotImplementedError
+
+    async def due_reminders(self, since: datetime, until: datetime):
+        """``{"id", "reminder"}`` for unsent reminders of open tasks in [since, until)."""
+        raise NotImplementedError
+
+    async def claim_reminder(self, task_id: str, fire_at: datetime):
+        """Mark a reminder sent unless already sent; returns the task only to the caller that claimed it."""
+        raise NotImplementedError
+
+    async def release_reminder(self, task_id: str, fire_at: datetime):
+        """Undo ``claim_reminder`` after the notification could not be sent."""
+        raise NotImplementedError
+
+class EventRepository:
+    async def insert(self, event: dict) -> dict:
+        """Store ``event``; returns it as reads will, in ``stored_document`` form."""
+        raise NotImplementedError
+
+    async def insert_many(self, events: list) -> list:
+        raise NotImplementedError
+
+    async def list(self, user_id: str, city: str = None, limit: int = None):
+        raise NotImplementedError
+
+    async def update(self, user_id: str, event_id: str, fields: dict) -> bool:
+        raise NotImplementedError
+
+    async def delete(self, user_id: str, event_id: str) -> bool:
+        raise NotImplementedError
+
+    async def nearby(self, user_id: str, lat: float, lng: float, radius_km: float, limit: int):
+        """The user's geotagged events within ``radius_km``, nearest first, with ``distance_km``."""
+        raise NotImplementedError
+
+    async def changed_since(self, user_id: str, since: datetime, limit: int, after_id: str = None):
+        """Same contract as ``TaskRepository.changed_since``."""
+        raise NotImplementedError
+
+    async def all(self, user_id: str):
+        raise NotImplementedError
+
+class DayPlanRepository:
+    async def get(self, plan_id: str):
+        raise NotImplementedError
+
+    async def save(self, plan: dict):
+        """Insert or replace the plan with ``plan["id"]``."""
+        raise NotImplementedError
+
+    async def delete_ids(self, plan_ids):
+        raise NotImplementedError
+
+    async def delete_from(self, user_id: str, day: datetime):
+        """Drop the user's plans for ``day`` and every later day."""
+        raise NotImplementedError
+
+class TombstoneRepository:
+    async def add(self, tombstone: dict):
+        raise NotImplementedError
+
+    async def add_many(self, tombstones: list):
+        raise NotImplementedError
+
+    async def since(self, user_id: str, since: datetime, limit: int, after_id: str = None):
+        """``{"kind", "id", "deleted_at"}`` for deletions after ``since``, ordered by (deleted_at, id).
+
+        ``after_id`` resumes inside ``since``'s millisecond as in ``TaskRepository.changed_since``.
+        """
+        raise NotImplementedError
+
+class IdempotencyRepository:
+    async def claim(self, record: dict):
+        """Store a new key record; raises DuplicateError when the key is already held."""
+        raise NotImplementedError
+
+    async def get(self, key: str):
+        raise NotImplementedError
+
+    async def take_over(self, key: str, stale_before: datetime, now: datetime) -> bool:
+        """Restart a pending claim made before ``stale_before``; True only for the caller that took it."""
+        raise NotImplementedError
+
+    async def complete(self, key: str, response):
+        raise NotImplementedError
+
+    async def release(self, key: str):
+        raise NotImplementedError
+
+class NotificationRepository:
+    async def insert(self, notification: dict):
+        raise NotImplementedError
+
+class Storage:
+    """The repositories of one backend."""
+
+    users: UserRepository
+    tasks: TaskRepository
+    events: EventRepository
+    day_plans: DayPlanRepository
+    tombstones: TombstoneRepository
+    idempotency: IdempotencyRepository
+    notifications: NotificationRepository
+
+    async def ensure_indexes(self, status: dict):
+        """Create indexes, reporting progress in ``status`` (ready, built, total, current, error)."""
+        raise NotImplementedError
+
+    async def close(self):
+        pass
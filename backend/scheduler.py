@@ -0,0 +1,232 @@
+"""Interval-based scheduler behind Plan My Day.
+
+Tasks with a ``time`` are anchored at that time; the rest are packed into the
+remaining free slots of the day, earliest deadline first, then by priority.
+Durations come from ``timer_duration`` (minutes). Given a ``zone``, task dates
+and deadlines (naive UTC) are read as wall-clock time there.
+"""
+from bisect import bisect_right
+from datetime import date, datetime, timedelta, timezone
+
+DAY_START = 7 * 60
+DAY_END = 22 * 60
+DEFAULT_DURATION = 30
+MINUTES_PER_DAY = 24 * 60
+
+PRIORITY_RANK = {"high": 0, "medium": 1, "low": 2}
+
+# Where flexible tasks of a type are placed first, if there is room
+PREFERRED_WINDOWS = {
+    "exercise": (6 * 60, 12 * 60),
+    "meal": (6 * 60, 12 * 60),
+    "work": (9 * 60, 17 * 60),
+    "meeting": (9 * 60, 17 * 60),
+}
+
+def parse_clock(value):
+    """Return minutes after midnight for "HH:MM", or None."""
+    if not value:
+        return None
+    try:
+        hours, minutes = value.split(":")[:2]
+        hours, minutes = int(hours), int(minutes)
+    except (AttributeError, ValueError):
+        return None
+    if 0 <= hours < 24 and 0 <= minutes < 60:
+        return hours * 60 + minutes
+    return None
+
+def parse_duration(value, default: int = DEFAULT_DURATION) -> int:
+    """Minutes from timer_duration values such as "30", "45m", "1h", "1h30" or "1:30"."""
+    if value is None or value == "":
+        return default
+    text = str(value).strip().lower().replace(" ", "")
+    try:
+        if ":" in text:
+            hours, minutes = text.split(":", 1)
+            minutes = int(hours) * 60 + int(minutes)
+        elif "h" in text:
+            hours, _, minutes = text.partition("h")
+            minutes = int(float(hours) * 60) + int(minutes.rstrip("m") or 0)
+        else:
+            minutes = int(float(text.rstrip("m")))
+    except ValueError:
+        return default
+    return minutes if minutes > 0 else default
+
+def format_clock(minutes: int) -> str:
+    minutes = min(max(minutes, 0), MINUTES_PER_DAY)
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+def _local(value, zone):
+    """``value`` as naive wall-clock time in ``zone``; naive datetimes are UTC."""
+    if zone is None or not isinstance(value, datetime):
+        return value
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(zone).replace(tzinfo=None)
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return None
+
+class FreeSlots:
+    """Sorted, disjoint [start, end) minute intervals that are still free."""
+
+    def __init__(self, start: int, end: int):
+        self.starts = [start] if start < end else []
+        self.ends = [end] if start < end else []
+
+    def reserve(self, start: int, end: int):
+        """Remove [start, end) from the free intervals, splitting any gap it falls inside."""
+        i = max(bisect_right(self.starts, start) - 1, 0)
+        while i < len(self.starts) and self.starts[i] < end:
+            gap_start, gap_end = self.starts[i], self.ends[i]
+            if gap_end <= start:
+                i += 1
+                continue
+
+            pieces = []
+            if gap_start < start:
+                pieces.append((gap_start, start))
+            if end < gap_end:
+                pieces.append((end, gap_end))
+            self.starts[i:i + 1] = [p[0] for p in pieces]
+            self.ends[i:i + 1] = [p[1] for p in pieces]
+            i += len(pieces)
+
+    def first_fit(self, duration: int, earliest: int, latest: int):
+        """Earliest start >= earliest such that [start, start + duration) is free and ends by latest."""
+        i = max(bisect_right(self.starts, earliest) - 1, 0)
+        while i < len(self.starts) and self.starts[i] < latest:
+            start = max(self.starts[i], earliest)
+            if start + duration <= min(self.ends[i], latest):
+                return start
+            i += 1
+        return None
+
+def _deadline_minutes(task: dict, day, zone=None):
+    """Minutes into ``day`` by which the task must end, or None if unconstrained."""
+    deadline = _local(task.get("deadline"), zone)
+    if not isinstance(deadline, datetime) or day is None:
+        return None
+    if deadline.date() < day:
+        return 0
+    if deadline.date() > day:
+        return None
+    return deadline.hour * 60 + deadline.minute
+
+def _entry(task: dict, start, duration: int, fixed: bool):
+    entry = dict(task)
+    entry["start"] = format_clock(start) if start is not None else None
+    entry["end"] = format_clock(start + duration) if start is not None else None
+    entry["duration"] = duration
+    entry["fixed"] = fixed
+    entry["conflict"] = False
+    entry["late"] = False
+    entry["unscheduled"] = start is None
+    return entry
+
+def plan_day(tasks, day=None, day_start: int = DAY_START, day_end: int = DAY_END, zone=None):
+    """Schedule one day's tasks.
+
+    Returns ``(timeline, unscheduled)``: the timeline lists all-day tasks first,
+    then placed tasks in start order, each annotated with start/end/duration and
+    conflict/late flags; ``unscheduled`` holds the flexible tasks that did not fit.
+    """
+    day = _as_date(day)
+    slots = FreeSlots(day_start, day_end)
+    placed = []
+    flexible = []
+
+    # Anchored tasks first; a sweep over them in start order finds overlaps
+    anchored = []
+    for index, task in enumerate(tasks):
+        duration = parse_duration(task.get("timer_duration"))
+        if task.get("all_day"):
+            entry = _entry(task, None, duration, fixed=False)
+            entry["unscheduled"] = False
+            entry["_start"] = -1
+            placed.append(entry)
+            continue
+        start = parse_clock(task.get("time"))
+        if start is None:
+            flexible.append((index, task, duration))
+        else:
+            anchored.append((start, index, task, duration))
+    anchored.sort(key=lambda item: (item[0], item[1]))
+
+    latest_end, latest_entry = -1, None
+    for start, _, task, duration in anchored:
+        entry = _entry(task, start, duration, fixed=True)
+        entry["_start"] = start
+        if start < latest_end:
+            entry["conflict"] = True
+            latest_entry["conflict"] = True
+        if start + duration > latest_end:
+            latest_end, latest_entry = start + duration, entry
+        deadline = _deadline_minutes(task, day, zone)
+        if deadline is not None and start + duration > deadline:
+            entry["late"] = True
+        slots.reserve(start, start + duration)
+        placed.append(entry)
+
+    # Flexible tasks: earliest deadline first, then priority, then input order
+    def urgency(item):
+        index, task, _ = item
+        deadline = task.get("deadline")
+        deadline_key = deadline.replace(tzinfo=None) if isinstance(deadline, datetime) else datetime.max
+        return deadline_key, PRIORITY_RANK.get(task.get("priority"), 1), index
+
+    unscheduled = []
+    for _, task, duration in sorted(flexible, key=urgency):
+        deadline = _deadline_minutes(task, day, zone)
+        latest = day_end if deadline is None else min(deadline, day_end)
+        preferred = PREFERRED_WINDOWS.get(task.get("task_type"))
+
+        start = None
+        if preferred:
+            start = slots.first_fit(duration, max(preferred[0], day_start), min(preferred[1], latest))
+        if start is None:
+            start = slots.first_fit(duration, day_start, latest)
+        late = False
+        if start is None and latest < day_end:
+            start = slots.first_fit(duration, day_start, day_end)
+            late = start is not None
+        if start is None:
+            unscheduled.append(task)
+            continue
+
+        entry = _entry(task, start, duration, fixed=False)
+        entry["_start"] = start
+        entry["late"] = late
+        slots.reserve(start, start + duration)
+        placed.append(entry)
+
+    placed.sort(key=lambda entry: entry.pop("_start"))
+    return placed, unscheduled
+
+def plan_range(tasks, start_day, days: int = 7, day_start: int = DAY_START, day_end: int = DAY_END, zone=None):
+    """Plan consecutive days in one pass, carrying flexible tasks that did not fit onto the next day.
+
+    Returns ``{"YYYY-MM-DD": {"timeline": [...], "unscheduled": [...]}}``.
+    """
+    start_day = _as_date(start_day)
+    by_day = {}
+    for task in tasks:
+        task_day = _as_date(_local(task.get("date"), zone)) or start_day
+        by_day.setdefault(max(task_day, start_day), []).append(task)
+
+    plans = {}
+    carry = []
+    for offset in range(days):
+        day = start_day + timedelta(days=offset)
+        timeline, unscheduled = plan_day(carry + by_day.get(day, []), day, day_start, day_end, zone)
+        carry = unscheduled
+        plans[day.isoformat()] = {"timeline": timeline, "unscheduled": []}
+    if carry and plans:
+        plans[day.isoformat()]["unscheduled"] = carry
+    return plans
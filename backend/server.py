@@ -1,16 +1,55 @@
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Header, Query, Request, status
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from motor.motor_asyncio import AsyncIOMotorClient
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Any, Optional, List
 from datetime import datetime, timedelta
+from collections import OrderedDict
+import asyncio
+import base64
+import hashlib
+import hmac
 import json
+import logging
 import os
+import time
 from jose import JWTError, jwt
+import heapq
 import uuid
 
+from recurrence import (
+    compile_rule,
+    expand_tasks,
+    split_occurrence_id,
+    to_utc_naive,
+    is_recurring,
+    validate_rule,
+)
+from city_catalog import CityCatalog
+from holiday_calendar import HolidayCalendar
+from memory_storage import MemoryStorage
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, CommandMetrics, MetricsMiddleware, Registry
+from mongo_storage import MongoStorage
+from persona_templates import PERSONAS, PersonaTemplates, format_clock_label
+from query_profiler import QueryProfiler
+from reminders import LogSink, ReminderScheduler, StoreSink
+from repositories import DuplicateError, TaskWrite
+from scheduler import plan_day, plan_range
+from sqlite_storage import SQLiteStorage
+from time_zones import day_window, local_date, local_today, user_zone, zone_name
+
+# Opt-in orjson responses; needs the orjson package
+FAST_JSON = os.environ.get("FAST_JSON", "false").lower() == "true"
+
 app = FastAPI(title="Cc Calendar API", version="1.0.0")
+if FAST_JSON:
+    from fast_json import FastJSONRoute
+    app.router.route_class = FastJSONRoute
+
+logger = logging.getLogger("cc_calendar")
 
 # CORS middleware
 app.add_middleware(
@@ -21,10 +60,34 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Database connection
+# Metrics, exposed at /api/metrics
+metrics = Registry()
+http_requests = metrics.counter("cc_http_requests_total", "HTTP requests by method, route and status", ("method", "route", "status"))
+http_latency = metrics.histogram("cc_http_request_duration_seconds", "HTTP request latency by method and route", ("method", "route"))
+http_in_flight = metrics.gauge("cc_http_requests_in_flight", "HTTP requests currently being served")
+auth_latency = metrics.histogram("cc_auth_duration_seconds", "Time spent in get_current_user, including the user lookup")
+mongo_latency = metrics.histogram("cc_mongo_command_duration_seconds", "MongoDB command latency by collection and command", ("collection", "command"))
+mongo_failures = metrics.counter("cc_mongo_command_failures_total", "Failed MongoDB commands by collection and command", ("collection", "command"))
+cache_hits = metrics.counter("cc_cache_hits_total", "Cache hits by cache", ("cache",))
+cache_misses = metrics.counter("cc_cache_misses_total", "Cache misses by cache", ("cache",))
+cache_size = metrics.gauge("cc_cache_entries", "Entries currently held by each cache", ("cache",))
+
+app.add_middleware(MetricsMiddleware, requests=http_requests, latency=http_latency, in_flight=http_in_flight)
+
+# Query profiling: commands slower than SLOW_QUERY_MS are logged with their explain plan
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "100"))
+QUERY_PROFILE_SHAPES = int(os.environ.get("QUERY_PROFILE_SHAPES", "500"))
+query_profiler = QueryProfiler(slow_ms=SLOW_QUERY_MS, max_shapes=QUERY_PROFILE_SHAPES)
+
+# Admin endpoints are disabled unless ADMIN_TOKEN is set
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+
+# Database connection: mongo, sqlite for single-node deployments without a database
+# server, or memory for tests and profiling (nothing is persisted)
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "mongo").lower()
 MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017/cc_calendar")
-client = AsyncIOMotorClient(MONGO_URL)
-db = client.cc_calendar
+SQLITE_PATH = os.environ.get("SQLITE_PATH", "cc_calendar.db")
+SQLITE_READERS = int(os.environ.get("SQLITE_READERS", "4"))
 
 # JWT settings
 JWT_SECRET = os.environ.get("JWT_SECRET", "cc_calendar_jwt_secret_key_2024")
@@ -33,9 +96,84 @@ JWT_ALGORITHM = "HS256"
 # Security
 security = HTTPBearer()
 
-# Load persona templates
-with open('/app/assets/persona_templates.json', 'r') as f:
-    PERSONA_TEMPLATES = json.load(f)
+# Delta sync
+SYNC_TOMBSTONE_DAYS = int(os.environ.get("SYNC_TOMBSTONE_DAYS", "30"))
+SYNC_PAGE_SIZE = int(os.environ.get("SYNC_PAGE_SIZE", "500"))
+# Tokens trail the clock so writes committed while a sync runs are not skipped
+SYNC_SKEW = timedelta(seconds=5)
+SYNC_EPOCH = datetime(1970, 1, 1)
+# Tasks, events and tombstones each keep their own resume point in a token
+SYNC_STREAMS = 3
+
+# Idempotency keys for create routes
+IDEMPOTENCY_TTL_HOURS = int(os.environ.get("IDEMPOTENCY_TTL_HOURS", "24"))
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+# A pending claim older than this is taken to belong to a request that died
+IDEMPOTENCY_LEASE_SECONDS = int(os.environ.get("IDEMPOTENCY_LEASE_SECONDS", "60"))
+
+# Storage
+if STORAGE_BACKEND == "mongo":
+    client = AsyncIOMotorClient(MONGO_URL, event_listeners=[CommandMetrics(mongo_latency, mongo_failures), query_profiler])
+    storage = MongoStorage(client.cc_calendar, IDEMPOTENCY_TTL_HOURS * 3600, SYNC_TOMBSTONE_DAYS * 86400)
+elif STORAGE_BACKEND == "sqlite":
+    client = None
+    storage = SQLiteStorage(SQLITE_PATH, SQLITE_READERS, IDEMPOTENCY_TTL_HOURS * 3600, SYNC_TOMBSTONE_DAYS * 86400)
+elif STORAGE_BACKEND == "memory":
+    client = None
+    storage = MemoryStorage(IDEMPOTENCY_TTL_HOURS * 3600, SYNC_TOMBSTONE_DAYS * 86400)
+else:
+    raise ValueError(f"Unknown STORAGE_BACKEND: {STORAGE_BACKEND}")
+
+index_status = {"ready": False, "built": 0, "total": 0, "current": None, "error": None, "retries": 0}
+
+# Task list paging
+TASKS_PAGE_SIZE = int(os.environ.get("TASKS_PAGE_SIZE", "200"))
+TASKS_MAX_PAGE_SIZE = int(os.environ.get("TASKS_MAX_PAGE_SIZE", "1000"))
+CALENDAR_SUMMARY_MAX_DAYS = 92
+
+# Reminder dispatch
+REMINDERS_ENABLED = os.environ.get("REMINDERS_ENABLED", "true").lower() == "true"
+REMINDER_SINK = os.environ.get("REMINDER_SINK", "log")  # log | store ("mongo" is accepted for store)
+REMINDER_HORIZON_MINUTES = int(os.environ.get("REMINDER_HORIZON_MINUTES", "15"))
+
+# Nearby search
+NEARBY_DEFAULT_RADIUS_KM = float(os.environ.get("NEARBY_DEFAULT_RADIUS_KM", "25"))
+NEARBY_MAX_RADIUS_KM = 500.0
+NEARBY_DEFAULT_LIMIT = 20
+NEARBY_MAX_LIMIT = 100
+
+# Largest list accepted by the :batch create endpoints
+BATCH_MAX_ITEMS = int(os.environ.get("BATCH_MAX_ITEMS", "500"))
+
+# Sub-requests accepted by POST /api/batch
+BATCH_MAX_REQUESTS = int(os.environ.get("BATCH_MAX_REQUESTS", "20"))
+BATCH_METHODS = ("GET", "POST", "PUT", "DELETE")
+
+# Authenticated-user cache settings
+USER_CACHE_TTL = float(os.environ.get("USER_CACHE_TTL", "30"))
+USER_CACHE_SIZE = int(os.environ.get("USER_CACHE_SIZE", "10000"))
+
+# Persona templates
+PERSONA_TEMPLATES_PATH = os.environ.get(
+    "PERSONA_TEMPLATES_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "assets", "persona_templates.json")
+)
+persona_templates = PersonaTemplates(PERSONA_TEMPLATES_PATH)
+
+# Default events per city
+CITY_EVENTS_PATH = os.environ.get(
+    "CITY_EVENTS_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "assets", "city_events.json")
+)
+city_catalog = CityCatalog(CITY_EVENTS_PATH)
+
+# Holiday calendar
+HOLIDAYS_PATH = os.environ.get(
+    "HOLIDAYS_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "assets", "holidays.json")
+)
+HOLIDAY_MAX_RANGE_DAYS = 732
+holiday_calendar = HolidayCalendar(HOLIDAYS_PATH, os.environ.get("DEFAULT_HOLIDAY_COUNTRY", "US"))
 
 # Pydantic models
 class UserEvent(BaseModel):
@@ -48,7 +186,11 @@ class UserEvent(BaseModel):
     city: str
     date: Optional[str] = None
     rating: Optional[float] = None
+    lat: Optional[float] = None
+    lng: Optional[float] = None
+    geo: Optional[dict] = None  # GeoJSON point built from lat/lng for the 2dsphere index
     created_at: Optional[datetime] = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
 
 class EventRequest(BaseModel):
     title: str
@@ -58,11 +200,14 @@ class EventRequest(BaseModel):
     city: str
     date: Optional[str] = None
     rating: Optional[float] = None
+    lat: Optional[float] = Field(default=None, ge=-90, le=90)
+    lng: Optional[float] = Field(default=None, ge=-180, le=180)
 
 class UserProfile(BaseModel):
     id: Optional[str] = Field(default_factory=lambda: str(uuid.uuid4()))
     name: str
     timezone: str
+    iana_timezone: Optional[str] = None
     city: Optional[str] = None
     country: Optional[str] = None
     personality_type: str
@@ -96,7 +241,10 @@ class Task(BaseModel):
     location: Optional[str] = None
     notes: Optional[str] = None
     all_day: bool = False
+    exceptions: List[str] = Field(default_factory=list)
+    overrides: dict = Field(default_factory=dict)
     created_at: Optional[datetime] = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
 
 class DayPlan(BaseModel):
     id: Optional[str] = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -104,6 +252,7 @@ class DayPlan(BaseModel):
     date: datetime
     tasks: List[dict]
     timeline: List[dict]
+    unscheduled: List[dict] = Field(default_factory=list)
     created_at: Optional[datetime] = Field(default_factory=datetime.utcnow)
 
 class OnboardingRequest(BaseModel):
@@ -130,12 +279,209 @@ class TaskRequest(BaseModel):
     notes: Optional[str] = None
     all_day: bool = False
 
+class TaskOperation(BaseModel):
+    op: str  # create, update, delete, complete
+    id: Optional[str] = None
+    task: Optional[TaskRequest] = None
+    completed: bool = True
+
+class BatchSubRequest(BaseModel):
+    method: str = "GET"
+    path: str  # e.g. /api/tasks?date=2024-05-01
+    body: Optional[Any] = None
+
 class PersonaMessage(BaseModel):
     message_type: str
     persona: str
     message: str
     timestamp: datetime = Field(default_factory=datetime.utcnow)
 
+# Invalidation generations
+class Generations:
+    """Per-user counters bumped on every invalidation.
+
+    Work that reads data and then caches a result takes the user's generation
+    first and drops the result if it changed meanwhile, so a value computed
+    from data a concurrent write replaced is never stored after that write's
+    invalidation. Only the ``max_size`` most recently bumped users are tracked;
+    the rest read as the highest generation evicted, so an eviction can only
+    make a reading look changed, never current.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._values = OrderedDict()
+        self._last = 0
+        self._floor = 0
+
+    def get(self, user_id: str) -> int:
+        return self._values.get(user_id, self._floor)
+
+    def bump(self, user_id: str):
+        self._last += 1
+        self._values[user_id] = self._last
+        self._values.move_to_end(user_id)
+        while len(self._values) > self.max_size:
+            _, evicted = self._values.popitem(last=False)
+            self._floor = max(self._floor, evicted)
+
+# Authenticated-user cache
+class UserCache:
+    """Bounded LRU cache of user documents keyed by user id, with a per-entry TTL.
+
+    Each worker process keeps its own cache, so writes made by another worker
+    only become visible here once the entry expires; the TTL bounds that window.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._generations = Generations(max_size)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, user_id: str):
+        entry = self._entries.get(user_id)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, user = entry
+        if expires_at <= time.monotonic():
+            del self._entries[user_id]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return user
+
+    def set(self, user_id: str, user: dict):
+        if self.max_size <= 0 or self.ttl <= 0:
+            return
+        self._entries[user_id] = (time.monotonic() + self.ttl, user)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, user_id: str):
+        self._entries.pop(user_id, None)
+        # A lookup already running may have read the old document: it must not
+        # be cached, and later callers start a fresh one
+        self._generations.bump(user_id)
+        self._pending.pop(user_id, None)
+
+    def clear(self):
+        self._entries.clear()
+        for user_id in list(self._pending):
+            self.invalidate(user_id)
+
+    async def load(self, user_id: str, loader):
+        """Return the cached user, calling ``loader`` at most once per id for concurrent misses."""
+        user = self.get(user_id)
+        if user is not None:
+            return user
+
+        # The lookup runs as its own task so that cancelling the request that
+        # started it does not leave the others waiting on it forever
+        pending = self._pending.get(user_id)
+        if pending is None:
+            generation = self._generations.get(user_id)
+            pending = asyncio.create_task(self._fetch(user_id, loader, generation))
+            pending.add_done_callback(_retrieve_exception)
+            self._pending[user_id] = pending
+        return await asyncio.shield(pending)
+
+    async def _fetch(self, user_id: str, loader, generation: int):
+        try:
+            user = await loader(user_id)
+            if user is not None and self._generations.get(user_id) == generation:
+                self.set(user_id, user)
+            return user
+        finally:
+            if self._pending.get(user_id) is asyncio.current_task():
+                del self._pending[user_id]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+def _retrieve_exception(task: asyncio.Task):
+    # Mark a failed lookup's error as seen even when every waiter was cancelled
+    if not task.cancelled():
+        task.exception()
+
+user_cache = UserCache(USER_CACHE_SIZE, USER_CACHE_TTL)
+
+async def load_user(user_id: str):
+    return await storage.users.get(user_id)
+
+# Index provisioning
+async def ensure_indexes():
+    await storage.ensure_indexes(index_status)
+
+@app.on_event("startup")
+async def provision_indexes():
+    # Build in the background so the process can answer liveness checks while
+    # /api/ready keeps reporting 503 until every index exists.
+    app.state.index_task = asyncio.create_task(ensure_indexes())
+
+@app.on_event("startup")
+async def start_query_profiler():
+    if client is not None:
+        query_profiler.bind(client, asyncio.get_running_loop())
+
+# Reminders
+async def render_reminder(task: dict):
+    user = await user_cache.load(task["user_id"], load_user) or {}
+    persona = user.get("selected_persona", "casualBuddy")
+    message_type = "reminder_meeting" if task.get("task_type") == "meeting" else "reminder_task"
+    return get_persona_message(
+        message_type, persona,
+        title=task.get("title"), time=format_clock_label(task.get("time")), **user_variables(user)
+    )
+
+reminder_scheduler = ReminderScheduler(
+    storage.tasks,
+    render_reminder,
+    StoreSink(storage.notifications) if REMINDER_SINK in ("store", "mongo") else LogSink(),
+    horizon=timedelta(minutes=REMINDER_HORIZON_MINUTES)
+)
+
+def set_storage(backend):
+    """Switch every component to ``backend``, e.g. a scratch database for benchmarks."""
+    global storage
+    storage = backend
+    reminder_scheduler.tasks = backend.tasks
+    if isinstance(reminder_scheduler.sink, StoreSink):
+        reminder_scheduler.sink = StoreSink(backend.notifications)
+    user_cache.clear()
+
+@app.on_event("startup")
+async def start_reminders():
+    if REMINDERS_ENABLED:
+        await reminder_scheduler.start()
+
+@app.on_event("shutdown")
+async def stop_reminders():
+    await reminder_scheduler.stop()
+
+@app.on_event("shutdown")
+async def close_storage():
+    await storage.close()
+
 # Helper functions
 def create_access_token(user_id: str):
     expire = datetime.utcnow() + timedelta(days=30)
@@ -143,20 +489,32 @@ def create_access_token(user_id: str):
     encoded_jwt = jwt.encode(to_encode, JWT_SECRET, algorithm=JWT_ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def get_current_user(request: Request, credentials: HTTPAuthorizationCredentials = Depends(security)):
+    # Sub-requests of POST /api/batch share the user the batch authenticated
+    batch_user = getattr(request.state, "batch_user", None)
+    if batch_user is not None:
+        return batch_user
+    
+    started = time.perf_counter()
     try:
         payload = jwt.decode(credentials.credentials, JWT_SECRET, algorithms=[JWT_ALGORITHM])
         user_id: str = payload.get("user_id")
         if user_id is None:
             raise HTTPException(status_code=401, detail="Invalid token")
         
-        user = await db.users.find_one({"id": user_id}, {"_id": 0})
+        user = await user_cache.load(user_id, load_user)
         if not user:
             raise HTTPException(status_code=401, detail="User not found")
         
         return user
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
+    finally:
+        auth_latency.observe(time.perf_counter() - started)
+
+def require_admin(x_admin_token: Optional[str] = Header(default=None)):
+    if not ADMIN_TOKEN or not x_admin_token or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Admin token required")
 
 def check_trial_status(user: dict):
     trial_started = user.get('trial_started')
@@ -178,63 +536,228 @@ def check_trial_status(user: dict):
     
     return {"trial_active": False, "subscription_active": False, "days_left": 0}
 
-def get_persona_message(message_type: str, persona: str):
-    if message_type in PERSONA_TEMPLATES and persona in PERSONA_TEMPLATES[message_type]:
-        return PERSONA_TEMPLATES[message_type][persona]
-    return "Hello! Time for your scheduled activity."
+def require_active_plan(user: dict):
+    trial_status = check_trial_status(user)
+    if not trial_status["trial_active"] and not trial_status["subscription_active"]:
+        raise HTTPException(status_code=402, detail="Trial expired. Please subscribe to continue.")
 
-def generate_day_timeline(tasks: List[dict]):
-    # Simple rule-based ordering: morning -> work -> evening
-    morning_tasks = []
-    work_tasks = []
-    evening_tasks = []
-    
-    for task in tasks:
-        task_type = task.get('task_type', 'general')
-        time_str = task.get('time', '')
-        
-        if task_type in ['exercise', 'meal'] or (time_str and time_str < '12:00'):
-            morning_tasks.append(task)
-        elif task_type in ['work', 'meeting'] or (time_str and '09:00' <= time_str <= '17:00'):
-            work_tasks.append(task)
-        else:
-            evening_tasks.append(task)
-    
-    # Sort each category by time
-    for task_list in [morning_tasks, work_tasks, evening_tasks]:
-        task_list.sort(key=lambda x: x.get('time', '00:00'))
+def get_persona_message(message_type: str, persona: str, **variables):
+    return persona_templates.render(message_type, persona, **variables)
+
+def user_variables(user: dict):
+    return {"name": user.get("name"), "city": user.get("city")}
+
+def json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def encode_task_cursor(task: dict):
+    position = {"date": task["date"].isoformat(), "id": task["id"]}
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+def decode_task_cursor(cursor: str):
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(position["date"]), str(position["id"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def task_sort_key(task: dict):
+    return to_utc_naive(task["date"]), task["id"]
+
+def parse_repeat(repeat: str, task_date: datetime):
+    try:
+        validate_rule(repeat, task_date)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+async def find_task_occurrences(user: dict, start: datetime, end: datetime):
+    """Expand the user's recurring tasks, in their time zone, into occurrences dated in [start, end)."""
+    series = await storage.tasks.series(user["id"], end)
+    return expand_tasks(series, start, end, user_zone(user))
+
+# Delta sync tokens and tombstones
+def encode_sync_token(*positions):
+    """Token holding a resume point ``(moment, after_id)`` per stream: tasks, events, tombstones."""
+    parts = []
+    for moment, after_id in positions:
+        millis = (moment - SYNC_EPOCH) // timedelta(milliseconds=1)
+        parts.append(f"{millis}/{after_id or ''}")
+    return base64.urlsafe_b64encode(("v2:" + ",".join(parts)).encode()).decode()
+
+def decode_sync_token(token: str):
+    try:
+        version, body = base64.urlsafe_b64decode(token.encode()).decode().split(":", 1)
+        # v1 tokens carry one moment shared by every stream
+        if version == "v1":
+            return [(SYNC_EPOCH + timedelta(milliseconds=int(body)), None)] * SYNC_STREAMS
+        if version != "v2":
+            raise ValueError(version)
+        positions = []
+        for part in body.split(","):
+            millis, after_id = part.split("/", 1)
+            positions.append((SYNC_EPOCH + timedelta(milliseconds=int(millis)), after_id or None))
+        if len(positions) != SYNC_STREAMS:
+            raise ValueError(body)
+        return positions
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid sync token")
+
+def tombstone(user_id: str, kind: str, doc_id: str):
+    return {"user_id": user_id, "kind": kind, "id": doc_id, "deleted_at": datetime.utcnow()}
+
+async def record_tombstone(user_id: str, kind: str, doc_id: str):
+    await storage.tombstones.add(tombstone(user_id, kind, doc_id))
+
+def geo_point(lat: Optional[float], lng: Optional[float]):
+    if lat is None and lng is None:
+        return None
+    if lat is None or lng is None:
+        raise HTTPException(status_code=400, detail="lat and lng must be provided together")
+    return {"type": "Point", "coordinates": [lng, lat]}
+
+# Idempotent creates: the first request with a key stores its response, retries replay it.
+# A claim still pending after IDEMPOTENCY_LEASE_SECONDS is taken over by the next retry.
+async def with_idempotency(user_id: str, route: str, key: Optional[str], payload, handler):
+    if not key:
+        return await handler()
+    if len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+        raise HTTPException(status_code=400, detail="Idempotency-Key is too long")
+    
+    record_key = f"{user_id}:{route}:{key}"
+    if isinstance(payload, list):
+        body = json.dumps([item.dict() for item in payload], sort_keys=True, default=json_default)
+    else:
+        body = json.dumps(payload.dict(), sort_keys=True, default=json_default)
+    request_hash = hashlib.sha256(body.encode()).hexdigest()
     
-    timeline = []
-    timeline.extend(morning_tasks)
-    timeline.extend(work_tasks)
-    timeline.extend(evening_tasks)
+    try:
+        await storage.idempotency.claim({
+            "key": record_key,
+            "request_hash": request_hash,
+            "state": "pending",
+            "created_at": datetime.utcnow()
+        })
+    except DuplicateError:
+        record = await storage.idempotency.get(record_key)
+        if record is None:
+            # Expired between the insert and the lookup; treat as a new request
+            return await with_idempotency(user_id, route, key, payload, handler)
+        if record["request_hash"] != request_hash:
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+        if record["state"] == "done":
+            return record["response"]
+        now = datetime.utcnow()
+        if not await storage.idempotency.take_over(record_key, now - timedelta(seconds=IDEMPOTENCY_LEASE_SECONDS), now):
+            raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
     
-    return timeline
+    try:
+        response = await handler()
+    except BaseException:
+        # Let the client retry a request that did not complete
+        await storage.idempotency.release(record_key)
+        raise
+    
+    # Store the response as it is sent, so a replay returns the same JSON
+    response = jsonable_encoder(response)
+    await storage.idempotency.complete(record_key, response)
+    return response
+
+# Day plan cache: one plan per (user, local day), dropped whenever a task on that day changes
+day_plan_generations = Generations(USER_CACHE_SIZE)
+
+def day_plan_id(user_id: str, day):
+    return f"{user_id}:{day.isoformat()}"
+
+async def invalidate_day_plans(user: dict, *dates: datetime, recurring: bool = False):
+    """Drop cached plans for the user's local days of ``dates``; for recurring series, every day from the earliest on."""
+    zone = user_zone(user)
+    days = sorted({local_date(d, zone) for d in dates if d is not None})
+    if not days:
+        return
+    day_plan_generations.bump(user["id"])
+    if recurring:
+        await storage.day_plans.delete_from(user["id"], day_window(days[0], zone)[0])
+    else:
+        await storage.day_plans.delete_ids([day_plan_id(user["id"], d) for d in days])
+
+def occurrence_day(user: dict, occurrence_key: str):
+    """Start of the user's local day an occurrence key names."""
+    day = datetime.strptime(occurrence_key, "%Y-%m-%d").date()
+    return day_window(day, user_zone(user))[0]
+
+def parse_day(value: str):
+    """The calendar date written in ``value``, e.g. "2024-05-01" or "2024-05-01T00:00:00Z"."""
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date")
 
 # API Routes
 @app.get("/api/health")
 async def health_check():
-    return {"status": "healthy", "service": "Cc Calendar API"}
+    return {"status": "healthy", "service": "Cc Calendar API", "user_cache": user_cache.stats()}
+
+@metrics.collector
+def collect_cache_metrics():
+    stats = user_cache.stats()
+    rrules = compile_rule.cache_info()
+    city_events = city_catalog.cache_info()
+    caches = {
+        "user": (stats["hits"], stats["misses"], stats["size"]),
+        "rrule": (rrules.hits, rrules.misses, rrules.currsize),
+        "city_events": (city_events.hits, city_events.misses, city_events.currsize),
+    }
+    for name, (hits, misses, size) in caches.items():
+        cache_hits.set(hits, name)
+        cache_misses.set(misses, name)
+        cache_size.set(size, name)
+
+@app.get("/api/metrics")
+async def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type=METRICS_CONTENT_TYPE)
+
+@app.get("/api/admin/slow-queries", dependencies=[Depends(require_admin)])
+async def get_slow_queries(limit: int = 20, sort: str = "max_ms"):
+    """Top query shapes by max, total or mean duration since start or the last reset"""
+    if sort not in ("max_ms", "total_ms", "mean_ms"):
+        raise HTTPException(status_code=400, detail="sort must be max_ms, total_ms or mean_ms")
+    limit = max(1, min(limit, QUERY_PROFILE_SHAPES))
+    return {"slow_query_ms": SLOW_QUERY_MS, "queries": query_profiler.top(limit, sort)}
+
+@app.delete("/api/admin/slow-queries", dependencies=[Depends(require_admin)])
+async def reset_slow_queries():
+    query_profiler.reset()
+    return {"message": "Query profile reset"}
+
+@app.get("/api/ready")
+async def readiness_check():
+    status_code = 200 if index_status["ready"] else 503
+    return JSONResponse(status_code=status_code, content={"ready": index_status["ready"], "indexes": index_status})
 
 @app.post("/api/onboarding")
 async def onboard_user(request: OnboardingRequest):
-    user_data = UserProfile(**request.dict())
+    user = UserProfile(**request.dict(), iana_timezone=zone_name(request.timezone)).dict()
     
     # Check if user already exists (by name for now - in production use email)
-    existing_user = await db.users.find_one({"name": request.name})
+    existing_user = await storage.users.find_by_name(request.name)
     if existing_user:
         raise HTTPException(status_code=400, detail="User already exists")
     
-    # Insert user
-    await db.users.insert_one(user_data.dict())
+    # Insert user; respond with the stored form, as later reads return it
+    try:
+        user = await storage.users.insert(user)
+    except DuplicateError:
+        raise HTTPException(status_code=400, detail="User already exists")
     
     # Create access token
-    token = create_access_token(user_data.id)
+    token = create_access_token(user["id"])
     
     return {
         "token": token,
-        "user": user_data.dict(),
-        "message": get_persona_message("morning_plan", request.selected_persona)
+        "user": user,
+        "message": get_persona_message("morning_plan", request.selected_persona, name=request.name, city=request.city)
     }
 
 @app.get("/api/user/profile")
@@ -248,27 +771,23 @@ async def get_user_profile(current_user: dict = Depends(get_current_user)):
 
 @app.put("/api/user/persona")
 async def update_persona(persona: str, current_user: dict = Depends(get_current_user)):
-    valid_personas = ["casualBuddy", "caringSibling", "goodParent", "strictProfessional", "wildCard"]
-    
-    if persona not in valid_personas:
+    if persona not in PERSONAS:
         raise HTTPException(status_code=400, detail="Invalid persona")
     
-    await db.users.update_one(
-        {"id": current_user["id"]},
-        {"$set": {"selected_persona": persona}}
-    )
+    await storage.users.update(current_user["id"], {"selected_persona": persona})
+    user_cache.invalidate(current_user["id"])
     
     return {
         "message": "Persona updated successfully",
-        "welcome_message": get_persona_message("morning_plan", persona)
+        "welcome_message": get_persona_message("morning_plan", persona, **user_variables(current_user))
     }
 
-@app.post("/api/tasks")
-async def create_task(request: TaskRequest, current_user: dict = Depends(get_current_user)):
-    trial_status = check_trial_status(current_user)
-    if not trial_status["trial_active"] and not trial_status["subscription_active"]:
-        raise HTTPException(status_code=402, detail="Trial expired. Please subscribe to continue.")
-    
+TASK_UPDATE_FIELDS = (
+    "title", "description", "date", "time", "task_type", "priority", "deadline", "reminder",
+    "timer_duration", "repeat", "tags", "location", "notes", "all_day"
+)
+
+def build_task(user_id: str, request: TaskRequest):
     # Parse dates
     task_date = datetime.fromisoformat(request.date.replace('Z', '+00:00'))
     deadline = None
@@ -278,9 +797,10 @@ async def create_task(request: TaskRequest, current_user: dict = Depends(get_cur
         deadline = datetime.fromisoformat(request.deadline.replace('Z', '+00:00'))
     if request.reminder:
         reminder = datetime.fromisoformat(request.reminder.replace('Z', '+00:00'))
+    parse_repeat(request.repeat, task_date)
     
-    task_data = Task(
-        user_id=current_user["id"],
+    return Task(
+        user_id=user_id,
         title=request.title,
         description=request.description,
         date=task_date,
@@ -295,16 +815,192 @@ async def create_task(request: TaskRequest, current_user: dict = Depends(get_cur
         location=request.location,
         notes=request.notes,
         all_day=request.all_day
-    )
+    ).dict()
+
+def build_task_update(request: TaskRequest):
+    """The fields of ``request`` written by an update, with dates parsed."""
+    task = build_task("", request)
+    return {key: task[key] for key in TASK_UPDATE_FIELDS}
+
+async def after_tasks_created(user: dict, tasks: List[dict]):
+    recurring = [t["date"] for t in tasks if is_recurring(t["repeat"])]
+    await invalidate_day_plans(user, *[t["date"] for t in tasks if not is_recurring(t["repeat"])])
+    await invalidate_day_plans(user, *recurring, recurring=True)
+    for task in tasks:
+        reminder_scheduler.schedule(task)
+
+def build_event(user_id: str, request: EventRequest):
+    event = UserEvent(
+        user_id=user_id,
+        geo=geo_point(request.lat, request.lng),
+        **request.dict()
+    ).dict()
+    if isinstance(event.get('created_at'), datetime):
+        event['created_at'] = event['created_at'].isoformat()
+    return event
+
+def check_batch_size(items: list):
+    if not items:
+        raise HTTPException(status_code=400, detail="Batch is empty")
+    if len(items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {BATCH_MAX_ITEMS} items")
+
+@app.post("/api/tasks")
+async def create_task(
+    request: TaskRequest,
+    idempotency_key: Optional[str] = Header(default=None),
+    current_user: dict = Depends(get_current_user)
+):
+    require_active_plan(current_user)
     
-    await db.tasks.insert_one(task_data.dict())
+    async def create():
+        task = await storage.tasks.insert(build_task(current_user["id"], request))
+        await after_tasks_created(current_user, [task])
+        
+        persona = current_user.get("selected_persona", "casualBuddy")
+        message = get_persona_message(
+            "reminder_task", persona,
+            title=request.title, time=format_clock_label(request.time), **user_variables(current_user)
+        )
+        
+        return {
+            "task": task,
+            "message": message
+        }
     
-    persona = current_user.get("selected_persona", "casualBuddy")
-    message = get_persona_message("reminder_task", persona)
+    return await with_idempotency(current_user["id"], "tasks", idempotency_key, request, create)
+
+@app.post("/api/tasks:batch")
+async def create_tasks_batch(
+    requests: List[TaskRequest],
+    idempotency_key: Optional[str] = Header(default=None),
+    current_user: dict = Depends(get_current_user)
+):
+    """Create many tasks with a single insert_many, e.g. for imports"""
+    require_active_plan(current_user)
+    check_batch_size(requests)
+    
+    async def create():
+        tasks = await storage.tasks.insert_many([build_task(current_user["id"], r) for r in requests])
+        await after_tasks_created(current_user, tasks)
+        return {"tasks": tasks, "count": len(tasks)}
+    
+    return await with_idempotency(current_user["id"], "tasks:batch", idempotency_key, requests, create)
+
+@app.post("/api/tasks:bulk")
+async def bulk_task_operations(operations: List[TaskOperation], current_user: dict = Depends(get_current_user)):
+    """Run mixed create/update/delete/complete operations as one batched write"""
+    require_active_plan(current_user)
+    check_batch_size(operations)
+    user_id = current_user["id"]
+    now = datetime.utcnow()
+    
+    # Tasks referenced by non-create operations, fetched in one query
+    referenced = {split_occurrence_id(op.id)[0] for op in operations if op.op != "create" and op.id}
+    existing = await storage.tasks.get_many(user_id, referenced) if referenced else {}
+    
+    results = [None] * len(operations)
+    writes = []
+    pending = []  # (operation index, result, side effects) for each queued write
+    # Series id -> occurrence keys already changed in this request, or None for the
+    # whole task. Mongo runs the batch unordered, so two writes to one document
+    # could land in either order; the second is rejected instead.
+    touched = {}
+    for index, op in enumerate(operations):
+        effects = {"days": [], "recurring": False, "schedule": None, "cancel": None, "tombstone": None}
+        try:
+            if op.op == "create":
+                if op.task is None:
+                    raise HTTPException(status_code=400, detail="create requires task")
+                task = build_task(user_id, op.task)
+                write = TaskWrite("insert", task["id"], document=task)
+                result = {"index": index, "status": 201, "id": task["id"], "task": task}
+                effects.update(days=[task["date"]], recurring=is_recurring(task["repeat"]), schedule=task)
+            else:
+                if op.op not in ("update", "delete", "complete"):
+                    raise HTTPException(status_code=400, detail=f"Unknown operation: {op.op}")
+                if not op.id:
+                    raise HTTPException(status_code=400, detail=f"{op.op} requires id")
+                series_id, occurrence_key = split_occurrence_id(op.id)
+                previous = existing.get(series_id)
+                if previous is None:
+                    raise HTTPException(status_code=404, detail="Task not found")
+                if series_id in touched and (
+                    touched[series_id] is None or occurrence_key is None or occurrence_key in touched[series_id]
+                ):
+                    raise HTTPException(status_code=400, detail="Task is already changed by an earlier operation in this request")
+                result = {"index": index, "status": 200, "id": op.id}
+                
+                if occurrence_key:
+                    # Single occurrences of recurring tasks are stored on the series
+                    effects["days"] = [occurrence_day(current_user, occurrence_key)]
+                    if op.op == "update":
+                        if op.task is None:
+                            raise HTTPException(status_code=400, detail="update requires task")
+                        fields = build_task_update(op.task)
+                        del fields["repeat"]
+                        write = TaskWrite("override", series_id, occurrence_key, fields, updated_at=now)
+                        effects["days"].append(fields["date"])
+                    elif op.op == "delete":
+                        write = TaskWrite("exception", series_id, occurrence_key, updated_at=now)
+                    else:
+                        write = TaskWrite("override", series_id, occurrence_key, {"completed": op.completed}, merge=True, updated_at=now)
+                else:
+                    effects.update(days=[previous["date"]], recurring=is_recurring(previous.get("repeat")))
+                    if op.op == "update":
+                        if op.task is None:
+                            raise HTTPException(status_code=400, detail="update requires task")
+                        fields = build_task_update(op.task)
+                        fields.update(reminder_sent=False, updated_at=now)
+                        write = TaskWrite("update", series_id, fields=fields)
+                        effects["days"].append(fields["date"])
+                        effects["recurring"] = effects["recurring"] or is_recurring(fields["repeat"])
+                        effects["schedule"] = {"id": series_id, "reminder": fields["reminder"]}
+                    elif op.op == "delete":
+                        write = TaskWrite("delete", series_id)
+                        effects.update(cancel=series_id, tombstone=series_id)
+                    else:
+                        write = TaskWrite("update", series_id, fields={"completed": op.completed, "updated_at": now})
+                        if op.completed:
+                            effects["cancel"] = series_id
+                        else:
+                            # Reopening a task brings back a reminder that has not been sent
+                            effects["schedule"] = {**previous, "completed": False}
+                touched[series_id] = touched.get(series_id, set()) | {occurrence_key} if occurrence_key else None
+        except HTTPException as exc:
+            results[index] = {"index": index, "status": exc.status_code, "error": exc.detail}
+            continue
+        except ValueError as exc:
+            results[index] = {"index": index, "status": 400, "error": str(exc)}
+            continue
+        
+        writes.append(write)
+        pending.append((index, result, effects))
+    
+    failed = await storage.tasks.apply(user_id, writes)
+    
+    days, recurring_days, tombstones = [], [], []
+    for position, (index, result, effects) in enumerate(pending):
+        if position in failed:
+            results[index] = {"index": index, "status": 409, "error": failed[position]}
+            continue
+        results[index] = result
+        (recurring_days if effects["recurring"] else days).extend(effects["days"])
+        if effects["cancel"]:
+            reminder_scheduler.cancel(effects["cancel"])
+        if effects["schedule"]:
+            reminder_scheduler.schedule(effects["schedule"])
+        if effects["tombstone"]:
+            tombstones.append(tombstone(user_id, "task", effects["tombstone"]))
+    
+    await invalidate_day_plans(current_user, *days)
+    await invalidate_day_plans(current_user, *recurring_days, recurring=True)
+    await storage.tombstones.add_many(tombstones)
     
     return {
-        "task": task_data.dict(),
-        "message": message
+        "results": results,
+        "succeeded": sum(1 for r in results if r["status"] < 400),
+        "failed": sum(1 for r in results if r["status"] >= 400)
     }
 
 @app.get("/api/tasks")
@@ -312,22 +1008,64 @@ async def get_tasks(
     date: Optional[str] = None, 
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    stream: bool = False,
     current_user: dict = Depends(get_current_user)
 ):
-    query = {"user_id": current_user["id"]}
+    user_id = current_user["id"]
+    start_date_dt = end_date_dt = None
     
     if date:
-        target_date = datetime.fromisoformat(date.replace('Z', '+00:00'))
-        start_date_dt = target_date.replace(hour=0, minute=0, second=0, microsecond=0)
-        end_date_dt = start_date_dt + timedelta(days=1)
-        query["date"] = {"$gte": start_date_dt, "$lt": end_date_dt}
+        # The user's local day, not the UTC one
+        start_date_dt, end_date_dt = day_window(parse_day(date), user_zone(current_user))
     elif start_date and end_date:
         start_date_dt = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
-        end_date_dt = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
-        query["date"] = {"$gte": start_date_dt, "$lte": end_date_dt}
-    
-    tasks = await db.tasks.find(query, {"_id": 0}).to_list(200)
-    return {"tasks": tasks}
+        # end_date is inclusive; windows are half-open
+        end_date_dt = datetime.fromisoformat(end_date.replace('Z', '+00:00')) + timedelta(microseconds=1)
+    
+    # Within a date window, recurring series are returned as their expanded
+    # occurrences and merged with one-off tasks in (date, id) order.
+    windowed = start_date_dt is not None
+    occurrences = []
+    if windowed:
+        occurrences = await find_task_occurrences(current_user, start_date_dt, end_date_dt)
+    
+    after = None
+    if cursor:
+        after = decode_task_cursor(cursor)
+        occurrences = [o for o in occurrences if task_sort_key(o) > after]
+    
+    page_size = min(max(limit or TASKS_PAGE_SIZE, 1), TASKS_MAX_PAGE_SIZE)
+    
+    if stream:
+        # NDJSON: one task per line, written as the cursor yields batches
+        async def stream_tasks():
+            pending = iter(occurrences)
+            occurrence = next(pending, None)
+            async for task in storage.tasks.iterate(
+                user_id, start_date_dt, end_date_dt, one_off=windowed, after=after, batch_size=page_size
+            ):
+                while occurrence is not None and task_sort_key(occurrence) < task_sort_key(task):
+                    yield json.dumps(occurrence, default=json_default) + "\n"
+                    occurrence = next(pending, None)
+                yield json.dumps(task, default=json_default) + "\n"
+            while occurrence is not None:
+                yield json.dumps(occurrence, default=json_default) + "\n"
+                occurrence = next(pending, None)
+        
+        return StreamingResponse(stream_tasks(), media_type="application/x-ndjson")
+    
+    # Fetch one extra document to know whether another page exists
+    tasks = await storage.tasks.list(user_id, start_date_dt, end_date_dt, one_off=windowed, after=after, limit=page_size + 1)
+    if occurrences:
+        tasks = list(heapq.merge(tasks, occurrences, key=task_sort_key))[:page_size + 1]
+    next_cursor = None
+    if len(tasks) > page_size:
+        tasks = tasks[:page_size]
+        next_cursor = encode_task_cursor(tasks[-1])
+    
+    return {"tasks": tasks, "next_cursor": next_cursor}
 
 @app.put("/api/tasks/{task_id}")
 async def update_task(
@@ -335,132 +1073,239 @@ async def update_task(
     request: TaskRequest, 
     current_user: dict = Depends(get_current_user)
 ):
-    trial_status = check_trial_status(current_user)
-    if not trial_status["trial_active"] and not trial_status["subscription_active"]:
-        raise HTTPException(status_code=402, detail="Trial expired. Please subscribe to continue.")
-    
-    # Parse dates
-    task_date = datetime.fromisoformat(request.date.replace('Z', '+00:00'))
-    deadline = None
-    reminder = None
-    
-    if request.deadline:
-        deadline = datetime.fromisoformat(request.deadline.replace('Z', '+00:00'))
-    if request.reminder:
-        reminder = datetime.fromisoformat(request.reminder.replace('Z', '+00:00'))
-    
-    update_data = {
-        "title": request.title,
-        "description": request.description,
-        "date": task_date,
-        "time": request.time,
-        "task_type": request.task_type,
-        "priority": request.priority,
-        "deadline": deadline,
-        "reminder": reminder,
-        "timer_duration": request.timer_duration,
-        "repeat": request.repeat,
-        "tags": request.tags,
-        "location": request.location,
-        "notes": request.notes,
-        "all_day": request.all_day
-    }
-    
-    result = await db.tasks.update_one(
-        {"id": task_id, "user_id": current_user["id"]},
-        {"$set": update_data}
-    )
-    
-    if result.modified_count == 0:
+    require_active_plan(current_user)
+    
+    update_data = build_task_update(request)
+    task_date = update_data["date"]
+    updated_at = datetime.utcnow()
+    
+    # Editing a single occurrence of a recurring task stores an override on the series
+    series_id, occurrence_key = split_occurrence_id(task_id)
+    if occurrence_key:
+        del update_data["repeat"]
+        previous = await storage.tasks.set_override(current_user["id"], series_id, occurrence_key, update_data, updated_at)
+    else:
+        update_data["reminder_sent"] = False
+        update_data["updated_at"] = updated_at
+        previous = await storage.tasks.update(current_user["id"], task_id, update_data)
+    
+    if previous is None:
         raise HTTPException(status_code=404, detail="Task not found")
     
+    if occurrence_key:
+        await invalidate_day_plans(current_user, occurrence_day(current_user, occurrence_key), task_date)
+    else:
+        recurring = is_recurring(previous.get("repeat")) or is_recurring(request.repeat)
+        await invalidate_day_plans(current_user, previous["date"], task_date, recurring=recurring)
+        reminder_scheduler.schedule({**previous, **update_data})
+    
     persona = current_user.get("selected_persona", "casualBuddy")
-    message = get_persona_message("reminder_task", persona)
+    message = get_persona_message(
+        "reminder_task", persona,
+        title=request.title, time=format_clock_label(request.time), **user_variables(current_user)
+    )
     
     return {"message": "Task updated successfully", "persona_message": message}
 
 @app.delete("/api/tasks/{task_id}")
 async def delete_task(task_id: str, current_user: dict = Depends(get_current_user)):
-    result = await db.tasks.delete_one({"id": task_id, "user_id": current_user["id"]})
+    # Deleting a single occurrence records an exception on the series
+    series_id, occurrence_key = split_occurrence_id(task_id)
+    if occurrence_key:
+        if not await storage.tasks.add_exception(current_user["id"], series_id, occurrence_key, datetime.utcnow()):
+            raise HTTPException(status_code=404, detail="Task not found")
+        await invalidate_day_plans(current_user, occurrence_day(current_user, occurrence_key))
+        return {"message": "Task deleted successfully"}
+    
+    deleted = await storage.tasks.delete(current_user["id"], task_id)
     
-    if result.deleted_count == 0:
+    if deleted is None:
         raise HTTPException(status_code=404, detail="Task not found")
     
+    reminder_scheduler.cancel(task_id)
+    await record_tombstone(current_user["id"], "task", task_id)
+    await invalidate_day_plans(current_user, deleted["date"], recurring=is_recurring(deleted.get("repeat")))
+    
     return {"message": "Task deleted successfully"}
 
-@app.get("/api/recommendations/holidays")
-async def get_holidays(date: str, current_user: dict = Depends(get_current_user)):
-    # Mock holiday data - in production, integrate with holiday APIs
-    current_date = datetime.fromisoformat(date.replace('Z', '+00:00'))
-    current_month = current_date.month
-    current_year = current_date.year
-    
-    holidays = []
-    
-    # Add some sample holidays based on the month
-    holiday_data = {
-        1: [
-            {"name": "New Year's Day", "date": f"{current_year}-01-01", "type": "holiday"},
-            {"name": "Martin Luther King Jr. Day", "date": f"{current_year}-01-15", "type": "holiday"}
-        ],
-        2: [
-            {"name": "Valentine's Day", "date": f"{current_year}-02-14", "type": "celebration"},
-            {"name": "Presidents Day", "date": f"{current_year}-02-19", "type": "holiday"}
-        ],
-        12: [
-            {"name": "Christmas Day", "date": f"{current_year}-12-25", "type": "holiday"},
-            {"name": "New Year's Eve", "date": f"{current_year}-12-31", "type": "celebration"}
-        ]
-    }
-    
-    if current_month in holiday_data:
-        holidays = holiday_data[current_month]
+def empty_day_summary(day: str):
+    return {"date": day, "total": 0, "completed": 0, "priority": {}, "task_type": {}, "earliest_time": None}
+
+def add_to_day_summary(summary: dict, priority: str, task_type: str, completed: bool, count: int, earliest_time):
+    summary["total"] += count
+    if completed:
+        summary["completed"] += count
+    summary["priority"][priority] = summary["priority"].get(priority, 0) + count
+    summary["task_type"][task_type] = summary["task_type"].get(task_type, 0) + count
+    if earliest_time and (summary["earliest_time"] is None or earliest_time < summary["earliest_time"]):
+        summary["earliest_time"] = earliest_time
+
+@app.get("/api/calendar/summary")
+async def get_calendar_summary(start: str, end: str, current_user: dict = Depends(get_current_user)):
+    """Per-day task counts for [start, end] in the user's local days, for drawing month and week grids"""
+    try:
+        start_day = datetime.fromisoformat(start.replace('Z', '+00:00')).date()
+        end_day = datetime.fromisoformat(end.replace('Z', '+00:00')).date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="start and end must be ISO dates")
+    if end_day < start_day or (end_day - start_day).days > CALENDAR_SUMMARY_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Date range must span 0-{CALENDAR_SUMMARY_MAX_DAYS} days")
+    
+    zone = user_zone(current_user)
+    window_start = day_window(start_day, zone)[0]
+    window_end = day_window(end_day, zone)[1]
+    
+    # One-off tasks are counted in the database; only the grouped rows come back
+    days = {}
+    for row in await storage.tasks.day_counts(current_user["id"], window_start, window_end, zone):
+        summary = days.setdefault(row["day"], empty_day_summary(row["day"]))
+        add_to_day_summary(summary, row["priority"], row["task_type"], row["completed"], row["count"], row["earliest_time"])
+    
+    # Recurring series are expanded here, as in GET /api/tasks
+    for occurrence in await find_task_occurrences(current_user, window_start, window_end):
+        day = local_date(occurrence["date"], zone).isoformat()
+        summary = days.setdefault(day, empty_day_summary(day))
+        add_to_day_summary(
+            summary, occurrence.get("priority", "medium"), occurrence.get("task_type", "general"),
+            occurrence.get("completed", False), 1, occurrence.get("time")
+        )
     
-    return {"holidays": holidays}
+    return {
+        "start": start_day.isoformat(),
+        "end": end_day.isoformat(),
+        "days": [days[day] for day in sorted(days)]
+    }
+
+@app.get("/api/recommendations/holidays")
+async def get_holidays(
+    date: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    country: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Holidays for the user's country: the month of ``date``, or an explicit range"""
+    country_code = holiday_calendar.resolve_country(country or current_user.get("country"))
+    
+    def holiday_day(value: str):
+        day = parse_day(value)
+        years = holiday_calendar.years
+        if day.year not in years:
+            raise HTTPException(status_code=400, detail=f"Holidays are available for {years[0]}-{years[-1]}")
+        return day
+    
+    if bool(start_date) != bool(end_date):
+        raise HTTPException(status_code=400, detail="start_date and end_date must be provided together")
+    if start_date:
+        start_day = holiday_day(start_date)
+        end_day = holiday_day(end_date)
+    else:
+        current_day = holiday_day(date) if date else local_today(user_zone(current_user))
+        start_day = current_day.replace(day=1)
+        end_day = (start_day + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    
+    if end_day < start_day or (end_day - start_day).days > HOLIDAY_MAX_RANGE_DAYS:
+        raise HTTPException(status_code=400, detail=f"Date range must span 0-{HOLIDAY_MAX_RANGE_DAYS} days")
+    
+    return {"holidays": holiday_calendar.between(country_code, start_day, end_day), "country": country_code}
 
 @app.post("/api/plan-day")
 async def plan_my_day(date: str, current_user: dict = Depends(get_current_user)):
-    trial_status = check_trial_status(current_user)
-    if not trial_status["trial_active"] and not trial_status["subscription_active"]:
-        raise HTTPException(status_code=402, detail="Trial expired. Please subscribe to continue.")
+    require_active_plan(current_user)
     
-    # Get tasks for the date
-    target_date = datetime.fromisoformat(date.replace('Z', '+00:00'))
-    start_date = target_date.replace(hour=0, minute=0, second=0, microsecond=0)
-    end_date = start_date + timedelta(days=1)
+    # The user's local day, not the UTC one
+    zone = user_zone(current_user)
+    plan_day_date = parse_day(date)
+    start_date, end_date = day_window(plan_day_date, zone)
+    
+    persona = current_user.get("selected_persona", "casualBuddy")
+    message = get_persona_message("morning_plan", persona, **user_variables(current_user))
+    
+    # An unchanged day is served from the stored plan
+    plan_id = day_plan_id(current_user["id"], plan_day_date)
+    cached_plan = await storage.day_plans.get(plan_id)
+    if cached_plan:
+        return {
+            "timeline": cached_plan["timeline"],
+            "unscheduled": cached_plan.get("unscheduled", []),
+            "message": message,
+            "total_tasks": len(cached_plan["tasks"])
+        }
     
-    tasks = await db.tasks.find({
-        "user_id": current_user["id"],
-        "date": {"$gte": start_date, "$lt": end_date},
-        "completed": False
-    }).to_list(100)
+    # Taken before reading the tasks: a write landing during the compute bumps it
+    generation = day_plan_generations.get(current_user["id"])
     
-    # Generate timeline
-    timeline = generate_day_timeline(tasks)
+    # Get tasks for the date
+    tasks = await storage.tasks.list(current_user["id"], start_date, end_date, one_off=True, pending=True, limit=100)
+    occurrences = await find_task_occurrences(current_user, start_date, end_date)
+    tasks.extend(o for o in occurrences if not o.get("completed"))
+    
+    # Pack the day's tasks into a timeline
+    timeline, unscheduled = plan_day(tasks, plan_day_date, zone=zone)
     
-    # Save day plan
+    # Save day plan, replacing any earlier plan for the same day
     day_plan = DayPlan(
+        id=plan_id,
         user_id=current_user["id"],
-        date=target_date,
+        date=start_date,
         tasks=tasks,
-        timeline=timeline
+        timeline=timeline,
+        unscheduled=unscheduled
     )
     
-    await db.day_plans.insert_one(day_plan.dict())
+    # A task changed while planning: the plan may predate it, so it is not kept.
+    # Checked again after the save, in case the invalidation ran during it.
+    if day_plan_generations.get(current_user["id"]) == generation:
+        await storage.day_plans.save(day_plan.dict())
+        if day_plan_generations.get(current_user["id"]) != generation:
+            await storage.day_plans.delete_ids([plan_id])
+    
+    return {
+        "timeline": timeline,
+        "unscheduled": unscheduled,
+        "message": message,
+        "total_tasks": len(tasks)
+    }
+
+@app.post("/api/plan-week")
+async def plan_my_week(start: str, days: int = 7, current_user: dict = Depends(get_current_user)):
+    require_active_plan(current_user)
+    
+    if not 1 <= days <= 31:
+        raise HTTPException(status_code=400, detail="days must be between 1 and 31")
+    
+    zone = user_zone(current_user)
+    start_day = parse_day(start)
+    start_date = day_window(start_day, zone)[0]
+    end_date = day_window(start_day + timedelta(days=days - 1), zone)[1]
+    
+    tasks = await storage.tasks.list(current_user["id"], start_date, end_date, one_off=True, pending=True)
+    occurrences = await find_task_occurrences(current_user, start_date, end_date)
+    tasks.extend(o for o in occurrences if not o.get("completed"))
+    
+    plans = plan_range(tasks, start_day, days, zone=zone)
     
     persona = current_user.get("selected_persona", "casualBuddy")
-    message = get_persona_message("morning_plan", persona)
+    message = get_persona_message("morning_plan", persona, **user_variables(current_user))
     
     return {
-        "timeline": timeline,
+        "days": plans,
         "message": message,
         "total_tasks": len(tasks)
     }
 
 @app.get("/api/persona-message/{message_type}")
-async def get_persona_message_api(message_type: str, current_user: dict = Depends(get_current_user)):
+async def get_persona_message_api(
+    message_type: str,
+    title: Optional[str] = None,
+    time: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
     persona = current_user.get("selected_persona", "casualBuddy")
-    message = get_persona_message(message_type, persona)
+    message = get_persona_message(
+        message_type, persona,
+        title=title, time=format_clock_label(time), **user_variables(current_user)
+    )
     
     return {
         "message": message,
@@ -470,41 +1315,45 @@ async def get_persona_message_api(message_type: str, current_user: dict = Depend
 
 # User Events - Manual Entry
 @app.post("/api/events")
-async def create_event(event: EventRequest, current_user: dict = Depends(get_current_user)):
+async def create_event(
+    event: EventRequest,
+    idempotency_key: Optional[str] = Header(default=None),
+    current_user: dict = Depends(get_current_user)
+):
     """Create a custom event/place for the user"""
-    # Create UserEvent with user_id
-    user_event = UserEvent(
-        user_id=current_user["id"],
-        **event.dict()
-    )
-    
-    event_dict = user_event.dict()
-    if isinstance(event_dict.get('created_at'), datetime):
-        event_dict['created_at'] = event_dict['created_at'].isoformat()
-    
-    # Insert into database
-    result = await db.events.insert_one(event_dict)
+    async def create():
+        # The written document is returned directly; no read-back is needed
+        inserted_event = await storage.events.insert(build_event(current_user["id"], event))
+        
+        persona = current_user.get("selected_persona", "casualBuddy")
+        message = get_persona_message("explore_event", persona, title=event.title, city=event.city)
+        
+        return {
+            "event": inserted_event,
+            "message": message
+        }
     
-    # Get the inserted event without MongoDB's _id
-    inserted_event = await db.events.find_one({"id": event_dict["id"]}, {"_id": 0})
+    return await with_idempotency(current_user["id"], "events", idempotency_key, event, create)
+
+@app.post("/api/events:batch")
+async def create_events_batch(
+    events: List[EventRequest],
+    idempotency_key: Optional[str] = Header(default=None),
+    current_user: dict = Depends(get_current_user)
+):
+    """Create many events with a single insert_many, e.g. for imports"""
+    check_batch_size(events)
     
-    persona = current_user.get("selected_persona", "casualBuddy")
-    message = get_persona_message("explore_event", persona)
+    async def create():
+        inserted = await storage.events.insert_many([build_event(current_user["id"], e) for e in events])
+        return {"events": inserted, "count": len(inserted)}
     
-    return {
-        "event": inserted_event,
-        "message": message
-    }
+    return await with_idempotency(current_user["id"], "events:batch", idempotency_key, events, create)
 
 @app.get("/api/events")
 async def get_user_events(city: Optional[str] = None, current_user: dict = Depends(get_current_user)):
     """Get all events for the current user, optionally filtered by city"""
-    query = {"user_id": current_user["id"]}
-    
-    if city:
-        query["city"] = city
-    
-    events = await db.events.find(query, {"_id": 0}).to_list(100)
+    events = await storage.events.list(current_user["id"], city, limit=100)
     
     # Get default cultural events for the user's city
     user_city = city or current_user.get("city", "")
@@ -514,7 +1363,7 @@ async def get_user_events(city: Optional[str] = None, current_user: dict = Depen
     all_events = events + default_events
     
     persona = current_user.get("selected_persona", "casualBuddy")
-    message = get_persona_message("explore_event", persona)
+    message = get_persona_message("explore_event", persona, name=current_user.get("name"), city=user_city)
     
     return {
         "events": all_events,
@@ -526,13 +1375,10 @@ async def update_event(event_id: str, event: EventRequest, current_user: dict =
     """Update an existing event"""
     # Create update data without changing user_id or id
     update_data = event.dict()
+    update_data["geo"] = geo_point(event.lat, event.lng)
+    update_data["updated_at"] = datetime.utcnow()
     
-    result = await db.events.update_one(
-        {"id": event_id, "user_id": current_user["id"]},
-        {"$set": update_data}
-    )
-    
-    if result.matched_count == 0:
+    if not await storage.events.update(current_user["id"], event_id, update_data):
         raise HTTPException(status_code=404, detail="Event not found")
     
     return {"message": "Event updated successfully"}
@@ -540,67 +1386,93 @@ async def update_event(event_id: str, event: EventRequest, current_user: dict =
 @app.delete("/api/events/{event_id}")
 async def delete_event(event_id: str, current_user: dict = Depends(get_current_user)):
     """Delete an event"""
-    result = await db.events.delete_one({"id": event_id, "user_id": current_user["id"]})
-    
-    if result.deleted_count == 0:
+    if not await storage.events.delete(current_user["id"], event_id):
         raise HTTPException(status_code=404, detail="Event not found")
     
+    await record_tombstone(current_user["id"], "event", event_id)
+    
     return {"message": "Event deleted successfully"}
 
-def get_default_cultural_events(city: str):
-    """Return default cultural events based on city"""
-    # Common events that exist in most cities
-    common_events = [
-        {
-            "id": "default_1",
-            "title": "Local Art Exhibition",
-            "description": "Discover local artists and their work",
-            "event_type": "cultural",
-            "location": "City Art Gallery",
-            "city": city,
-            "date": "Ongoing",
-            "is_default": True
-        },
-        {
-            "id": "default_2",
-            "title": "Food Festival",
-            "description": "Experience local and international cuisines",
-            "event_type": "festival",
-            "location": "Central Park",
-            "city": city,
-            "date": "Weekends",
-            "is_default": True
-        },
-        {
-            "id": "default_3",
-            "title": "Community Library",
-            "description": "Free books, quiet reading space, and events",
-            "event_type": "cultural",
-            "location": "Main Street",
-            "city": city,
-            "date": "Daily",
-            "is_default": True
+@app.get("/api/sync")
+async def sync_changes(since: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+    """Return tasks and events changed since ``since``, plus ids deleted in that time"""
+    user_id = current_user["id"]
+    started = datetime.utcnow()
+    positions = decode_sync_token(since) if since else None
+    fresh = (started - SYNC_SKEW, None)
+    
+    # Tombstones expire, so tokens older than their retention need a full resync
+    reset = positions is None or min(moment for moment, _ in positions) < started - timedelta(days=SYNC_TOMBSTONE_DAYS)
+    
+    if reset:
+        tasks = await storage.tasks.all(user_id)
+        events = await storage.events.all(user_id)
+        return {
+            "reset": True,
+            "tasks": tasks,
+            "events": events,
+            "deleted": {"tasks": [], "events": []},
+            "has_more": False,
+            "next_token": encode_sync_token(*[fresh] * SYNC_STREAMS)
         }
-    ]
     
-    return common_events
+    (tasks_at, tasks_after), (events_at, events_after), (deleted_at, deleted_after) = positions
+    tasks, events, tombstones = await asyncio.gather(
+        storage.tasks.changed_since(user_id, tasks_at, SYNC_PAGE_SIZE + 1, after_id=tasks_after),
+        storage.events.changed_since(user_id, events_at, SYNC_PAGE_SIZE + 1, after_id=events_after),
+        storage.tombstones.since(user_id, deleted_at, SYNC_PAGE_SIZE + 1, after_id=deleted_after)
+    )
+    
+    # A truncated stream resumes right after its last returned change, keyed on
+    # (time, id) so a page cut inside one millisecond loses nothing and always
+    # moves forward; complete streams move up to the skewed clock.
+    next_positions = []
+    has_more = False
+    for docs, field, position in zip((tasks, events, tombstones), ("updated_at", "updated_at", "deleted_at"), positions):
+        if len(docs) > SYNC_PAGE_SIZE:
+            del docs[SYNC_PAGE_SIZE:]
+            next_positions.append((docs[-1][field], docs[-1]["id"]))
+            has_more = True
+        else:
+            next_positions.append(fresh if fresh[0] > position[0] else position)
+    
+    return {
+        "reset": False,
+        "tasks": tasks,
+        "events": events,
+        "deleted": {
+            "tasks": [t["id"] for t in tombstones if t["kind"] == "task"],
+            "events": [t["id"] for t in tombstones if t["kind"] == "event"]
+        },
+        "has_more": has_more,
+        "next_token": encode_sync_token(*next_positions)
+    }
+
+def get_default_cultural_events(city: str):
+    """Return default cultural events based on city"""
+    # Shared across requests: callers must not modify the returned list or its events
+    return city_catalog.events_for(city)
 
 # City Update Endpoint
 @app.put("/api/user/city")
 async def update_user_city(city_data: CityUpdate, current_user: dict = Depends(get_current_user)):
     """Update user's city, country, and timezone"""
-    result = await db.users.update_one(
-        {"id": current_user["id"]},
-        {"$set": {
-            "city": city_data.city,
-            "country": city_data.country,
-            "timezone": f"{city_data.city}, {city_data.country} ({city_data.timezone})"
-        }}
-    )
+    updated = await storage.users.update(current_user["id"], {
+        "city": city_data.city,
+        "country": city_data.country,
+        "timezone": f"{city_data.city}, {city_data.country} ({city_data.timezone})",
+        "iana_timezone": zone_name(city_data.timezone)
+    })
     
-    if result.matched_count == 0:
+    user_cache.invalidate(current_user["id"])
+    
+    if not updated:
         raise HTTPException(status_code=404, detail="User not found")
     
+    # Cached plans were cut on the old zone's day boundaries
+    day_plan_generations.bump(current_user["id"])
+    await storage.day_plans.delete_from(current_user["id"], datetime.min)
+    
     return {
         "message": "City updated successfully",
         "city": city_data.city,
@@ -609,12 +1481,24 @@ async def update_user_city(city_data: CityUpdate, current_user: dict = Depends(g
     }
 
 @app.get("/api/explore/nearby")
-async def get_nearby_places(current_user: dict = Depends(get_current_user)):
+async def get_nearby_places(
+    lat: Optional[float] = None,
+    lng: Optional[float] = None,
+    radius_km: Optional[float] = Query(default=None, gt=0, le=NEARBY_MAX_RADIUS_KM),
+    limit: Optional[int] = Query(default=None, ge=1, le=NEARBY_MAX_LIMIT),
+    current_user: dict = Depends(get_current_user)
+):
     """Get nearby places/events - now uses manual entries instead of Google Maps"""
     user_city = current_user.get("city", "Your City")
     
-    # Get user's custom events
-    events = await db.events.find({"user_id": current_user["id"]}, {"_id": 0}).to_list(100)
+    center = geo_point(lat, lng)
+    if center:
+        # Nearest first within the radius
+        radius_km = radius_km if radius_km is not None else NEARBY_DEFAULT_RADIUS_KM
+        events = await storage.events.nearby(current_user["id"], lat, lng, radius_km, limit or NEARBY_DEFAULT_LIMIT)
+    else:
+        # Get user's custom events; without coordinates the limit stays at the original 100
+        events = await storage.events.list(current_user["id"], limit=limit or NEARBY_MAX_LIMIT)
     
     # Get default events for the city
     default_events = get_default_cultural_events(user_city)
@@ -623,7 +1507,7 @@ async def get_nearby_places(current_user: dict = Depends(get_current_user)):
     all_events = events + default_events
     
     persona = current_user.get("selected_persona", "casualBuddy")
-    message = get_persona_message("explore_event", persona)
+    message = get_persona_message("explore_event", persona, name=current_user.get("name"), city=user_city)
     
     return {
         "events": all_events,
@@ -631,6 +1515,110 @@ async def get_nearby_places(current_user: dict = Depends(get_current_user)):
         "message": message
     }
 
+# Request batching
+async def dispatch_subrequest(sub: BatchSubRequest, user: dict, authorization: bytes):
+    """Run one sub-request through the app in-process and capture its response."""
+    path, _, query = sub.path.partition("?")
+    body = b"" if sub.body is None else json.dumps(sub.body, default=json_default).encode()
+    headers = [(b"authorization", authorization), (b"content-length", str(len(body)).encode())]
+    if sub.body is not None:
+        headers.append((b"content-type", b"application/json"))
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": sub.method.upper(),
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": headers,
+        "client": None,
+        "server": None,
+        "state": {"batch_user": user},
+    }
+    
+    # Like a server, hand over the body once and report a disconnect only after
+    # the response is complete; streaming responses poll receive() meanwhile.
+    finished = asyncio.Event()
+    body_sent = False
+    async def receive():
+        nonlocal body_sent
+        if not body_sent:
+            body_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await finished.wait()
+        return {"type": "http.disconnect"}
+    
+    response = {"status": 500, "content_type": "", "chunks": []}
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+            response["content_type"] = dict(message.get("headers", [])).get(b"content-type", b"").decode()
+        elif message["type"] == "http.response.body":
+            response["chunks"].append(message.get("body", b""))
+            if not message.get("more_body", False):
+                finished.set()
+    
+    try:
+        await app(scope, receive, send)
+    except Exception:
+        # The error middleware has already sent a 500 for the sub-request
+        logger.exception("Batch sub-request %s %s failed", sub.method, sub.path)
+    finally:
+        finished.set()
+    
+    content = b"".join(response["chunks"])
+    if response["content_type"].startswith("application/json") and content:
+        content = json.loads(content)
+    else:
+        content = content.decode(errors="replace")
+    return {"status": response["status"], "body": content}
+
+@app.post("/api/batch")
+async def batch_requests(requests: List[BatchSubRequest], request: Request, current_user: dict = Depends(get_current_user)):
+    """Run independent API calls concurrently behind a single authentication"""
+    if not requests:
+        raise HTTPException(status_code=400, detail="Batch must not be empty")
+    if len(requests) > BATCH_MAX_REQUESTS:
+        raise HTTPException(status_code=413, detail=f"Batch is limited to {BATCH_MAX_REQUESTS} requests")
+    for sub in requests:
+        if sub.method.upper() not in BATCH_METHODS:
+            raise HTTPException(status_code=400, detail=f"Unsupported method: {sub.method}")
+        if not sub.path.startswith("/api/") or sub.path.partition("?")[0] == "/api/batch":
+            raise HTTPException(status_code=400, detail=f"Unsupported path: {sub.path}")
+    
+    authorization = request.headers["authorization"].encode()
+    results = await asyncio.gather(*(dispatch_subrequest(sub, current_user, authorization) for sub in requests))
+    
+    return {"responses": [{"index": index, **result} for index, result in enumerate(results)]}
+
+# App launch
+@app.get("/api/bootstrap")
+async def bootstrap(date: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+    """Profile, today's tasks, events, holidays and a greeting in one round trip"""
+    today = date or local_today(user_zone(current_user)).isoformat()
+    
+    # The user is authenticated once and shared by every section
+    tasks, events, holidays, greeting = await asyncio.gather(
+        get_tasks(date=today, current_user=current_user),
+        get_user_events(city=None, current_user=current_user),
+        get_holidays(date=today, current_user=current_user),
+        get_persona_message_api("morning_plan", current_user=current_user)
+    )
+    
+    return {
+        "user": current_user,
+        "trial_status": check_trial_status(current_user),
+        "date": today,
+        "tasks": tasks["tasks"],
+        "next_cursor": tasks["next_cursor"],
+        "events": events["events"],
+        "holidays": holidays["holidays"],
+        "greeting": greeting
+    }
+
 @app.post("/api/payment/subscribe")
 async def process_subscription(payment_data: dict, current_user: dict = Depends(get_current_user)):
     # This will be implemented with PayPal API
@@ -643,16 +1631,12 @@ async def process_subscription(payment_data: dict, current_user: dict = Depends(
     else:  # annual
         expires = datetime.utcnow() + timedelta(days=365)
     
-    await db.users.update_one(
-        {"id": current_user["id"]},
-        {
-            "$set": {
-                "subscription_active": True,
-                "subscription_expires": expires,
-                "subscription_plan": plan
-            }
-        }
-    )
+    await storage.users.update(current_user["id"], {
+        "subscription_active": True,
+        "subscription_expires": expires,
+        "subscription_plan": plan
+    })
+    user_cache.invalidate(current_user["id"])
     
     return {
         "success": True,
@@ -0,0 +1,731 @@
+"""Embedded SQLite storage backend.
+
+For single-node deployments: the database is a local file, so a query costs a
+function call instead of a network round trip. Documents are stored as JSON
+next to the columns the queries filter and sort on, and every query path has
+a covering index.
+
+The database runs in WAL mode, so readers never wait for the writer. sqlite3
+blocks, so statements run in threads: reads on a small pool with one
+connection per thread, writes on a single thread, each in its own
+``BEGIN IMMEDIATE`` transaction. Expired tombstones and idempotency keys are
+purged as new ones are written, standing in for Mongo's TTL indexes.
+"""
+import asyncio
+import json
+import logging
+import math
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from recurrence import NO_REPEAT
+from repositories import (
+    DayPlanRepository,
+    DuplicateError,
+    EventRepository,
+    IdempotencyRepository,
+    NotificationRepository,
+    Storage,
+    TaskRepository,
+    TombstoneRepository,
+    UserRepository,
+    distance_km,
+    stored_datetime,
+    stored_document,
+)
+from time_zones import UTC, local_date
+
+logger = logging.getLogger("cc_calendar.storage")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    doc TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    date TEXT,
+    one_off INTEGER NOT NULL,
+    completed INTEGER NOT NULL,
+    reminder TEXT,
+    reminder_sent INTEGER NOT NULL,
+    updated_at TEXT,
+    doc TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS events (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    city TEXT,
+    lat REAL,
+    lng REAL,
+    updated_at TEXT,
+    doc TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS day_plans (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    date TEXT,
+    doc TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tombstones (
+    user_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    id TEXT NOT NULL,
+    deleted_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    key TEXT PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    doc TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS notifications (
+    user_id TEXT,
+    created_at TEXT,
+    doc TEXT NOT NULL
+);
+"""
+
+# Secondary indexes, the counterpart of mongo_storage.indexes(): (name, definition)
+INDEXES = [
+    ("tasks_user_date_id", "tasks (user_id, date, id)"),
+    ("tasks_user_one_off_date_id", "tasks (user_id, one_off, date, id)"),
+    ("tasks_reminder", "tasks (reminder) WHERE reminder IS NOT NULL AND reminder_sent = 0 AND completed = 0"),
+    ("tasks_user_updated", "tasks (user_id, updated_at)"),
+    ("events_user_city", "events (user_id, city)"),
+    ("events_user_lat", "events (user_id, lat) WHERE lat IS NOT NULL"),
+    ("events_user_updated", "events (user_id, updated_at)"),
+    ("day_plans_user_date", "day_plans (user_id, date)"),
+    ("tombstones_user_deleted", "tombstones (user_id, deleted_at)"),
+    ("tombstones_deleted", "tombstones (deleted_at)"),
+    ("idempotency_created", "idempotency_keys (created_at)"),
+]
+
+# Kilometres per degree of latitude, for the nearby bounding box
+KM_PER_DEGREE = 111.2
+
+def column_datetime(value):
+    """Datetimes as fixed-width ISO strings, which sort chronologically."""
+    if not isinstance(value, datetime):
+        return None
+    return stored_datetime(value).isoformat(timespec="microseconds")
+
+def changed_clause(column: str, since: datetime, after_id: str = None):
+    """SQL condition and parameters for rows changed after ``since``, or at it with an id after ``after_id``."""
+    if after_id is None:
+        return f"{column} > ?", (column_datetime(since),)
+    return f"({column} > ? OR ({column} = ? AND id > ?))", (column_datetime(since), column_datetime(since), after_id)
+
+def encode_value(value):
+    if isinstance(value, datetime):
+        return {"$date": column_datetime(value)}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def decode_object(value: dict):
+    if len(value) == 1 and "$date" in value:
+        return datetime.fromisoformat(value["$date"])
+    return value
+
+def encode(document) -> str:
+    return json.dumps(document, default=encode_value, separators=(",", ":"))
+
+def decode(text: str):
+    return json.loads(text, object_hook=decode_object)
+
+def task_row(task: dict):
+    return (
+        task["id"],
+        task["user_id"],
+        column_datetime(task.get("date")),
+        int(task.get("repeat") in NO_REPEAT),
+        int(bool(task.get("completed"))),
+        column_datetime(task.get("reminder")),
+        int(bool(task.get("reminder_sent"))),
+        column_datetime(task.get("updated_at")),
+        encode(task),
+    )
+
+def event_row(event: dict):
+    coordinates = (event.get("geo") or {}).get("coordinates") or (None, None)
+    return (
+        event["id"],
+        event["user_id"],
+        event.get("city"),
+        coordinates[1],
+        coordinates[0],
+        column_datetime(event.get("updated_at")),
+        encode(event),
+    )
+
+TASK_INSERT = "INSERT INTO tasks (id, user_id, date, one_off, completed, reminder, reminder_sent, updated_at, doc) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+TASK_REPLACE = "UPDATE tasks SET user_id = ?, date = ?, one_off = ?, completed = ?, reminder = ?, reminder_sent = ?, updated_at = ?, doc = ? WHERE id = ?"
+EVENT_INSERT = "INSERT INTO events (id, user_id, city, lat, lng, updated_at, doc) VALUES (?, ?, ?, ?, ?, ?, ?)"
+EVENT_REPLACE = "UPDATE events SET user_id = ?, city = ?, lat = ?, lng = ?, updated_at = ?, doc = ? WHERE id = ?"
+
+class SQLiteDatabase:
+    """Connections and the read and write thread pools."""
+
+    def __init__(self, path: str, readers: int = 4):
+        self.path = path
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._readers = ThreadPoolExecutor(max_workers=readers, thread_name_prefix="sqlite-read")
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-write")
+        connection = self._connect()
+        try:
+            connection.executescript(SCHEMA)
+        finally:
+            connection.close()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        # Durable at checkpoints; a crash can lose the last commits but never corrupts
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute("PRAGMA busy_timeout=5000")
+        connection.execute("PRAGMA temp_store=MEMORY")
+        return connection
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = self._connect()
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    def _run_read(self, function, args):
+        return function(self._connection(), *args)
+
+    def _run_write(self, function, args):
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            result = function(connection, *args)
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+        return result
+
+    async def read(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._readers, self._run_read, function, args)
+
+    async def write(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._writer, self._run_write, function, args)
+
+    def close(self):
+        self._readers.shutdown(wait=True)
+        self._writer.shutdown(wait=True)
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+
+class SQLiteUsers(UserRepository):
+    def __init__(self, database: SQLiteDatabase):
+        self.database = database
+
+    @staticmethod
+    def _get(connection, column: str, value: str):
+        row = connection.execute(f"SELECT doc FROM users WHERE {column} = ?", (value,)).fetchone()
+        return decode(row[0]) if row else None
+
+    async def get(self, user_id: str):
+        return await self.database.read(self._get, "id", user_id)
+
+    async def find_by_name(self, name: str):
+        return await self.database.read(self._get, "name", name)
+
+    async def insert(self, user: dict) -> dict:
+        user = stored_document(user)
+        def insert(connection):
+            connection.execute("INSERT INTO users (id, name, doc) VALUES (?, ?, ?)", (user["id"], user["name"], encode(user)))
+        try:
+            await self.database.write(insert)
+        except sqlite3.IntegrityError as exc:
+            raise DuplicateError(str(exc)) from exc
+        return user
+
+    async def update(self, user_id: str, fields: dict) -> bool:
+        def update(connection):
+            user = self._get(connection, "id", user_id)
+            if user is None:
+                return False
+            user.update(stored_document(fields))
+            connection.execute("UPDATE users SET name = ?, doc = ? WHERE id = ?", (user["name"], encode(user), user_id))
+            return True
+        return await self.database.write(update)
+
+class SQLiteTasks(TaskRepository):
+    def __init__(self, database: SQLiteDatabase):
+        self.database = database
+
+    @staticmethod
+    def _get(connection, user_id: str, task_id: str):
+        row = connection.execute("SELECT doc FROM tasks WHERE id = ? AND user_id = ?", (task_id, user_id)).fetchone()
+        return decode(row[0]) if row else None
+
+    @staticmethod
+    def _save(connection, task: dict):
+        row = task_row(task)
+        connection.execute(TASK_REPLACE, row[1:] + row[:1])
+
+    @staticmethod
+    def _insert(connection, task: dict):
+        connection.execute(TASK_INSERT, task_row(stored_document(task)))
+
+    @staticmethod
+    def _override(task: dict, key: str, fields: dict, updated_at: datetime, merge: bool):
+        overrides = task.setdefault("overrides", {})
+        if merge:
+            overrides.setdefault(key, {}).update(stored_document(fields))
+        else:
+            overrides[key] = stored_document(fields)
+        task["updated_at"] = stored_datetime(updated_at)
+
+    @staticmethod
+    def _exception(task: dict, key: str, updated_at: datetime):
+        exceptions = task.setdefault("exceptions", [])
+        if key not in exceptions:
+            exceptions.append(key)
+        (task.get("overrides") or {}).pop(key, None)
+        task["updated_at"] = stored_datetime(updated_at)
+
+    async def insert(self, task: dict) -> dict:
+        task = stored_document(task)
+        await self.database.write(self._insert, task)
+        return task
+
+    async def insert_many(self, tasks: list) -> list:
+        tasks = [stored_document(task) for task in tasks]
+        def insert(connection):
+            connection.executemany(TASK_INSERT, [task_row(task) for task in tasks])
+        if tasks:
+            await self.database.write(insert)
+        return tasks
+
+    async def get_many(self, user_id: str, task_ids) -> dict:
+        task_ids = list(task_ids)
+        def get_many(connection):
+            placeholders = ", ".join("?" * len(task_ids))
+            rows = connection.execute(
+                f"SELECT doc FROM tasks WHERE user_id = ? AND id IN ({placeholders})", [user_id, *task_ids]
+            ).fetchall()
+            return {task["id"]: task for task in (decode(row[0]) for row in rows)}
+        return await self.database.read(get_many) if task_ids else {}
+
+    async def list(self, user_id: str, start: datetime = None, end: datetime = None, *,
+                   one_off: bool = False, pending: bool = False, after=None, limit: int = None):
+        clauses, params = ["user_id = ?"], [user_id]
+        if one_off:
+            clauses.append("one_off = 1")
+        if start is not None:
+            clauses.append("date >= ?")
+            params.append(column_datetime(start))
+        if end is not None:
+            clauses.append("date < ?")
+            params.append(column_datetime(end))
+        if pending:
+            clauses.append("completed = 0")
+        if after:
+            clauses.append("(date > ? OR (date = ? AND id > ?))")
+            after_date = column_datetime(after[0])
+            params.extend((after_date, after_date, after[1]))
+        sql = f"SELECT doc FROM tasks WHERE {' AND '.join(clauses)} ORDER BY date, id"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        def select(connection):
+            return [decode(row[0]) for row in connection.execute(sql, params)]
+        return await self.database.read(select)
+
+    async def series(self, user_id: str, before: datetime):
+        def select(connection):
+            rows = connection.execute(
+                "SELECT doc FROM tasks WHERE user_id = ? AND one_off = 0 AND date < ?", (user_id, column_datetime(before))
+            )
+            return [decode(row[0]) for row in rows]
+        return await self.database.read(select)
+
+    async def update(self, user_id: str, task_id: str, fields: dict):
+        def update(connection):
+            previous = self._get(connection, user_id, task_id)
+            if previous is not None:
+                self._save(connection, {**previous, **stored_document(fields)})
+            return previous
+        return await self.database.write(update)
+
+    async def set_override(self, user_id: str, series_id: str, key: str, fields: dict,
+                           updated_at: datetime, merge: bool = False):
+        def set_override(connection):
+            task = self._get(connection, user_id, series_id)
+            if task is not None:
+                self._override(task, key, fields, updated_at, merge)
+                self._save(connection, task)
+            return task
+        return await self.database.write(set_override)
+
+    async def add_exception(self, user_id: str, series_id: str, key: str, updated_at: datetime) -> bool:
+        def add_exception(connection):
+            task = self._get(connection, user_id, series_id)
+            if task is None:
+                return False
+            self._exception(task, key, updated_at)
+            self._save(connection, task)
+            return True
+        return await self.database.write(add_exception)
+
+    async def delete(self, user_id: str, task_id: str):
+        def delete(connection):
+            task = self._get(connection, user_id, task_id)
+            if task is not None:
+                connection.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+            return task
+        return await self.database.write(delete)
+
+    async def apply(self, user_id: str, writes) -> dict:
+        def apply(connection):
+            failed = {}
+            for position, write in enumerate(writes):
+                if write.kind == "insert":
+                    try:
+                        self._insert(connection, write.document)
+                    except sqlite3.IntegrityError as exc:
+                        failed[position] = str(exc)
+                    continue
+                task = self._get(connection, user_id, write.task_id)
+                if task is None:
+                    # As in Mongo, a write that matches nothing is not an error
+                    continue
+                if write.kind == "update":
+                    self._save(connection, {**task, **stored_document(write.fields)})
+                elif write.kind == "override":
+                    self._override(task, write.key, write.fields, write.updated_at, write.merge)
+                    self._save(connection, task)
+                elif write.kind == "exception":
+                    self._exception(task, write.key, write.updated_at)
+                    self._save(connection, task)
+                elif write.kind == "delete":
+                    connection.execute("DELETE FROM tasks WHERE id = ?", (write.task_id,))
+                else:
+                    raise ValueError(f"Unknown task write: {write.kind}")
+            return failed
+        return await self.database.write(apply) if writes else {}
+
+    async def day_counts(self, user_id: str, start: datetime, end: datetime, zone=UTC):
+        # SQLite has no time zones: group by UTC minute (zone offsets are whole
+        # minutes) and fold the buckets into local days here
+        def select(connection):
+            rows = connection.execute(
+                """
+                SELECT substr(date, 1, 16), json_extract(doc, '$.priority'), json_extract(doc, '$.task_type'),
+                       completed, COUNT(*), MIN(json_extract(doc, '$.time'))
+                FROM tasks
+                WHERE user_id = ? AND one_off = 1 AND date >= ? AND date < ?
+                GROUP BY 1, 2, 3, 4
+                """,
+                (user_id, column_datetime(start), column_datetime(end))
+            )
+            groups = {}
+            for minute, priority, task_type, completed, count, earliest_time in rows:
+                day = local_date(datetime.fromisoformat(minute), zone).isoformat()
+                row = groups.setdefault((day, priority, task_type, completed), {
+                    "day": day, "priority": priority, "task_type": task_type, "completed": bool(completed),
+                    "count": 0, "earliest_time": None
+                })
+                row["count"] += count
+                if earliest_time is not None and (row["earliest_time"] is None or earliest_time < row["earliest_time"]):
+                    row["earliest_time"] = earliest_time
+            return list(groups.values())
+        return await self.database.read(select)
+
+    async def changed_since(self, user_id: str, since: datetime, limit: int, after_id: str = None):
+        changed, parameters = changed_clause("updated_at", since, after_id)
+        def select(connection):
+            rows = connection.execute(
+                f"SELECT doc FROM tasks WHERE user_id = ? AND {changed} ORDER BY updated_at, id LIMIT ?",
+                (user_id, *parameters, limit)
+            )
+            return [decode(row[0]) for row in rows]
+        return await self.database.read(select)
+
+    async def all(self, user_id: str):
+        def select(connection):
+            return [decode(row[0]) for row in connection.execute("SELECT doc FROM tasks WHERE user_id = ?", (user_id,))]
+        return await self.database.read(select)
+
+    async def due_reminders(self, since: datetime, until: datetime):
+        def select(connection):
+            rows = connection.execute(
+                "SELECT id, reminder FROM tasks WHERE reminder >= ? AND reminder < ? AND reminder_sent = 0 AND completed = 0",
+                (column_datetime(since), column_datetime(until))
+            )
+            return [{"id": task_id, "reminder": datetime.fromisoformat(reminder)} for task_id, reminder in rows]
+        return await self.database.read(select)
+
+    async def claim_reminder(self, task_id: str, fire_at: datetime):
+        def claim(connection):
+            row = connection.execute(
+                "SELECT doc FROM tasks WHERE id = ? AND reminder = ? AND reminder_sent = 0",
+                (task_id, column_datetime(fire_at))
+            ).fetchone()
+            if row is None:
+                return None
+            task = decode(row[0])
+            self._save(connection, {**task, "reminder_sent": True})
+            return task
+        return await self.database.write(claim)
+
+    async def release_reminder(self, task_id: str, fire_at: datetime):
+        def release(connection):
+            row = connection.execute(
+                "SELECT doc FROM tasks WHERE id = ? AND reminder = ? AND reminder_sent = 1",
+                (task_id, column_datetime(fire_at))
+            ).fetchone()
+            if row is not None:
+                self._save(connection, {**decode(row[0]), "reminder_sent": False})
+        await self.database.write(release)
+
+class SQLiteEvents(EventRepository):
+    def __init__(self, database: SQLiteDatabase):
+        self.database = database
+
+    async def insert(self, event: dict) -> dict:
+        event = stored_document(event)
+        await self.database.write(lambda connection: connection.execute(EVENT_INSERT, event_row(event)))
+        return event
+
+    async def insert_many(self, events: list) -> list:
+        events = [stored_document(event) for event in events]
+        if events:
+            rows = [event_row(event) for event in events]
+            await self.database.write(lambda connection: connection.executemany(EVENT_INSERT, rows))
+        return events
+
+    async def list(self, user_id: str, city: str = None, limit: int = None):
+        sql, params = "SELECT doc FROM events WHERE user_id = ?", [user_id]
+        if city:
+            sql += " AND city = ?"
+            params.append(city)
+        sql += " ORDER BY rowid"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        def select(connection):
+            return [decode(row[0]) for row in connection.execute(sql, params)]
+        return await self.database.read(select)
+
+    async def update(self, user_id: str, event_id: str, fields: dict) -> bool:
+        def update(connection):
+            row = connection.execute("SELECT doc FROM events WHERE id = ? AND user_id = ?", (event_id, user_id)).fetchone()
+            if row is None:
+                return False
+            values = event_row({**decode(row[0]), **stored_document(fields)})
+            connection.execute(EVENT_REPLACE, values[1:] + values[:1])
+            return True
+        return await self.database.write(update)
+
+    async def delete(self, user_id: str, event_id: str) -> bool:
+        def delete(connection):
+            return connection.execute("DELETE FROM events WHERE id = ? AND user_id = ?", (event_id, user_id)).rowcount > 0
+        return await self.database.write(delete)
+
+    async def nearby(self, user_id: str, lat: float, lng: float, radius_km: float, limit: int):
+        # A bounding box narrows the scan through the (user_id, lat) index; exact distances are computed here
+        lat_span = radius_km / KM_PER_DEGREE
+        sql = "SELECT doc, lat, lng FROM events WHERE user_id = ? AND lat BETWEEN ? AND ?"
+        params = [user_id, lat - lat_span, lat + lat_span]
+        # Longitude degrees shrink towards the poles; skip that bound where the box would wrap
+        cos_lat = math.cos(math.radians(min(abs(lat) + lat_span, 90.0)))
+        if cos_lat > 1e-6:
+            lng_span = lat_span / cos_lat
+            if lng - lng_span >= -180 and lng + lng_span <= 180:
+                sql += " AND lng BETWEEN ? AND ?"
+                params.extend((lng - lng_span, lng + lng_span))
+        def select(connection):
+            matches = []
+            for doc, event_lat, event_lng in connection.execute(sql, params):
+                distance = distance_km(lat, lng, event_lat, event_lng)
+                if distance <= radius_km:
+                    matches.append((distance, doc))
+            matches.sort(key=lambda match: match[0])
+            events = []
+            for distance, doc in matches[:limit]:
+                event = decode(doc)
+                event["distance_km"] = round(distance, 3)
+                events.append(event)
+            return events
+        return await self.database.read(select)
+
+    async def changed_since(self, user_id: str, since: datetime, limit: int, after_id: str = None):
+        changed, parameters = changed_clause("updated_at", since, after_id)
+        def select(connection):
+            rows = connection.execute(
+                f"SELECT doc FROM events WHERE user_id = ? AND {changed} ORDER BY updated_at, id LIMIT ?",
+                (user_id, *parameters, limit)
+            )
+            return [decode(row[0]) for row in rows]
+        return await self.database.read(select)
+
+    async def all(self, user_id: str):
+        def select(connection):
+            return [decode(row[0]) for row in connection.execute("SELECT doc FROM events WHERE user_id = ? ORDER BY rowid", (user_id,))]
+        return await self.database.read(select)
+
+class SQLiteDayPlans(DayPlanRepository):
+    def __init__(self, database: SQLiteDatabase):
+        self.database = database
+
+    async def get(self, plan_id: str):
+        def select(connection):
+            row = connection.execute("SELECT doc FROM day_plans WHERE id = ?", (plan_id,)).fetchone()
+            return decode(row[0]) if row else None
+        return await self.database.read(select)
+
+    async def save(self, plan: dict):
+        plan = stored_document(plan)
+        await self.database.write(lambda connection: connection.execute(
+            "INSERT OR REPLACE INTO day_plans (id, user_id, date, doc) VALUES (?, ?, ?, ?)",
+            (plan["id"], plan["user_id"], column_datetime(plan.get("date")), encode(plan))
+        ))
+
+    async def delete_ids(self, plan_ids):
+        plan_ids = list(plan_ids)
+        if plan_ids:
+            placeholders = ", ".join("?" * len(plan_ids))
+            await self.database.write(lambda connection: connection.execute(f"DELETE FROM day_plans WHERE id IN ({placeholders})", plan_ids))
+
+    async def delete_from(self, user_id: str, day: datetime):
+        await self.database.write(lambda connection: connection.execute(
+            "DELETE FROM day_plans WHERE user_id = ? AND date >= ?", (user_id, column_datetime(day))
+        ))
+
+class SQLiteTombstones(TombstoneRepository):
+    def __init__(self, database: SQLiteDatabase, ttl: int):
+        self.database = database
+        self.ttl = ttl
+
+    async def add(self, tombstone: dict):
+        await self.add_many([tombstone])
+
+    async def add_many(self, tombstones: list):
+        rows = [(t["user_id"], t["kind"], t["id"], column_datetime(t["deleted_at"])) for t in tombstones]
+        expired = column_datetime(datetime.utcnow() - timedelta(seconds=self.ttl))
+        def add(connection):
+            connection.execute("DELETE FROM tombstones WHERE deleted_at < ?", (expired,))
+            connection.executemany("INSERT INTO tombstones (user_id, kind, id, deleted_at) VALUES (?, ?, ?, ?)", rows)
+        if rows:
+            await self.database.write(add)
+
+    async def since(self, user_id: str, since: datetime, limit: int, after_id: str = None):
+        changed, parameters = changed_clause("deleted_at", since, after_id)
+        def select(connection):
+            rows = connection.execute(
+                f"SELECT kind, id, deleted_at FROM tombstones WHERE user_id = ? AND {changed} ORDER BY deleted_at, id LIMIT ?",
+                (user_id, *parameters, limit)
+            )
+            return [{"kind": kind, "id": doc_id, "deleted_at": datetime.fromisoformat(deleted_at)} for kind, doc_id, deleted_at in rows]
+        return await self.database.read(select)
+
+class SQLiteIdempotency(IdempotencyRepository):
+    def __init__(self, database: SQLiteDatabase, ttl: int):
+        self.database = database
+        self.ttl = ttl
+
+    async def claim(self, record: dict):
+        record = stored_document(record)
+        expired = column_datetime(datetime.utcnow() - timedelta(seconds=self.ttl))
+        def claim(connection):
+            connection.execute("DELETE FROM idempotency_keys WHERE created_at < ?", (expired,))
+            connection.execute(
+                "INSERT INTO idempotency_keys (key, created_at, doc) VALUES (?, ?, ?)",
+                (record["key"], column_datetime(record["created_at"]), encode(record))
+            )
+        try:
+            await self.database.write(claim)
+        except sqlite3.IntegrityError as exc:
+            raise DuplicateError(str(exc)) from exc
+
+    async def get(self, key: str):
+        def select(connection):
+            row = connection.execute("SELECT doc FROM idempotency_keys WHERE key = ?", (key,)).fetchone()
+            return decode(row[0]) if row else None
+        return await self.database.read(select)
+
+    async def take_over(self, key: str, stale_before: datetime, now: datetime) -> bool:
+        def take_over(connection):
+            row = connection.execute(
+                "SELECT doc FROM idempotency_keys WHERE key = ? AND created_at < ?", (key, column_datetime(stale_before))
+            ).fetchone()
+            if row is None or decode(row[0])["state"] != "pending":
+                return False
+            record = dict(decode(row[0]), created_at=stored_datetime(now))
+            connection.execute(
+                "UPDATE idempotency_keys SET created_at = ?, doc = ? WHERE key = ?",
+                (column_datetime(now), encode(record), key)
+            )
+            return True
+        return await self.database.write(take_over)
+
+    async def complete(self, key: str, response):
+        response = stored_document(response)
+        def complete(connection):
+            row = connection.execute("SELECT doc FROM idempotency_keys WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                record = dict(decode(row[0]), state="done", response=response)
+                connection.execute("UPDATE idempotency_keys SET doc = ? WHERE key = ?", (encode(record), key))
+        await self.database.write(complete)
+
+    async def release(self, key: str):
+        await self.database.write(lambda connection: connection.execute("DELETE FROM idempotency_keys WHERE key = ?", (key,)))
+
+class SQLiteNotifications(NotificationRepository):
+    def __init__(self, database: SQLiteDatabase):
+        self.database = database
+
+    async def insert(self, notification: dict):
+        notification = stored_document(notification)
+        await self.database.write(lambda connection: connection.execute(
+            "INSERT INTO notifications (user_id, created_at, doc) VALUES (?, ?, ?)",
+            (notification.get("user_id"), column_datetime(notification.get("created_at")), encode(notification))
+        ))
+
+class SQLiteStorage(Storage):
+    def __init__(self, path: str, readers: int = 4, idempotency_ttl: int = 86400, tombstone_ttl: int = 30 * 86400):
+        self.database = SQLiteDatabase(path, readers)
+        self.users = SQLiteUsers(self.database)
+        self.tasks = SQLiteTasks(self.database)
+        self.events = SQLiteEvents(self.database)
+        self.day_plans = SQLiteDayPlans(self.database)
+        self.tombstones = SQLiteTombstones(self.database, tombstone_ttl)
+        self.idempotency = SQLiteIdempotency(self.database, idempotency_ttl)
+        self.notifications = SQLiteNotifications(self.database)
+
+    async def ensure_indexes(self, status: dict):
+        status.update(ready=False, built=0, total=len(INDEXES), current=None, error=None, retries=0)
+        for position, (name, definition) in enumerate(INDEXES, start=1):
+            status["current"] = name
+            logger.info("Ensuring index %s (%d/%d)", name, position, len(INDEXES))
+            started = time.monotonic()
+            try:
+                await self.database.write(lambda connection: connection.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {definition}"))
+            except sqlite3.Error as exc:
+                status["error"] = f"{name}: {exc}"
+                logger.error("Index build failed for %s: %s", name, exc)
+                return
+            status["built"] = position
+            logger.info("Index %s ready in %.2fs", name, time.monotonic() - started)
+
+        # Refresh the planner's statistics now that the indexes exist
+        await self.database.write(lambda connection: connection.execute("PRAGMA optimize"))
+        status.update(ready=True, current=None)
+        logger.info("All %d indexes ready", len(INDEXES))
+
+    async def close(self):
+        await asyncio.get_running_loop().run_in_executor(None, self.database.close)
@@ -0,0 +1,54 @@
+"""API tests run in-process on the memory backend.
+
+Run from backend/: ``python -m pytest tests``. Each test gets a fresh
+MemoryStorage behind the app and an httpx client on the ASGI transport, so
+nothing outside the process is needed.
+"""
+import os
+import sys
+
+os.environ["STORAGE_BACKEND"] = "memory"
+os.environ.setdefault("REMINDERS_ENABLED", "false")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+import pytest
+
+import server
+from memory_storage import MemoryStorage
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+@pytest.fixture
+def storage():
+    backend = MemoryStorage()
+    server.set_storage(backend)
+    return backend
+
+@pytest.fixture
+async def client(storage):
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+@pytest.fixture
+def onboard(client):
+    """Create a user and return its auth headers."""
+    count = 0
+
+    async def onboard(timezone: str = "UTC", city: str = "New York", country: str = "United States"):
+        nonlocal count
+        count += 1
+        response = await client.post("/api/onboarding", json={
+            "name": f"user-{count}",
+            "timezone": timezone,
+            "city": city,
+            "country": country,
+            "personality_type": "balanced",
+            "selected_persona": "casualBuddy",
+        })
+        assert response.status_code == 200, response.text
+        return {"Authorization": f"Bearer {response.json()['token']}"}
+    return onboard
@@ -0,0 +1,65 @@
+import json
+
+import anyio
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+async def batch(client, headers, requests):
+    response = await client.post("/api/batch", headers=headers, json=requests)
+    assert response.status_code == 200, response.text
+    return response.json()["responses"]
+
+async def test_sub_requests_run_in_order_of_the_batch(client, onboard):
+    headers = await onboard()
+    responses = await batch(client, headers, [
+        {"method": "POST", "path": "/api/tasks", "body": {"title": "Swim", "date": "2024-05-01T07:00:00Z"}},
+        {"method": "GET", "path": "/api/user/profile"},
+        {"method": "DELETE", "path": "/api/tasks/missing"},
+        {"method": "POST", "path": "/api/tasks", "body": {"date": "2024-05-01T07:00:00Z"}},
+    ])
+    assert [r["index"] for r in responses] == [0, 1, 2, 3]
+    assert [r["status"] for r in responses] == [200, 200, 404, 422]
+    assert responses[0]["body"]["task"]["title"] == "Swim"
+    assert responses[1]["body"]["user"]["name"] == "user-1"
+
+async def test_streaming_sub_requests_complete(client, onboard):
+    headers = await onboard()
+    for title in ("Swim", "Read"):
+        await client.post("/api/tasks", headers=headers, json={"title": title, "date": "2024-05-01T07:00:00Z"})
+
+    with anyio.fail_after(5):
+        responses = await batch(client, headers, [
+            {"method": "GET", "path": "/api/tasks?date=2024-05-01&stream=true"},
+            {"method": "GET", "path": "/api/tasks?date=2024-05-01"},
+        ])
+    assert responses[0]["status"] == 200
+    streamed = [json.loads(line)["title"] for line in responses[0]["body"].splitlines()]
+    assert streamed == [t["title"] for t in responses[1]["body"]["tasks"]]
+    assert sorted(streamed) == ["Read", "Swim"]
+
+async def test_replaying_a_batch_of_reads_returns_the_same_responses(client, onboard):
+    headers = await onboard()
+    await client.post("/api/tasks", headers=headers, json={"title": "Swim", "date": "2024-05-01T07:00:00Z"})
+    requests = [
+        {"method": "GET", "path": "/api/tasks?date=2024-05-01"},
+        {"method": "GET", "path": "/api/calendar/summary?start=2024-05-01&end=2024-05-07"},
+    ]
+    assert await batch(client, headers, requests) == await batch(client, headers, requests)
+
+async def test_invalid_batches_are_rejected(client, onboard, monkeypatch):
+    headers = await onboard()
+    for requests in (
+        [],
+        [{"method": "PATCH", "path": "/api/tasks"}],
+        [{"method": "GET", "path": "/health"}],
+        [{"method": "POST", "path": "/api/batch", "body": []}],
+    ):
+        response = await client.post("/api/batch", headers=headers, json=requests)
+        assert response.status_code == 400, requests
+
+    monkeypatch.setattr(server, "BATCH_MAX_REQUESTS", 1)
+    response = await client.post("/api/batch", headers=headers, json=[{"path": "/api/user/profile"}] * 2)
+    assert response.status_code == 413
@@ -0,0 +1,45 @@
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+async def test_bootstrap_matches_the_individual_routes(client, onboard):
+    headers = await onboard(timezone="Tokyo, Japan (Asia/Tokyo)", city="Tokyo", country="Japan")
+    await client.post("/api/tasks", headers=headers, json={"title": "Early run", "date": "2024-05-01T20:00:00Z"})
+    await client.post("/api/events", headers=headers, json={"title": "Ramen", "event_type": "food", "location": "Ichiran", "city": "Tokyo"})
+
+    body = (await client.get("/api/bootstrap", headers=headers, params={"date": "2024-05-02"})).json()
+    profile = (await client.get("/api/user/profile", headers=headers)).json()
+    tasks = (await client.get("/api/tasks", headers=headers, params={"date": "2024-05-02"})).json()
+    events = (await client.get("/api/events", headers=headers)).json()
+    holidays = (await client.get("/api/recommendations/holidays", headers=headers, params={"date": "2024-05-02"})).json()
+
+    assert body["user"] == profile["user"]
+    assert body["trial_status"] == profile["trial_status"]
+    assert body["date"] == "2024-05-02"
+    assert [t["title"] for t in body["tasks"]] == ["Early run"]
+    assert body["tasks"] == tasks["tasks"] and body["next_cursor"] == tasks["next_cursor"]
+    assert body["events"] == events["events"]
+    assert body["holidays"] == holidays["holidays"]
+    assert "Children's Day" in [h["name"] for h in body["holidays"]]
+    assert body["greeting"]["message"]
+
+async def test_replaying_bootstrap_changes_nothing(client, onboard):
+    headers = await onboard()
+    await client.post("/api/tasks", headers=headers, json={"title": "Swim", "date": "2024-05-01T07:00:00Z"})
+    token = (await client.get("/api/sync", headers=headers)).json()["next_token"]
+    before = (await client.get("/api/sync", headers=headers, params={"since": token})).json()
+
+    first = (await client.get("/api/bootstrap", headers=headers, params={"date": "2024-05-01"})).json()
+    second = (await client.get("/api/bootstrap", headers=headers, params={"date": "2024-05-01"})).json()
+    # Only the greeting's timestamp moves between calls
+    for body in (first, second):
+        del body["greeting"]["timestamp"]
+    assert first == second
+
+    after = (await client.get("/api/sync", headers=headers, params={"since": token})).json()
+    assert after["tasks"] == before["tasks"] and after["events"] == before["events"]
+
+async def test_bootstrap_rejects_bad_dates(client, onboard):
+    headers = await onboard()
+    response = await client.get("/api/bootstrap", headers=headers, params={"date": "not-a-date"})
+    assert response.status_code == 400
@@ -0,0 +1,62 @@
+import pytest
+
+from recurrence import occurrence_id
+
+pytestmark = pytest.mark.anyio
+
+async def create(client, headers, **fields):
+    task = {"title": "Task", "date": "2024-05-01T09:00:00Z", **fields}
+    return (await client.post("/api/tasks", headers=headers, json=task)).json()["task"]["id"]
+
+async def test_each_operation_gets_its_own_status(client, onboard):
+    headers = await onboard()
+    keep, drop = await create(client, headers), await create(client, headers)
+
+    response = await client.post("/api/tasks:bulk", headers=headers, json=[
+        {"op": "create", "task": {"title": "New", "date": "2024-05-01T10:00:00Z"}},
+        {"op": "complete", "id": keep},
+        {"op": "delete", "id": drop},
+        {"op": "delete", "id": "missing"},
+        {"op": "rename", "id": keep},
+        {"op": "update", "id": drop},
+    ])
+    assert response.status_code == 200
+    body = response.json()
+    assert [r["status"] for r in body["results"]] == [201, 200, 200, 404, 400, 400]
+    assert (body["succeeded"], body["failed"]) == (3, 3)
+
+    tasks = (await client.get("/api/tasks", headers=headers, params={"date": "2024-05-01"})).json()["tasks"]
+    by_id = {t["id"]: t for t in tasks}
+    assert set(by_id) == {keep, body["results"][0]["id"]}
+    assert by_id[keep]["completed"]
+
+async def test_a_task_is_changed_at_most_once_per_request(client, onboard):
+    headers = await onboard()
+    task_id = await create(client, headers)
+
+    body = (await client.post("/api/tasks:bulk", headers=headers, json=[
+        {"op": "complete", "id": task_id},
+        {"op": "delete", "id": task_id},
+    ])).json()
+    assert [r["status"] for r in body["results"]] == [200, 400]
+    tasks = (await client.get("/api/tasks", headers=headers, params={"date": "2024-05-01"})).json()["tasks"]
+    assert [t["id"] for t in tasks] == [task_id]
+
+async def test_distinct_occurrences_of_one_series_can_change_together(client, onboard):
+    headers = await onboard()
+    series_id = await create(client, headers, repeat="daily")
+
+    body = (await client.post("/api/tasks:bulk", headers=headers, json=[
+        {"op": "complete", "id": occurrence_id(series_id, "2024-05-02")},
+        {"op": "delete", "id": occurrence_id(series_id, "2024-05-03")},
+        {"op": "delete", "id": occurrence_id(series_id, "2024-05-03")},
+        {"op": "delete", "id": series_id},
+    ])).json()
+    assert [r["status"] for r in body["results"]] == [200, 200, 400, 400]
+
+    tasks = (await client.get("/api/tasks", headers=headers, params={
+        "start_date": "2024-05-01T00:00:00Z", "end_date": "2024-05-03T23:59:59Z"
+    })).json()["tasks"]
+    assert [(t["id"], t["completed"]) for t in tasks] == [
+        (occurrence_id(series_id, "2024-05-01"), False), (occurrence_id(series_id, "2024-05-02"), True)
+    ]
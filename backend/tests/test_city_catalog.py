@@ -0,0 +1,55 @@
+import json
+import os
+
+import pytest
+
+from city_catalog import CityCatalog, normalize_city
+
+pytestmark = pytest.mark.anyio
+
+EVENT = {"event_type": "cultural", "location": "Somewhere"}
+
+def write(path, raw, mtime):
+    path.write_text(json.dumps(raw), encoding="utf-8")
+    os.utime(path, (mtime, mtime))
+
+@pytest.fixture
+def catalog(tmp_path):
+    path = tmp_path / "cities.json"
+    write(path, {
+        "default": [{"id": "d1", "title": "Art walk", **EVENT}],
+        "cities": {"São Paulo": [{"id": "sp1", "title": "Feira", **EVENT}]},
+    }, 1_000_000)
+    return CityCatalog(str(path), check_interval=0)
+
+def test_normalize_city():
+    assert normalize_city(" São Paulo ") == "sao paulo"
+    assert normalize_city("New York, United States") == "new york"
+    assert normalize_city(None) == ""
+
+def test_city_events_come_before_the_defaults(catalog):
+    events = catalog.events_for("sao paulo, Brazil")
+    assert [e["id"] for e in events] == ["sp1", "d1"]
+    assert all(e["is_default"] and e["city"] == "sao paulo, Brazil" for e in events)
+    assert [e["id"] for e in catalog.events_for("Lima")] == ["d1"]
+    assert catalog.cities() == ["São Paulo"]
+
+def test_lists_are_built_once_per_city(catalog):
+    assert catalog.events_for("Lima") is catalog.events_for("Lima")
+    assert catalog.cache_info().hits == 1
+
+def test_reloads_swap_the_catalog_and_keep_it_on_errors(catalog, tmp_path):
+    path = tmp_path / "cities.json"
+    write(path, {"default": [{"id": "d2", "title": "Night market", **EVENT}]}, 2_000_000)
+    assert [e["id"] for e in catalog.events_for("Lima")] == ["d2"]
+
+    write(path, {"default": [{"id": "d3"}]}, 3_000_000)
+    assert [e["id"] for e in catalog.events_for("Lima")] == ["d2"]
+
+async def test_events_route_adds_the_city_defaults(client, onboard):
+    headers = await onboard(city="Tokyo", country="Japan", timezone="Asia/Tokyo")
+    await client.post("/api/events", headers=headers, json={"title": "Ramen", "event_type": "food", "location": "Ichiran", "city": "Tokyo"})
+    events = (await client.get("/api/events", headers=headers)).json()["events"]
+    assert events[0]["title"] == "Ramen"
+    assert all(e.get("is_default") and e["city"] == "Tokyo" for e in events[1:])
+    assert len(events) > 1
@@ -0,0 +1,47 @@
+from datetime import date
+
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+async def plan(client, headers, day="2024-05-01"):
+    response = await client.post("/api/plan-day", headers=headers, params={"date": day})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+async def add_task(client, headers, title, time):
+    await client.post("/api/tasks", headers=headers, json={"title": title, "date": "2024-05-01T08:00:00Z", "time": time})
+
+async def stored_plan(client, headers, storage):
+    user_id = (await client.get("/api/user/profile", headers=headers)).json()["user"]["id"]
+    return await storage.day_plans.get(server.day_plan_id(user_id, date(2024, 5, 1)))
+
+async def test_plans_are_reused_until_a_task_on_the_day_changes(client, onboard, storage):
+    headers = await onboard()
+    await add_task(client, headers, "Run", "08:00")
+
+    first = await plan(client, headers)
+    assert [entry["title"] for entry in (await stored_plan(client, headers, storage))["timeline"]] == ["Run"]
+    assert await plan(client, headers) == first
+
+    await add_task(client, headers, "Read", "10:00")
+    assert [entry["title"] for entry in (await plan(client, headers))["timeline"]] == ["Run", "Read"]
+
+async def test_a_plan_computed_across_a_write_is_not_kept(client, onboard, storage, monkeypatch):
+    headers = await onboard()
+    await add_task(client, headers, "Run", "08:00")
+
+    list_tasks = storage.tasks.list
+    async def list_then_write(*args, **kwargs):
+        tasks = await list_tasks(*args, **kwargs)
+        # Another request adds a task after this plan read the day's tasks
+        monkeypatch.setattr(storage.tasks, "list", list_tasks)
+        await add_task(client, headers, "Read", "10:00")
+        return tasks
+    monkeypatch.setattr(storage.tasks, "list", list_then_write)
+
+    assert (await plan(client, headers))["total_tasks"] == 1
+    assert await stored_plan(client, headers, storage) is None
+    assert (await plan(client, headers))["total_tasks"] == 2
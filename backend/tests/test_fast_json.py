@@ -0,0 +1,58 @@
+from datetime import datetime, timezone
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from pydantic import BaseModel
+
+from fast_json import FastJSONRoute, dumps
+
+pytestmark = pytest.mark.anyio
+
+class Item(BaseModel):
+    name: str
+    secret: str = "hidden"
+
+class Public(BaseModel):
+    name: str
+
+DOCUMENT = {
+    "date": datetime(2024, 5, 1, 9, 30, 0, 123000),
+    "aware": datetime(2024, 5, 1, 9, 30, tzinfo=timezone.utc),
+    "tags": None,
+    "item": Item(name="a"),
+    "nested": [{"count": 1}],
+}
+
+def build_app(route_class=None):
+    app = FastAPI()
+    if route_class:
+        app.router.route_class = route_class
+
+    @app.get("/document")
+    async def document():
+        return DOCUMENT
+
+    @app.get("/filtered", response_model=Public)
+    async def filtered():
+        return Item(name="a")
+    return app
+
+async def get(app, path):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        return await client.get(path)
+
+async def test_fast_responses_match_fastapis_encoding():
+    for path in ("/document", "/filtered"):
+        fast = await get(build_app(FastJSONRoute), path)
+        default = await get(build_app(), path)
+        assert fast.status_code == default.status_code == 200
+        assert fast.headers["content-type"] == default.headers["content-type"]
+        assert fast.json() == default.json(), path
+
+def test_dumps_keeps_datetime_forms():
+    assert dumps({"a": datetime(2024, 5, 1, 9, 30)}) == b'{"a":"2024-05-01T09:30:00"}'
+    assert dumps({"a": datetime(2024, 5, 1, 9, 30, tzinfo=timezone.utc)}) == b'{"a":"2024-05-01T09:30:00+00:00"}'
+    assert dumps({1: {"b"}}) == b'{"1":["b"]}'
+    with pytest.raises(TypeError):
+        dumps({"a": object()})
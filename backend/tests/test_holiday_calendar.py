@@ -0,0 +1,70 @@
+from datetime import date
+
+import pytest
+
+from holiday_calendar import HolidayRuleError, compile_rule, easter_sunday, equinox_day, nth_weekday
+from server import holiday_calendar
+
+pytestmark = pytest.mark.anyio
+
+def test_easter_sunday():
+    assert easter_sunday(2000) == date(2000, 4, 23)
+    assert easter_sunday(2024) == date(2024, 3, 31)
+    assert easter_sunday(2025) == date(2025, 4, 20)
+    assert easter_sunday(2038) == date(2038, 4, 25)
+
+def test_nth_weekday_counts_from_either_end_of_the_month():
+    assert nth_weekday(2024, 1, 0, 3) == date(2024, 1, 15)
+    assert nth_weekday(2024, 11, 3, 4) == date(2024, 11, 28)
+    assert nth_weekday(2024, 5, 0, -1) == date(2024, 5, 27)
+    assert nth_weekday(2024, 12, 1, -1) == date(2024, 12, 31)
+
+def test_equinox_is_only_computed_where_the_approximation_holds():
+    assert equinox_day(2024, "vernal") == date(2024, 3, 20)
+    assert equinox_day(2024, "autumnal") == date(2024, 9, 22)
+    assert equinox_day(1979, "vernal") is None
+    assert equinox_day(2100, "autumnal") is None
+
+def test_rules():
+    assert compile_rule({"easter": -2})(2024) == date(2024, 3, 29)
+    assert compile_rule({"on_or_before": [5, 24, "MO"]})(2024) == date(2024, 5, 20)
+    assert compile_rule({"date": "07-04"})(2030) == date(2030, 7, 4)
+    with pytest.raises(HolidayRuleError):
+        compile_rule({"nth": [5, "XX", 1]})
+    with pytest.raises(HolidayRuleError):
+        compile_rule({"name": "no rule"})
+
+def test_calendar_resolves_aliases_and_lists_a_range():
+    assert holiday_calendar.resolve_country("usa") == "US"
+    assert holiday_calendar.resolve_country("Atlantis") == holiday_calendar.default_country
+    names = [h["name"] for h in holiday_calendar.between("US", date(2024, 11, 1), date(2024, 11, 30))]
+    assert names == ["Veterans Day", "Thanksgiving Day"]
+
+async def test_holiday_route_validates_ranges(client, onboard):
+    headers = await onboard()
+    response = await client.get("/api/recommendations/holidays", headers=headers, params={"date": "2024-11-05"})
+    assert [h["date"] for h in response.json()["holidays"]] == ["2024-11-11", "2024-11-28"]
+
+    response = await client.get("/api/recommendations/holidays", headers=headers, params={
+        "start_date": "2024-12-24", "end_date": "2025-01-01"
+    })
+    assert [h["date"] for h in response.json()["holidays"]] == ["2024-12-24", "2024-12-25", "2024-12-31", "2025-01-01"]
+
+    for params in ({"start_date": "garbage", "end_date": "2024-01-01"}, {"start_date": "2024-01-01"}, {"end_date": "2024-01-01"}):
+        response = await client.get("/api/recommendations/holidays", headers=headers, params=params)
+        assert response.status_code == 400, params
+
+async def test_holiday_route_rejects_unsupported_years(client, onboard):
+    headers = await onboard()
+    for params in (
+        {"date": "9999-12-15"},
+        {"date": "0001-03-01", "country": "JP"},
+        {"start_date": "2199-12-01", "end_date": "2200-01-31"},
+    ):
+        response = await client.get("/api/recommendations/holidays", headers=headers, params=params)
+        assert response.status_code == 400, params
+
+    # Inside the supported years but outside the equinox approximation
+    response = await client.get("/api/recommendations/holidays", headers=headers, params={"date": "2150-03-01", "country": "JP"})
+    assert response.status_code == 200
+    assert "Vernal Equinox Day" not in [h["name"] for h in response.json()["holidays"]]
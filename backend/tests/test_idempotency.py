@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+TASK = {"title": "Write report", "date": "2024-05-01T09:00:00Z", "time": "09:00"}
+
+async def user_id(client, headers):
+    return (await client.get("/api/user/profile", headers=headers)).json()["user"]["id"]
+
+async def count_tasks(client, headers):
+    response = await client.get("/api/tasks", headers=headers, params={"date": "2024-05-01"})
+    return len(response.json()["tasks"])
+
+async def test_a_retried_create_replays_the_first_response(client, onboard):
+    headers = await onboard()
+    keyed = {**headers, "Idempotency-Key": "create-1"}
+
+    first = await client.post("/api/tasks", headers=keyed, json=TASK)
+    second = await client.post("/api/tasks", headers=keyed, json=TASK)
+    assert first.status_code == second.status_code == 200
+    assert second.json() == first.json()
+    assert await count_tasks(client, headers) == 1
+
+async def test_keys_are_scoped_to_route_and_user(client, onboard):
+    headers, other = await onboard(), await onboard()
+    await client.post("/api/tasks", headers={**headers, "Idempotency-Key": "k"}, json=TASK)
+    await client.post("/api/tasks:batch", headers={**headers, "Idempotency-Key": "k"}, json=[TASK])
+    await client.post("/api/tasks", headers={**other, "Idempotency-Key": "k"}, json=TASK)
+    assert await count_tasks(client, headers) == 2
+    assert await count_tasks(client, other) == 1
+
+async def test_reusing_a_key_with_another_body_is_rejected(client, onboard):
+    headers = {**await onboard(), "Idempotency-Key": "create-2"}
+    await client.post("/api/tasks", headers=headers, json=TASK)
+    response = await client.post("/api/tasks", headers=headers, json={**TASK, "title": "Something else"})
+    assert response.status_code == 422
+
+async def test_a_request_in_flight_holds_the_key(client, onboard, storage):
+    headers = await onboard()
+    key = f"{await user_id(client, headers)}:tasks:create-3"
+    response = await client.post("/api/tasks", headers={**headers, "Idempotency-Key": "create-3"}, json=TASK)
+    record = await storage.idempotency.get(key)
+
+    # Put the key back into a fresh pending claim, as if the first request were still running
+    await storage.idempotency.release(key)
+    await storage.idempotency.claim({
+        "key": key, "request_hash": record["request_hash"], "state": "pending", "created_at": datetime.utcnow()
+    })
+    response = await client.post("/api/tasks", headers={**headers, "Idempotency-Key": "create-3"}, json=TASK)
+    assert response.status_code == 409
+
+async def test_a_stale_claim_is_taken_over(client, onboard, storage):
+    headers = await onboard()
+    key = f"{await user_id(client, headers)}:tasks:create-4"
+    await client.post("/api/tasks", headers={**headers, "Idempotency-Key": "create-4"}, json=TASK)
+    record = await storage.idempotency.get(key)
+
+    # A claim older than the lease belongs to a request that died before finishing
+    await storage.idempotency.release(key)
+    await storage.idempotency.claim({
+        "key": key, "request_hash": record["request_hash"], "state": "pending",
+        "created_at": datetime.utcnow() - timedelta(seconds=server.IDEMPOTENCY_LEASE_SECONDS + 1)
+    })
+    response = await client.post("/api/tasks", headers={**headers, "Idempotency-Key": "create-4"}, json=TASK)
+    assert response.status_code == 200
+    assert (await storage.idempotency.get(key))["state"] == "done"
+
+async def test_a_failed_request_releases_its_key(client, onboard, storage, monkeypatch):
+    headers = {**await onboard(), "Idempotency-Key": "create-5"}
+
+    async def failing_insert(task):
+        raise RuntimeError("storage is down")
+    with monkeypatch.context() as patch:
+        patch.setattr(storage.tasks, "insert", failing_insert)
+        with pytest.raises(RuntimeError):
+            await client.post("/api/tasks", headers=headers, json=TASK)
+
+    response = await client.post("/api/tasks", headers=headers, json=TASK)
+    assert response.status_code == 200
@@ -0,0 +1,53 @@
+import pytest
+
+from metrics import CONTENT_TYPE, Registry
+
+pytestmark = pytest.mark.anyio
+
+def sample(text: str, name: str) -> float:
+    for line in text.splitlines():
+        if line.startswith(name + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    latency = registry.histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        latency.observe(value, "/a")
+    text = registry.render()
+    assert "# TYPE latency_seconds histogram" in text
+    assert sample(text, 'latency_seconds_bucket{route="/a",le="0.1"}') == 1
+    assert sample(text, 'latency_seconds_bucket{route="/a",le="1.0"}') == 3
+    assert sample(text, 'latency_seconds_bucket{route="/a",le="+Inf"}') == 4
+    assert sample(text, 'latency_seconds_count{route="/a"}') == 4
+    assert sample(text, 'latency_seconds_sum{route="/a"}') == pytest.approx(6.05)
+
+def test_label_values_are_escaped():
+    registry = Registry()
+    registry.counter("events_total", "Events", ("name",)).inc('say "hi"\n')
+    assert 'events_total{name="say \\"hi\\"\\n"} 1' in registry.render()
+
+async def test_requests_are_counted_by_route_template(client, onboard):
+    headers = await onboard()
+    before = (await client.get("/api/metrics")).text
+    body = {"title": "Metered", "date": "2024-01-01T09:00:00"}
+    task = await client.post("/api/tasks", headers=headers, json=body)
+    task_id = task.json()["task"]["id"]
+    assert (await client.put(f"/api/tasks/{task_id}", headers=headers, json=body)).status_code == 200
+    await client.get("/api/no-such-route")
+
+    response = await client.get("/api/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith(CONTENT_TYPE.split(";")[0])
+    after = response.text
+
+    def delta(name):
+        return sample(after, name) - sample(before, name)
+
+    # Parameterised paths share their template's label rather than one per id
+    assert delta('cc_http_requests_total{method="PUT",route="/api/tasks/{task_id}",status="200"}') == 1
+    assert delta('cc_http_request_duration_seconds_count{method="PUT",route="/api/tasks/{task_id}"}') == 1
+    assert delta('cc_http_requests_total{method="GET",route="unmatched",status="404"}') == 1
+    assert task_id not in after
+    assert 'cc_cache_entries{cache="user"}' in after
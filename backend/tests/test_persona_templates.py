@@ -0,0 +1,60 @@
+import json
+import os
+
+import pytest
+
+from persona_templates import (
+    FALLBACK_MESSAGE, PERSONAS, PersonaTemplates, TemplateError, compile_templates, format_clock_label
+)
+
+pytestmark = pytest.mark.anyio
+
+def templates(text):
+    return {"reminder_task": {persona: text for persona in PERSONAS}}
+
+def write(path, raw, mtime):
+    path.write_text(json.dumps(raw), encoding="utf-8")
+    os.utime(path, (mtime, mtime))
+
+def test_templates_fill_variables_and_defaults():
+    render = compile_templates(templates("{name}: {title} at {time}"))["reminder_task"]["wildCard"]
+    assert render({"name": "Ana", "title": "Swim", "time": "3 PM"}) == "Ana: Swim at 3 PM"
+    assert render({"title": None}) == "friend: this task at the scheduled time"
+
+def test_invalid_templates_are_rejected():
+    for raw in (
+        templates("{unknown}"),
+        templates("{title!r}"),
+        templates("{title"),
+        {"reminder_task": {"casualBuddy": "hi"}},
+        [],
+    ):
+        with pytest.raises(TemplateError):
+            compile_templates(raw)
+
+def test_clock_labels():
+    assert format_clock_label("15:30") == "3:30 PM"
+    assert format_clock_label("09:00") == "9 AM"
+    assert format_clock_label("00:05") == "12:05 AM"
+    assert format_clock_label("25:99") == "the scheduled time"
+    assert format_clock_label(None) == "the scheduled time"
+
+def test_changed_files_are_reloaded_and_bad_ones_ignored(tmp_path):
+    path = tmp_path / "templates.json"
+    write(path, templates("Do {title}"), 1_000_000)
+    persona_templates = PersonaTemplates(str(path), check_interval=0)
+    assert persona_templates.render("reminder_task", "goodParent", title="homework") == "Do homework"
+    assert persona_templates.render("missing", "goodParent") == FALLBACK_MESSAGE
+
+    write(path, templates("Please do {title}"), 2_000_000)
+    assert persona_templates.render("reminder_task", "goodParent", title="homework") == "Please do homework"
+
+    write(path, templates("{oops}"), 3_000_000)
+    assert persona_templates.render("reminder_task", "goodParent", title="homework") == "Please do homework"
+
+async def test_persona_message_route_uses_the_users_persona(client, onboard):
+    headers = await onboard()
+    await client.put("/api/user/persona", headers=headers, params={"persona": "strictProfessional"})
+    response = await client.get("/api/persona-message/morning_plan", headers=headers)
+    assert response.json()["persona"] == "strictProfessional"
+    assert response.json()["message"]
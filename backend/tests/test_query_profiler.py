@@ -0,0 +1,82 @@
+from types import SimpleNamespace
+
+import pytest
+
+import server
+from query_profiler import QueryProfiler, command_shape
+
+pytestmark = pytest.mark.anyio
+
+class Commands:
+    """Feeds started/succeeded events for fake commands to a profiler."""
+
+    def __init__(self, profiler):
+        self.profiler = profiler
+        self.request_id = 0
+
+    def run(self, name: str, command: dict, reply: dict, duration_ms: float = 1):
+        self.request_id += 1
+        event = SimpleNamespace(
+            command_name=name, command=command, reply=reply, database_name="test",
+            connection_id=("localhost", 27017), request_id=self.request_id,
+            duration_micros=int(duration_ms * 1000),
+        )
+        self.profiler.started(event)
+        self.profiler.succeeded(event)
+
+def find(user_id: str) -> dict:
+    return {"find": "tasks", "filter": {"user_id": user_id, "date": {"$gte": "2024-01-01"}}}
+
+def test_values_are_replaced_in_shapes():
+    assert command_shape("find", find("u1")) == command_shape("find", find("u2")) == {
+        "filter": {"user_id": "?", "date": {"$gte": "?"}}
+    }
+
+def test_shapes_aggregate_and_sort():
+    profiler = QueryProfiler(slow_ms=1000)
+    commands = Commands(profiler)
+    commands.run("find", find("u1"), {"cursor": {"id": 0, "firstBatch": [{}, {}]}}, duration_ms=5)
+    commands.run("find", find("u2"), {"cursor": {"id": 0, "firstBatch": [{}]}}, duration_ms=15)
+    commands.run("count", {"count": "users", "query": {"name": "a"}}, {"n": 1}, duration_ms=30)
+
+    slowest, tasks = profiler.top(sort="max_ms")
+    assert (slowest["collection"], slowest["command"]) == ("users", "count")
+    assert (tasks["count"], tasks["documents"], tasks["total_ms"], tasks["mean_ms"]) == (2, 3, 20, 10)
+    assert profiler.top(sort="total_ms", limit=1)[0]["collection"] == "users"
+
+def test_get_more_counts_against_the_opening_query():
+    profiler = QueryProfiler(slow_ms=1000)
+    commands = Commands(profiler)
+    commands.run("find", find("u1"), {"cursor": {"id": 7, "firstBatch": [{}]}}, duration_ms=2)
+    commands.run("getMore", {"getMore": 7, "collection": "tasks"}, {"cursor": {"id": 0, "nextBatch": [{}, {}]}}, duration_ms=3)
+
+    [stats] = profiler.top()
+    assert (stats["count"], stats["documents"], stats["total_ms"]) == (1, 3, 5)
+
+def test_get_more_after_a_reset_does_not_create_a_shape():
+    profiler = QueryProfiler(slow_ms=1000)
+    commands = Commands(profiler)
+    commands.run("find", find("u1"), {"cursor": {"id": 7, "firstBatch": [{}]}})
+    # Reset while the cursor is open, then exhaust it
+    profiler.reset()
+    commands.run("getMore", {"getMore": 7, "collection": "tasks"}, {"cursor": {"id": 0, "nextBatch": [{}]}})
+    assert profiler.top() == []
+
+    commands.run("find", find("u1"), {"cursor": {"id": 8, "firstBatch": [{}]}})
+    # The open cursor's shape is evicted before its next batch arrives
+    profiler.max_shapes = 1
+    commands.run("count", {"count": "users", "query": {}}, {"n": 0}, duration_ms=5)
+    commands.run("getMore", {"getMore": 8, "collection": "tasks"}, {"cursor": {"id": 0, "nextBatch": [{}]}})
+    assert [stats["collection"] for stats in profiler.top()] == ["users"]
+
+async def test_slow_query_routes_require_the_admin_token(client, monkeypatch):
+    monkeypatch.setattr(server, "ADMIN_TOKEN", "secret")
+    assert (await client.get("/api/admin/slow-queries")).status_code == 403
+    assert (await client.get("/api/admin/slow-queries", headers={"X-Admin-Token": "wrong"})).status_code == 403
+
+    admin = {"X-Admin-Token": "secret"}
+    response = await client.get("/api/admin/slow-queries", headers=admin)
+    assert response.status_code == 200
+    assert "queries" in response.json()
+    assert (await client.get("/api/admin/slow-queries?sort=count", headers=admin)).status_code == 400
+    assert (await client.delete("/api/admin/slow-queries", headers=admin)).status_code == 200
@@ -0,0 +1,87 @@
+from datetime import datetime
+
+import pytest
+
+from recurrence import expand_tasks, split_occurrence_id
+
+pytestmark = pytest.mark.anyio
+
+def series(**fields):
+    return {"id": "s", "title": "Standup", "repeat": "daily", "date": datetime(2024, 3, 1, 14), "time": "09:00", **fields}
+
+def test_overrides_and_exceptions_apply_to_their_occurrence():
+    task = series(exceptions=["2024-03-03"], overrides={"2024-03-04": {"title": "Moved", "date": datetime(2024, 3, 4, 16)}})
+    occurrences = expand_tasks([task], datetime(2024, 3, 2), datetime(2024, 3, 5))
+
+    assert [o["id"] for o in occurrences] == ["s@2024-03-02", "s@2024-03-04"]
+    assert occurrences[1]["title"] == "Moved"
+    assert occurrences[1]["date"] == datetime(2024, 3, 4, 16)
+    assert occurrences[1]["series_id"] == "s"
+    assert "overrides" not in occurrences[0] and "exceptions" not in occurrences[0]
+
+def test_override_moving_an_occurrence_out_of_the_window_drops_it():
+    task = series(overrides={"2024-03-02": {"date": datetime(2024, 3, 9, 14)}})
+    occurrences = expand_tasks([task], datetime(2024, 3, 2), datetime(2024, 3, 3))
+    assert occurrences == []
+
+def test_override_moving_an_occurrence_into_the_window_shows_it():
+    task = series(overrides={"2024-03-02": {"title": "Moved", "date": datetime(2024, 3, 9, 16)}})
+    occurrences = expand_tasks([task], datetime(2024, 3, 9), datetime(2024, 3, 10))
+    assert [(o["id"], o["title"]) for o in occurrences] == [("s@2024-03-09", "Standup"), ("s@2024-03-02", "Moved")]
+
+    # Keys that are not occurrences of the rule, or were deleted, stay hidden
+    task = series(repeat="weekly", exceptions=["2024-03-08"], overrides={
+        "2024-03-02": {"date": datetime(2024, 3, 9, 16)},
+        "2024-03-08": {"date": datetime(2024, 3, 9, 17)},
+    })
+    assert expand_tasks([task], datetime(2024, 3, 9), datetime(2024, 3, 10)) == []
+
+def test_split_occurrence_id():
+    assert split_occurrence_id("abc@2024-03-05") == ("abc", "2024-03-05")
+    assert split_occurrence_id("abc") == ("abc", None)
+    assert split_occurrence_id("a@b") == ("a@b", None)
+
+async def test_editing_and_deleting_single_occurrences(client, onboard):
+    headers = await onboard()
+    response = await client.post("/api/tasks", headers=headers, json={
+        "title": "Walk", "date": "2024-05-01T08:00:00Z", "time": "08:00", "repeat": "daily"
+    })
+    series_id = response.json()["task"]["id"]
+
+    response = await client.put(f"/api/tasks/{series_id}@2024-05-02", headers=headers, json={
+        "title": "Long walk", "date": "2024-05-02T08:00:00Z", "time": "08:00"
+    })
+    assert response.status_code == 200
+    response = await client.delete(f"/api/tasks/{series_id}@2024-05-03", headers=headers)
+    assert response.status_code == 200
+
+    response = await client.get("/api/tasks", headers=headers, params={
+        "start_date": "2024-05-01T00:00:00Z", "end_date": "2024-05-04T23:59:59Z"
+    })
+    tasks = response.json()["tasks"]
+    assert [(t["id"], t["title"]) for t in tasks] == [
+        (f"{series_id}@2024-05-01", "Walk"),
+        (f"{series_id}@2024-05-02", "Long walk"),
+        (f"{series_id}@2024-05-04", "Walk"),
+    ]
+
+async def test_an_occurrence_moved_to_another_week_shows_on_its_new_day(client, onboard):
+    headers = await onboard()
+    response = await client.post("/api/tasks", headers=headers, json={
+        "title": "Walk", "date": "2024-05-01T08:00:00Z", "time": "08:00", "repeat": "daily"
+    })
+    series_id = response.json()["task"]["id"]
+    await client.put(f"/api/tasks/{series_id}@2024-05-03", headers=headers, json={
+        "title": "Moved walk", "date": "2024-05-10T18:00:00Z", "time": "18:00"
+    })
+
+    async def titles(day):
+        response = await client.get("/api/tasks", headers=headers, params={"date": day})
+        return [t["title"] for t in response.json()["tasks"]]
+    assert await titles("2024-05-03") == []
+    assert await titles("2024-05-10") == ["Walk", "Moved walk"]
+
+    response = await client.get("/api/calendar/summary", headers=headers, params={"start": "2024-05-10", "end": "2024-05-10"})
+    assert response.json()["days"][0]["total"] == 2
+    response = await client.post("/api/plan-day", headers=headers, params={"date": "2024-05-10T00:00:00Z"})
+    assert response.json()["total_tasks"] == 2
@@ -0,0 +1,81 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+import server
+from reminders import ReminderScheduler
+
+pytestmark = pytest.mark.anyio
+
+class FlakySink:
+    """Fails the first ``failures`` emits, then records notifications."""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.sent = []
+
+    async def emit(self, notification):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("push service unavailable")
+        self.sent.append(notification)
+
+@pytest.fixture
+def scheduler(storage, monkeypatch):
+    """The app's scheduler with a loaded window, as if it had started."""
+    scheduler = ReminderScheduler(storage.tasks, server.render_reminder, FlakySink())
+    scheduler.loaded_until = datetime.utcnow() + timedelta(minutes=15)
+    monkeypatch.setattr(server, "reminder_scheduler", scheduler)
+    return scheduler
+
+def soon(minutes=5):
+    return (datetime.utcnow() + timedelta(minutes=minutes)).isoformat() + "Z"
+
+async def test_task_writes_keep_reminders_current(client, onboard, scheduler):
+    headers = await onboard()
+    task = (await client.post("/api/tasks", headers=headers, json={
+        "title": "Call mom", "date": soon(), "reminder": soon()
+    })).json()["task"]
+    assert len(scheduler) == 1
+
+    async def complete(done):
+        response = await client.post("/api/tasks:bulk", headers=headers, json=[{"op": "complete", "id": task["id"], "completed": done}])
+        assert response.json()["results"][0]["status"] == 200
+    await complete(True)
+    assert len(scheduler) == 0
+
+    # Editing a completed task does not bring its reminder back; reopening it does
+    response = await client.put(f"/api/tasks/{task['id']}", headers=headers, json={
+        "title": "Call mom", "date": soon(), "reminder": soon(6)
+    })
+    assert response.status_code == 200
+    assert len(scheduler) == 0
+    await complete(False)
+    assert len(scheduler) == 1
+
+    await client.delete(f"/api/tasks/{task['id']}", headers=headers)
+    assert len(scheduler) == 0
+
+async def test_a_failed_notification_is_retried(client, onboard, storage):
+    headers = await onboard()
+    now = datetime.utcnow()
+    task = (await client.post("/api/tasks", headers=headers, json={
+        "title": "Stretch", "date": soon(), "reminder": now.isoformat() + "Z"
+    })).json()["task"]
+
+    sink = FlakySink(failures=1)
+    scheduler = ReminderScheduler(storage.tasks, server.render_reminder, sink, retry_delay=timedelta(milliseconds=50))
+    await scheduler.start()
+    try:
+        for _ in range(100):
+            if sink.sent:
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        await scheduler.stop()
+
+    assert [n["task_id"] for n in sink.sent] == [task["id"]]
+    assert scheduler.sent == 1
+    stored = await storage.tasks.get_many(task["user_id"], [task["id"]])
+    assert stored[task["id"]]["reminder_sent"]
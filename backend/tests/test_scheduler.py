@@ -0,0 +1,83 @@
+from datetime import date, datetime
+from zoneinfo import ZoneInfo
+
+from scheduler import FreeSlots, parse_clock, parse_duration, plan_day, plan_range
+
+DAY = date(2024, 5, 1)
+
+def task(title, **fields):
+    return {"id": title, "title": title, "date": datetime(2024, 5, 1, 12), **fields}
+
+def by_title(timeline):
+    return {entry["title"]: entry for entry in timeline}
+
+def test_parse_clock_and_duration():
+    assert parse_clock("09:30") == 570
+    assert parse_clock("25:99") is None
+    assert parse_clock("noon") is None
+    assert parse_duration("1h30") == 90
+    assert parse_duration("45m") == 45
+    assert parse_duration("1:15") == 75
+    assert parse_duration("soon") == 30
+
+def test_free_slots_split_around_reservations():
+    slots = FreeSlots(0, 100)
+    slots.reserve(20, 30)
+    slots.reserve(50, 60)
+    assert list(zip(slots.starts, slots.ends)) == [(0, 20), (30, 50), (60, 100)]
+    assert slots.first_fit(15, 0, 100) == 0
+    assert slots.first_fit(25, 0, 100) == 60
+    assert slots.first_fit(25, 0, 80) is None
+
+def test_flexible_tasks_fill_the_gaps_around_anchored_ones():
+    timeline, unscheduled = plan_day([
+        task("meeting", time="09:00", timer_duration="60"),
+        task("lunch", time="12:00", timer_duration="60"),
+        task("write", timer_duration="90", task_type="work"),
+    ], DAY)
+
+    entries = by_title(timeline)
+    assert (entries["meeting"]["start"], entries["meeting"]["end"]) == ("09:00", "10:00")
+    # Work prefers 09:00-17:00: the first free 90 minutes there start at 10:00
+    assert (entries["write"]["start"], entries["write"]["end"]) == ("10:00", "11:30")
+    assert not entries["write"]["fixed"]
+    assert unscheduled == []
+    assert [entry["title"] for entry in timeline] == ["meeting", "write", "lunch"]
+
+def test_overlapping_anchored_tasks_are_flagged():
+    timeline, _ = plan_day([
+        task("a", time="10:00", timer_duration="60"),
+        task("b", time="10:30", timer_duration="30"),
+        task("c", time="11:00", timer_duration="30"),
+    ], DAY)
+    entries = by_title(timeline)
+    assert entries["a"]["conflict"] and entries["b"]["conflict"]
+    assert not entries["c"]["conflict"]
+
+def test_deadlines_order_flexible_tasks_and_mark_late_ones():
+    timeline, _ = plan_day([
+        task("later", priority="high", timer_duration="60"),
+        task("due", priority="low", timer_duration="60", deadline=datetime(2024, 5, 1, 8)),
+        task("anchored", time="12:00", timer_duration="60", deadline=datetime(2024, 5, 1, 12, 30)),
+    ], DAY)
+    entries = by_title(timeline)
+    # The earliest deadline goes first, before a higher priority without one
+    assert entries["due"]["start"] == "07:00" and not entries["due"]["late"]
+    assert entries["later"]["start"] == "08:00"
+    assert entries["anchored"]["late"]
+
+def test_deadline_is_read_in_the_users_zone():
+    # 16:00Z is 12:00 in New York, so a 60-minute task from 11:30 local is late
+    timeline, _ = plan_day([
+        task("call", time="11:30", timer_duration="60", deadline=datetime(2024, 5, 1, 16)),
+    ], DAY, zone=ZoneInfo("America/New_York"))
+    assert timeline[0]["late"]
+
+def test_tasks_that_do_not_fit_are_unscheduled_and_carried_over():
+    full_day = [task(f"block{i}", time=f"{hour:02d}:00", timer_duration="60") for i, hour in enumerate(range(7, 22))]
+    timeline, unscheduled = plan_day(full_day + [task("extra", timer_duration="30")], DAY)
+    assert [t["title"] for t in unscheduled] == ["extra"]
+
+    plans = plan_range(full_day + [task("extra", timer_duration="30")], DAY, days=2)
+    assert plans["2024-05-02"]["timeline"][0]["title"] == "extra"
+    assert plans["2024-05-02"]["unscheduled"] == []
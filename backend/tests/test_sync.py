@@ -0,0 +1,92 @@
+import base64
+from datetime import datetime, timedelta
+
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+async def create_tasks(client, headers, count):
+    ids = []
+    for i in range(count):
+        response = await client.post("/api/tasks", headers=headers, json={"title": f"t{i}", "date": "2024-05-01T09:00:00Z"})
+        ids.append(response.json()["task"]["id"])
+    return ids
+
+def token_at(moment):
+    return server.encode_sync_token(*[(moment, None)] * server.SYNC_STREAMS)
+
+async def drain(client, headers, token):
+    """Follow next_token until has_more is false; return (tasks seen, task ids deleted, pages)."""
+    seen, deleted, pages = {}, set(), 0
+    while True:
+        body = (await client.get("/api/sync", headers=headers, params={"since": token})).json()
+        assert not body["reset"]
+        assert len(body["tasks"]) <= server.SYNC_PAGE_SIZE
+        seen.update((t["id"], t) for t in body["tasks"])
+        deleted.update(body["deleted"]["tasks"])
+        token = body["next_token"]
+        pages += 1
+        if not body["has_more"]:
+            return seen, deleted, pages
+        assert pages < 20
+
+async def test_first_sync_is_a_full_snapshot(client, onboard):
+    headers = await onboard()
+    ids = await create_tasks(client, headers, 3)
+
+    body = (await client.get("/api/sync", headers=headers)).json()
+    assert body["reset"] and not body["has_more"]
+    assert sorted(t["id"] for t in body["tasks"]) == sorted(ids)
+    assert body["next_token"]
+
+async def test_delta_pages_cover_every_change_and_deletion(client, onboard, monkeypatch):
+    monkeypatch.setattr(server, "SYNC_PAGE_SIZE", 2)
+    headers = await onboard()
+    token = token_at(datetime.utcnow() - timedelta(minutes=1))
+    ids = await create_tasks(client, headers, 5)
+    await client.delete(f"/api/tasks/{ids[0]}", headers=headers)
+
+    seen, deleted, pages = await drain(client, headers, token)
+    assert pages > 1
+    assert set(seen) == set(ids[1:])
+    assert deleted == {ids[0]}
+
+async def test_pages_split_changes_sharing_a_millisecond(client, onboard, monkeypatch):
+    headers = await onboard()
+    ids = await create_tasks(client, headers, 5)
+    token = token_at(datetime.utcnow() - timedelta(minutes=1))
+    # One bulk request stamps every task with the same updated_at
+    response = await client.post("/api/tasks:bulk", headers=headers, json=[
+        {"op": "complete", "id": task_id, "completed": True} for task_id in ids
+    ])
+    assert response.status_code == 200, response.text
+
+    monkeypatch.setattr(server, "SYNC_PAGE_SIZE", 2)
+    seen, _, pages = await drain(client, headers, token)
+    assert pages >= 3
+    assert set(seen) == set(ids)
+    assert all(task["completed"] for task in seen.values())
+
+async def test_v1_tokens_are_still_accepted(client, onboard):
+    headers = await onboard()
+    since = datetime.utcnow() - timedelta(minutes=1)
+    millis = (since - server.SYNC_EPOCH) // timedelta(milliseconds=1)
+    token = base64.urlsafe_b64encode(f"v1:{millis}".encode()).decode()
+    ids = await create_tasks(client, headers, 2)
+
+    seen, _, _ = await drain(client, headers, token)
+    assert set(seen) == set(ids)
+
+async def test_malformed_tokens_are_rejected(client, onboard):
+    headers = await onboard()
+    for token in ("not-a-token", base64.urlsafe_b64encode(b"v2:1/,2/").decode()):
+        response = await client.get("/api/sync", headers=headers, params={"since": token})
+        assert response.status_code == 400
+
+async def test_stale_tokens_force_a_reset(client, onboard):
+    headers = await onboard()
+    token = token_at(datetime.utcnow() - timedelta(days=server.SYNC_TOMBSTONE_DAYS + 1))
+    body = (await client.get("/api/sync", headers=headers, params={"since": token})).json()
+    assert body["reset"]
@@ -0,0 +1,66 @@
+from datetime import date, datetime
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from recurrence import expand_tasks
+from time_zones import UTC, day_window, local_date, zone_name
+
+pytestmark = pytest.mark.anyio
+
+NEW_YORK = ZoneInfo("America/New_York")
+
+def series(**fields):
+    return {"id": "s", "title": "Standup", "repeat": "daily", "date": datetime(2024, 3, 1, 14), "time": "09:00", **fields}
+
+def test_zone_name_reads_labels_and_bare_names():
+    assert zone_name("Tokyo, Japan (Asia/Tokyo)") == "Asia/Tokyo"
+    assert zone_name("Europe/Paris") == "Europe/Paris"
+    assert zone_name("Somewhere (Not/AZone)") is None
+    assert zone_name("") is None
+
+def test_day_windows_follow_local_midnight():
+    tokyo = ZoneInfo("Asia/Tokyo")
+    assert day_window(date(2024, 5, 2), tokyo) == (datetime(2024, 5, 1, 15), datetime(2024, 5, 2, 15))
+    assert day_window(date(2024, 5, 2), UTC) == (datetime(2024, 5, 2), datetime(2024, 5, 3))
+    assert local_date(datetime(2024, 5, 1, 20), tokyo) == date(2024, 5, 2)
+
+def test_day_windows_are_23_or_25_hours_on_dst_changes():
+    start, end = day_window(date(2024, 3, 10), NEW_YORK)
+    assert (end - start).total_seconds() == 23 * 3600
+    start, end = day_window(date(2024, 11, 3), NEW_YORK)
+    assert (end - start).total_seconds() == 25 * 3600
+
+def test_series_keeps_its_wall_clock_time_across_dst():
+    # 09:00 EST is 14:00Z; after the March change 09:00 EDT is 13:00Z
+    occurrences = expand_tasks([series()], datetime(2024, 3, 9), datetime(2024, 3, 12), NEW_YORK)
+    assert [o["date"] for o in occurrences] == [datetime(2024, 3, 9, 14), datetime(2024, 3, 10, 13), datetime(2024, 3, 11, 13)]
+
+def test_occurrence_keys_are_local_dates():
+    # 08:00 in Tokyo is 23:00Z the day before
+    task = series(date=datetime(2024, 3, 1, 23))
+    occurrences = expand_tasks([task], datetime(2024, 3, 4, 15), datetime(2024, 3, 5, 15), ZoneInfo("Asia/Tokyo"))
+    assert [o["occurrence_date"] for o in occurrences] == ["2024-03-05"]
+    assert occurrences[0]["date"] == datetime(2024, 3, 4, 23)
+
+async def test_tasks_land_on_the_users_local_day(client, onboard):
+    headers = await onboard(timezone="Tokyo, Japan (Asia/Tokyo)", city="Tokyo", country="Japan")
+    # 20:00 UTC on May 1st is 05:00 on May 2nd in Tokyo
+    await client.post("/api/tasks", headers=headers, json={"title": "Early run", "date": "2024-05-01T20:00:00Z"})
+
+    async def titles(day):
+        response = await client.get("/api/tasks", headers=headers, params={"date": day})
+        return [t["title"] for t in response.json()["tasks"]]
+    assert await titles("2024-05-01") == []
+    assert await titles("2024-05-02") == ["Early run"]
+
+    response = await client.get("/api/calendar/summary", headers=headers, params={"start": "2024-05-01", "end": "2024-05-02"})
+    assert [(d["date"], d["total"]) for d in response.json()["days"]] == [("2024-05-02", 1)]
+
+async def test_recurring_tasks_are_counted_on_local_days(client, onboard):
+    headers = await onboard(timezone="Tokyo, Japan (Asia/Tokyo)", city="Tokyo", country="Japan")
+    await client.post("/api/tasks", headers=headers, json={
+        "title": "Stretch", "date": "2024-05-01T20:00:00Z", "repeat": "daily"
+    })
+    response = await client.get("/api/calendar/summary", headers=headers, params={"start": "2024-05-01", "end": "2024-05-03"})
+    assert [(d["date"], d["total"]) for d in response.json()["days"]] == [("2024-05-02", 1), ("2024-05-03", 1)]
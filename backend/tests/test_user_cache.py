@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+from server import UserCache
+
+pytestmark = pytest.mark.anyio
+
+class Loader:
+    """Returns ``value`` for every user once ``release`` is set, counting the calls."""
+
+    def __init__(self, value):
+        self.value = value
+        self.calls = 0
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def __call__(self, user_id):
+        self.calls += 1
+        await self.release.wait()
+        return self.value
+
+async def test_hits_misses_expiry_and_eviction():
+    cache = UserCache(max_size=2, ttl=30)
+    loader = Loader({"id": "u"})
+    assert await cache.load("a", loader) == {"id": "u"}
+    assert await cache.load("a", loader) == {"id": "u"}
+    assert loader.calls == 1
+
+    await cache.load("b", loader)
+    await cache.load("c", loader)
+    assert cache.get("a") is None
+    assert cache.stats()["evictions"] == 1
+
+    expired = UserCache(max_size=2, ttl=0)
+    await expired.load("a", loader)
+    assert expired.get("a") is None
+
+async def test_concurrent_misses_share_one_lookup():
+    cache = UserCache(max_size=10, ttl=30)
+    loader = Loader({"id": "u"})
+    loader.release.clear()
+    waiters = [asyncio.create_task(cache.load("u", loader)) for _ in range(5)]
+    await asyncio.sleep(0)
+    loader.release.set()
+    assert [await waiter for waiter in waiters] == [{"id": "u"}] * 5
+    assert loader.calls == 1
+
+async def test_cancelling_the_first_caller_does_not_strand_the_others():
+    cache = UserCache(max_size=10, ttl=30)
+    loader = Loader({"id": "u"})
+    loader.release.clear()
+    first = asyncio.create_task(cache.load("u", loader))
+    await asyncio.sleep(0)
+    second = asyncio.create_task(cache.load("u", loader))
+    await asyncio.sleep(0)
+    first.cancel()
+    loader.release.set()
+    assert await asyncio.wait_for(second, 1) == {"id": "u"}
+
+async def test_a_lookup_overtaken_by_an_invalidation_is_not_cached():
+    cache = UserCache(max_size=10, ttl=30)
+    loader = Loader({"id": "u", "city": "Old"})
+    loader.release.clear()
+    stale = asyncio.create_task(cache.load("u", loader))
+    await asyncio.sleep(0)
+
+    # The profile changes while the lookup is still reading the old document
+    cache.invalidate("u")
+    fresh = Loader({"id": "u", "city": "New"})
+    assert (await asyncio.wait_for(cache.load("u", fresh), 1))["city"] == "New"
+    loader.release.set()
+    assert (await stale)["city"] == "Old"
+    assert cache.get("u")["city"] == "New"
+
+async def test_profile_updates_are_visible_at_once(client, onboard):
+    headers = await onboard()
+    await client.get("/api/user/profile", headers=headers)
+    await client.put("/api/user/persona", headers=headers, params={"persona": "wildCard"})
+    response = await client.get("/api/user/profile", headers=headers)
+    assert response.json()["user"]["selected_persona"] == "wildCard"
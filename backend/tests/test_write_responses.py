@@ -0,0 +1,28 @@
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+async def test_onboarding_returns_the_user_as_stored(client):
+    response = await client.post("/api/onboarding", json={
+        "name": "stored", "timezone": "Paris, France (Europe/Paris)", "city": "Paris", "country": "France",
+        "personality_type": "balanced", "selected_persona": "casualBuddy",
+    })
+    body = response.json()
+    headers = {"Authorization": f"Bearer {body['token']}"}
+    profile = await client.get("/api/user/profile", headers=headers)
+    assert body["user"] == profile.json()["user"]
+    assert body["user"]["iana_timezone"] == "Europe/Paris"
+
+async def test_created_tasks_and_events_match_later_reads(client, onboard):
+    headers = await onboard()
+    task = (await client.post("/api/tasks", headers=headers, json={
+        "title": "Dentist", "date": "2024-05-01T09:30:00.123456Z", "deadline": "2024-05-01T10:00:00.987654Z"
+    })).json()["task"]
+    tasks = (await client.get("/api/tasks", headers=headers, params={"date": "2024-05-01"})).json()["tasks"]
+    assert tasks == [task]
+
+    event = (await client.post("/api/events", headers=headers, json={
+        "title": "Jazz night", "event_type": "music", "location": "Blue Note", "city": "New York"
+    })).json()["event"]
+    events = (await client.get("/api/events", headers=headers, params={"city": "New York"})).json()["events"]
+    assert event in events
@@ -0,0 +1,54 @@
+"""Per-user time zones and local day boundaries.
+
+Users carry a display label such as "New York, United States (America/New_York)"
+in ``timezone``; the IANA name is parsed out once when the profile is written
+and stored as ``iana_timezone``. Day and range queries turn a calendar date in
+that zone into a [start, end) window of naive UTC datetimes, the form task
+dates are stored in. Users without a recognizable zone get UTC days.
+"""
+import re
+from datetime import date, datetime, time, timedelta, timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from recurrence import to_utc_naive
+
+UTC = ZoneInfo("UTC")
+
+# The zone at the end of a display label: "City, Country (Area/City)"
+LABEL_ZONE = re.compile(r"\(([^()]+)\)\s*$")
+
+@lru_cache(maxsize=1024)
+def zone_name(value):
+    """The IANA name in a display label or bare zone name, or None if there is none."""
+    if not value:
+        return None
+    match = LABEL_ZONE.search(value)
+    candidate = (match.group(1) if match else value).strip()
+    try:
+        return ZoneInfo(candidate).key
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+
+@lru_cache(maxsize=512)
+def resolve_zone(name) -> ZoneInfo:
+    return ZoneInfo(name) if name else UTC
+
+def user_zone(user: dict) -> ZoneInfo:
+    """The user's zone; profiles written before ``iana_timezone`` existed fall back to their label."""
+    return resolve_zone(user.get("iana_timezone") or zone_name(user.get("timezone")))
+
+def day_window(day: date, zone: ZoneInfo):
+    """[start, end) of the local ``day`` as naive UTC; 23 or 25 hours long on DST changes."""
+    start = datetime.combine(day, time(), zone)
+    end = datetime.combine(day + timedelta(days=1), time(), zone)
+    return to_utc_naive(start), to_utc_naive(end)
+
+def local_date(value: datetime, zone: ZoneInfo) -> date:
+    """The local calendar date of ``value``; naive datetimes are UTC."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(zone).date()
+
+def local_today(zone: ZoneInfo) -> date:
+    return datetime.now(zone).date()
@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+"""
+API load test: seeds users, tasks and events, then drives concurrent traffic
+across the routes with a weighted mix and reports RPS and p50/p95/p99 per
+endpoint.
+
+By default the app runs in-process (httpx ASGI transport) against the Mongo at
+MONGO_URL, using a throwaway database that is dropped first. --in-memory uses
+the in-process memory backend instead, which takes the database out of the
+measurement and leaves the cost of the request paths themselves; pair it with
+a profiler when working on a hot path. Its queries never wait, so each request
+holds the event loop until it is done; routes that fan out internally
+(bootstrap, batch) queue behind every other worker at each step, so take
+their latency from a --concurrency 1 run.
+
+--sqlite PATH runs in-process on the embedded SQLite backend, with the
+database file at PATH (removed first), so it can be compared with Mongo on the
+same mix. --base-url drives an already running server instead.
+
+Usage: python benchmarks/bench_api.py [--users N] [--tasks-per-user N]
+           [--events-per-user N] [--concurrency N] [--duration S]
+           [--in-memory | --sqlite PATH | --base-url URL] [--database NAME]
+           [--seed S] [--json FILE]
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import httpx
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+TASK_TYPES = ["general", "work", "meeting", "exercise", "meal", "personal"]
+PRIORITIES = ["low", "medium", "high"]
+REPEATS = ["daily", "weekdays", "weekly", "monthly"]
+EVENT_TYPES = ["cafe", "restaurant", "cultural", "festival", "park"]
+CITIES = [
+    ("New York", "United States", "America/New_York", 40.7128, -74.0060),
+    ("London", "United Kingdom", "Europe/London", 51.5074, -0.1278),
+    ("Tokyo", "Japan", "Asia/Tokyo", 35.6762, 139.6503),
+    ("Berlin", "Germany", "Europe/Berlin", 52.5200, 13.4050),
+    ("Mumbai", "India", "Asia/Kolkata", 19.0760, 72.8777),
+]
+PERSONAS = ["casualBuddy", "caringSibling", "goodParent", "strictProfessional", "wildCard"]
+TODAY = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+SEED_BATCH = 500
+
+# (name, weight); the mix leans on the reads the app makes on every screen
+MIX = [
+    ("GET /api/tasks?date", 22),
+    ("GET /api/tasks?range", 8),
+    ("GET /api/calendar/summary", 8),
+    ("GET /api/bootstrap", 8),
+    ("GET /api/user/profile", 8),
+    ("GET /api/events", 8),
+    ("POST /api/plan-day", 8),
+    ("POST /api/plan-week", 2),
+    ("GET /api/sync", 5),
+    ("GET /api/recommendations/holidays", 3),
+    ("GET /api/explore/nearby", 3),
+    ("GET /api/persona-message", 3),
+    ("POST /api/tasks", 6),
+    ("PUT /api/tasks/{id}", 5),
+    ("DELETE /api/tasks/{id}", 1),
+    ("POST /api/tasks:bulk", 2),
+    ("POST /api/events", 2),
+    ("PUT /api/events/{id}", 2),
+    ("DELETE /api/events/{id}", 1),
+    ("POST /api/events:batch", 1),
+    ("PUT /api/user/city", 1),
+    ("POST /api/batch", 2),
+]
+EVENTS_BATCH_SIZE = 5
+
+def make_task(rng: random.Random, index: int):
+    day = TODAY + timedelta(days=rng.randrange(-30, 31))
+    fixed = rng.random() < 0.6
+    hour, minute = rng.randrange(6, 22), rng.choice([0, 15, 30, 45])
+    task = {
+        "title": f"Task {index}",
+        "description": "Notes for the task" if rng.random() < 0.4 else None,
+        "date": day.replace(hour=hour, minute=minute).isoformat() + "Z",
+        "time": f"{hour:02d}:{minute:02d}" if fixed else None,
+        "task_type": rng.choice(TASK_TYPES),
+        "priority": rng.choice(PRIORITIES),
+        "timer_duration": str(rng.choice([5, 10, 15, 30, 45, 60])),
+    }
+    if rng.random() < 0.05:
+        task["repeat"] = rng.choice(REPEATS)
+    if rng.random() < 0.3:
+        task["reminder"] = (day.replace(hour=hour, minute=minute) - timedelta(minutes=15)).isoformat() + "Z"
+    return task
+
+def make_event(rng: random.Random, index: int, city):
+    name, _, _, lat, lng = city
+    return {
+        "title": f"Place {index}",
+        "event_type": rng.choice(EVENT_TYPES),
+        "location": f"{rng.randrange(1, 400)} Main Street",
+        "city": name,
+        "rating": round(rng.uniform(3, 5), 1),
+        "lat": lat + rng.uniform(-0.1, 0.1),
+        "lng": lng + rng.uniform(-0.1, 0.1),
+    }
+
+class Session:
+    """A seeded user: auth header, the task and event ids the traffic can edit, and its sync position."""
+
+    def __init__(self, headers: dict, task_ids: list, event_ids: list, city):
+        self.headers = headers
+        self.task_ids = task_ids
+        self.event_ids = event_ids
+        self.city = city
+        # Syncs send the last token back and take the delta path
+        self.sync_token = None
+
+async def seed(client: httpx.AsyncClient, args, rng: random.Random):
+    run_id = f"{int(time.time())}-{rng.randrange(10 ** 6)}"
+    sessions = []
+    for u in range(args.users):
+        city = CITIES[u % len(CITIES)]
+        response = await client.post("/api/onboarding", json={
+            "name": f"bench-{run_id}-{u}",
+            "timezone": city[2],
+            "city": city[0],
+            "country": city[1],
+            "personality_type": "balanced",
+            "selected_persona": PERSONAS[u % len(PERSONAS)],
+        })
+        response.raise_for_status()
+        headers = {"Authorization": f"Bearer {response.json()['token']}"}
+
+        task_ids = []
+        tasks = [make_task(rng, i) for i in range(args.tasks_per_user)]
+        for start in range(0, len(tasks), SEED_BATCH):
+            response = await client.post("/api/tasks:batch", headers=headers, json=tasks[start:start + SEED_BATCH])
+            response.raise_for_status()
+            task_ids.extend(task["id"] for task in response.json()["tasks"] if task["repeat"] in (None, "", "none"))
+        event_ids = []
+        events = [make_event(rng, i, city) for i in range(args.events_per_user)]
+        for start in range(0, len(events), SEED_BATCH):
+            response = await client.post("/api/events:batch", headers=headers, json=events[start:start + SEED_BATCH])
+            response.raise_for_status()
+            event_ids.extend(event["id"] for event in response.json()["events"])
+        session = Session(headers, task_ids, event_ids, city)
+        # Take the full snapshot here so the measured syncs are deltas. Tokens
+        # trail the clock by the server's sync skew, so the first few seconds
+        # of deltas still carry the seeded writes.
+        response = await client.get("/api/sync", headers=headers)
+        response.raise_for_status()
+        session.sync_token = response.json()["next_token"]
+        sessions.append(session)
+    return sessions
+
+def random_day(rng: random.Random, spread: int = 14):
+    return (TODAY + timedelta(days=rng.randrange(-spread, spread + 1))).strftime("%Y-%m-%d")
+
+async def call(client: httpx.AsyncClient, name: str, session: Session, rng: random.Random):
+    h = session.headers
+    if name == "GET /api/tasks?date":
+        return await client.get("/api/tasks", headers=h, params={"date": random_day(rng)})
+    if name == "GET /api/tasks?range":
+        start = datetime.strptime(random_day(rng), "%Y-%m-%d")
+        return await client.get("/api/tasks", headers=h, params={
+            "start_date": start.isoformat(), "end_date": (start + timedelta(days=7)).isoformat()
+        })
+    if name == "GET /api/calendar/summary":
+        start = TODAY.replace(day=1) + timedelta(days=31 * rng.randrange(-1, 2))
+        start = start.replace(day=1)
+        return await client.get("/api/calendar/summary", headers=h, params={
+            "start": start.strftime("%Y-%m-%d"), "end": (start + timedelta(days=41)).strftime("%Y-%m-%d")
+        })
+    if name == "GET /api/bootstrap":
+        return await client.get("/api/bootstrap", headers=h, params={"date": TODAY.strftime("%Y-%m-%d")})
+    if name == "GET /api/user/profile":
+        return await client.get("/api/user/profile", headers=h)
+    if name == "GET /api/events":
+        return await client.get("/api/events", headers=h)
+    if name == "POST /api/plan-day":
+        return await client.post("/api/plan-day", headers=h, params={"date": random_day(rng, 3)})
+    if name == "POST /api/plan-week":
+        return await client.post("/api/plan-week", headers=h, params={"start": random_day(rng, 7), "days": 7})
+    if name == "GET /api/sync":
+        params = {"since": session.sync_token} if session.sync_token else {}
+        response = await client.get("/api/sync", headers=h, params=params)
+        if response.status_code == 200:
+            session.sync_token = response.json()["next_token"]
+        return response
+    if name == "GET /api/recommendations/holidays":
+        return await client.get("/api/recommendations/holidays", headers=h, params={"date": random_day(rng, 60)})
+    if name == "GET /api/explore/nearby":
+        _, _, _, lat, lng = session.city
+        return await client.get("/api/explore/nearby", headers=h, params={"lat": lat, "lng": lng, "radius_km": 10})
+    if name == "GET /api/persona-message":
+        return await client.get("/api/persona-message/reminder_task", headers=h, params={"title": "Standup", "time": "09:30"})
+    if name == "POST /api/tasks":
+        response = await client.post("/api/tasks", headers=h, json=make_task(rng, rng.randrange(10 ** 6)))
+        if response.status_code == 200:
+            session.task_ids.append(response.json()["task"]["id"])
+        return response
+    if name == "PUT /api/tasks/{id}":
+        if not session.task_ids:
+            return None
+        task = make_task(rng, rng.randrange(10 ** 6))
+        task.pop("repeat", None)
+        return await client.put(f"/api/tasks/{rng.choice(session.task_ids)}", headers=h, json=task)
+    if name == "DELETE /api/tasks/{id}":
+        if not session.task_ids:
+            return None
+        task_id = session.task_ids.pop(rng.randrange(len(session.task_ids)))
+        return await client.delete(f"/api/tasks/{task_id}", headers=h)
+    if name == "POST /api/tasks:bulk":
+        # One operation per task; the route rejects a second change to the same task
+        operations = [{"op": "create", "task": make_task(rng, rng.randrange(10 ** 6))}]
+        if len(session.task_ids) >= 2:
+            update_id, complete_id = rng.sample(session.task_ids, 2)
+            task = make_task(rng, rng.randrange(10 ** 6))
+            task.pop("repeat", None)
+            operations.append({"op": "update", "id": update_id, "task": task})
+            operations.append({"op": "complete", "id": complete_id, "completed": rng.random() < 0.5})
+        response = await client.post("/api/tasks:bulk", headers=h, json=operations)
+        if response.status_code == 200 and response.json()["results"][0]["status"] == 201:
+            session.task_ids.append(response.json()["results"][0]["id"])
+        return response
+    if name == "POST /api/events":
+        response = await client.post("/api/events", headers=h, json=make_event(rng, rng.randrange(10 ** 6), session.city))
+        if response.status_code == 200:
+            session.event_ids.append(response.json()["event"]["id"])
+        return response
+    if name == "PUT /api/events/{id}":
+        if not session.event_ids:
+            return None
+        event = make_event(rng, rng.randrange(10 ** 6), session.city)
+        return await client.put(f"/api/events/{rng.choice(session.event_ids)}", headers=h, json=event)
+    if name == "DELETE /api/events/{id}":
+        if not session.event_ids:
+            return None
+        event_id = session.event_ids.pop(rng.randrange(len(session.event_ids)))
+        return await client.delete(f"/api/events/{event_id}", headers=h)
+    if name == "POST /api/events:batch":
+        events = [make_event(rng, rng.randrange(10 ** 6), session.city) for _ in range(EVENTS_BATCH_SIZE)]
+        response = await client.post("/api/events:batch", headers=h, json=events)
+        if response.status_code == 200:
+            session.event_ids.extend(event["id"] for event in response.json()["events"])
+        return response
+    if name == "PUT /api/user/city":
+        session.city = rng.choice(CITIES)
+        city, country, zone, _, _ = session.city
+        return await client.put("/api/user/city", headers=h, json={"city": city, "country": country, "timezone": zone})
+    if name == "POST /api/batch":
+        return await client.post("/api/batch", headers=h, json=[
+            {"path": "/api/user/profile"},
+            {"path": f"/api/tasks?date={random_day(rng)}"},
+            {"path": "/api/events"},
+        ])
+    raise ValueError(name)
+
+def percentile(samples, fraction: float):
+    """Nearest-rank percentile of an already sorted list."""
+    if not samples:
+        return 0.0
+    index = max(0, min(len(samples) - 1, math.ceil(fraction * len(samples)) - 1))
+    return samples[index]
+
+async def drive(client: httpx.AsyncClient, sessions, args, mix):
+    names = [name for name, _ in mix]
+    weights = [weight for _, weight in mix]
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    deadline = time.perf_counter() + args.duration
+
+    async def worker(index: int):
+        rng = random.Random(args.seed * 1000 + index)
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            started = time.perf_counter()
+            try:
+                response = await call(client, name, rng.choice(sessions), rng)
+            except httpx.HTTPError:
+                errors[name] += 1
+                continue
+            if response is None:
+                continue
+            latencies[name].append((time.perf_counter() - started) * 1000)
+            if response.status_code >= 400:
+                errors[name] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(args.concurrency)))
+    return latencies, errors, time.perf_counter() - started
+
+def report(latencies, errors, elapsed: float):
+    rows = []
+    for name in sorted(latencies, key=lambda n: -len(latencies[n])):
+        samples = sorted(latencies[name])
+        rows.append({
+            "endpoint": name,
+            "requests": len(samples),
+            "errors": errors[name],
+            "rps": len(samples) / elapsed,
+            "p50_ms": percentile(samples, 0.50),
+            "p95_ms": percentile(samples, 0.95),
+            "p99_ms": percentile(samples, 0.99),
+        })
+    everything = sorted(sample for samples in latencies.values() for sample in samples)
+    total = {
+        "endpoint": "total",
+        "requests": len(everything),
+        "errors": sum(errors.values()),
+        "rps": len(everything) / elapsed,
+        "p50_ms": percentile(everything, 0.50),
+        "p95_ms": percentile(everything, 0.95),
+        "p99_ms": percentile(everything, 0.99),
+    }
+
+    print(f"{'endpoint':<36} {'requests':>9} {'errors':>7} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for row in rows + [total]:
+        print(
+            f"{row['endpoint']:<36} {row['requests']:>9} {row['errors']:>7} {row['rps']:>9.1f} "
+            f"{row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f} {row['p99_ms']:>9.2f}"
+        )
+    return rows, total
+
+async def open_client(args):
+    """Return (client, cleanup) for the selected target."""
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=30)
+        return client, client.aclose
+
+    os.environ.setdefault("REMINDERS_ENABLED", "false")
+    import server
+    from memory_storage import MemoryStorage
+    from mongo_storage import MongoStorage
+    from sqlite_storage import SQLiteStorage
+
+    ttls = (server.IDEMPOTENCY_TTL_HOURS * 3600, server.SYNC_TOMBSTONE_DAYS * 86400)
+    mongo = None
+    if args.in_memory:
+        server.set_storage(MemoryStorage(*ttls))
+    elif args.sqlite:
+        remove_sqlite(args.sqlite)
+        server.set_storage(SQLiteStorage(args.sqlite, server.SQLITE_READERS, *ttls))
+    else:
+        mongo = server.client or AsyncIOMotorClient(server.MONGO_URL)
+        await mongo.drop_database(args.database)
+        server.set_storage(MongoStorage(mongo[args.database], *ttls))
+    await server.ensure_indexes()
+
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://bench", timeout=30)
+
+    async def cleanup():
+        await client.aclose()
+        await server.storage.close()
+        if args.keep:
+            return
+        if mongo is not None:
+            await mongo.drop_database(args.database)
+        elif args.sqlite:
+            remove_sqlite(args.sqlite)
+    return client, cleanup
+
+def remove_sqlite(path: str):
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+async def run(args):
+    rng = random.Random(args.seed)
+    client, cleanup = await open_client(args)
+    try:
+        started = time.perf_counter()
+        sessions = await seed(client, args, rng)
+        print(
+            f"Seeded {args.users} users, {args.users * args.tasks_per_user} tasks and "
+            f"{args.users * args.events_per_user} events in {time.perf_counter() - started:.1f}s; "
+            f"running {args.concurrency} workers for {args.duration:.0f}s"
+        )
+        latencies, errors, elapsed = await drive(client, sessions, args, MIX)
+        rows, total = report(latencies, errors, elapsed)
+    finally:
+        await cleanup()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"config": vars(args), "endpoints": rows, "total": total}, f, indent=2)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--tasks-per-user", type=int, default=200)
+    parser.add_argument("--events-per-user", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds of traffic after seeding")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--in-memory", action="store_true", help="run in-process on the memory backend")
+    target.add_argument("--sqlite", metavar="PATH", help="run in-process on the SQLite backend, with the database at PATH")
+    target.add_argument("--base-url", help="drive a running server, e.g. http://localhost:8001")
+    parser.add_argument("--database", default="cc_calendar_bench", help="database used in-process; dropped first")
+    parser.add_argument("--keep", action="store_true", help="keep the in-process database or SQLite file afterwards")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
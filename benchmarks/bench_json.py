@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+JSON encoding benchmark: a GET /api/tasks page of 200 tasks encoded the
+default way (jsonable_encoder + JSONResponse) and with FastJSONResponse.
+
+Usage: python benchmarks/bench_json.py [--tasks N] [--repeat N] [--seed S]
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+
+from fast_json import FastJSONResponse  # noqa: E402
+
+TASK_TYPES = ["general", "work", "meeting", "exercise", "meal", "personal"]
+PRIORITIES = ["low", "medium", "high"]
+DAY = datetime(2026, 10, 19)
+
+def make_payload(count: int, rng: random.Random):
+    user_id = str(uuid.UUID(int=rng.getrandbits(128)))
+    tasks = []
+    for i in range(count):
+        task_day = DAY + timedelta(days=rng.randrange(7), hours=rng.randrange(6, 22))
+        tasks.append({
+            "id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "user_id": user_id,
+            "title": f"Task {i}",
+            "description": "Pick up the dry cleaning on the way back" if rng.random() < 0.5 else None,
+            "date": task_day,
+            "time": task_day.strftime("%H:%M"),
+            "task_type": rng.choice(TASK_TYPES),
+            "priority": rng.choice(PRIORITIES),
+            "completed": rng.random() < 0.3,
+            "deadline": task_day + timedelta(hours=2) if rng.random() < 0.3 else None,
+            "reminder": task_day - timedelta(minutes=15) if rng.random() < 0.5 else None,
+            "repeat": None,
+            "timer_duration": str(rng.choice([5, 10, 15, 30, 45, 60])),
+            "exceptions": [],
+            "overrides": {},
+            "created_at": DAY - timedelta(days=3, microseconds=rng.randrange(1000000)),
+            "updated_at": DAY - timedelta(days=1, microseconds=rng.randrange(1000000)),
+        })
+    return {"tasks": tasks, "next_cursor": None}
+
+def measure(fn, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tasks", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    payload = make_payload(args.tasks, random.Random(args.seed))
+    default_body = JSONResponse(jsonable_encoder(payload)).body
+    fast_body = FastJSONResponse(payload).body
+    if json.loads(default_body) != json.loads(fast_body):
+        raise SystemExit("FastJSONResponse output differs from the default encoding")
+
+    print(f"{args.tasks} tasks, {len(default_body)} bytes default, {len(fast_body)} bytes fast")
+    print(f"{'encoder':<28} {'p50 ms':>10} {'p95 ms':>10}")
+    cases = [
+        ("jsonable_encoder + json", lambda: JSONResponse(jsonable_encoder(payload))),
+        ("FastJSONResponse (orjson)", lambda: FastJSONResponse(payload)),
+    ]
+    for name, fn in cases:
+        p50, p95 = measure(fn, args.repeat)
+        print(f"{name:<28} {p50:>10.3f} {p95:>10.3f}")
+
+if __name__ == "__main__":
+    main()
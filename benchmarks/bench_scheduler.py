@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Scheduler benchmark: per-plan latency of plan_day / plan_range
+at 10, 100 and 1,000 tasks.
+
+Usage: python benchmarks/bench_scheduler.py [--repeat N] [--seed S]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from scheduler import plan_day, plan_range  # noqa: E402
+
+TASK_TYPES = ["general", "work", "meeting", "exercise", "meal", "personal"]
+PRIORITIES = ["low", "medium", "high"]
+DAY = datetime(2026, 10, 19)
+
+def make_tasks(count: int, rng: random.Random, days: int = 1):
+    tasks = []
+    for i in range(count):
+        task_day = DAY + timedelta(days=rng.randrange(days))
+        fixed = rng.random() < 0.4
+        tasks.append({
+            "id": f"task-{i}",
+            "title": f"Task {i}",
+            "date": task_day,
+            "time": f"{rng.randrange(6, 22):02d}:{rng.choice([0, 15, 30, 45]):02d}" if fixed else None,
+            "task_type": rng.choice(TASK_TYPES),
+            "priority": rng.choice(PRIORITIES),
+            "timer_duration": str(rng.choice([5, 10, 15, 30, 45, 60])),
+            "deadline": task_day + timedelta(hours=rng.randrange(9, 23)) if rng.random() < 0.3 else None,
+        })
+    return tasks
+
+def measure(fn, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"{'plan':<10} {'tasks':>6} {'p50 ms':>10} {'p95 ms':>10}")
+    for count in (10, 100, 1000):
+        day_tasks = make_tasks(count, rng)
+        p50, p95 = measure(lambda: plan_day(day_tasks, DAY), args.repeat)
+        print(f"{'day':<10} {count:>6} {p50:>10.3f} {p95:>10.3f}")
+
+        week_tasks = make_tasks(count, rng, days=7)
+        p50, p95 = measure(lambda: plan_range(week_tasks, DAY, 7), args.repeat)
+        print(f"{'week':<10} {count:>6} {p50:>10.3f} {p95:>10.3f}")
+
+if __name__ == "__main__":
+    main()